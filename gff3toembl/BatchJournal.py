@@ -0,0 +1,118 @@
+import hashlib
+import os
+from gff3toembl.OutputFile import compressed_filename
+
+class BatchJournal(object):
+    # A record of the conversions in a batch which have finished, so that a
+    # batch which dies part of the way through can be resumed without redoing
+    # them.  A line is appended as each conversion succeeds:
+    #
+    #   job  input_size  input_sha1  arguments_sha1  output  output_size
+    #
+    # output is the EMBL file the job wrote, named .gz if gff3_to_embl was
+    # given --gzip, or, when it was split into shards, the shard manifest.  A job counts as done if its GFF3 file and
+    # arguments haven't changed and its output, and every shard a manifest
+    # lists, is still there at the size it was written.  A job whose output
+    # can't be found isn't recorded at all, so it is always converted again.
+    # Output files are renamed into place once complete, so one which exists
+    # isn't partial.  Each line is synced to disk before the next job's is
+    # written, and a partly written last line, from dying mid write, is ignored.
+
+    header = "#job\tinput_size\tinput_sha1\targuments_sha1\toutput\toutput_size\n"
+    hash_buffer_size = 1024 * 1024
+    manifest_suffix = ".manifest"
+
+    def __init__(self, journal_filename):
+        self.journal_filename = journal_filename
+        self.entries          = {} # job name: (input size, input sha1, arguments sha1, output, output size)
+
+    def read(self):
+        self.entries = {}
+        if not os.path.exists(self.journal_filename):
+            return self
+        with open(self.journal_filename, 'r') as journal_file:
+            for line in journal_file:
+                if line.startswith('#') or not line.endswith('\n'):
+                    continue
+                columns = line.rstrip('\n').split('\t')
+                if len(columns) != 6:
+                    continue
+                name, input_size, input_digest, arguments_digest, output, output_size = columns
+                try:
+                    self.entries[name] = (int(input_size), input_digest, arguments_digest, output, int(output_size))
+                except ValueError:
+                    continue
+        return self
+
+    def input_digest(self, job):
+        # Worked out once per job, as hashing a large GFF3 file takes a while
+        if job.input_digest == None:
+            sha1 = hashlib.sha1()
+            with open(job.input_filename, 'rb') as input_file:
+                for data in iter(lambda: input_file.read(self.hash_buffer_size), b''):
+                    sha1.update(data)
+            job.input_digest = sha1.hexdigest()
+        return job.input_digest
+
+    def arguments_digest(self, job):
+        return hashlib.sha1('\0'.join(job.arguments).encode('utf-8')).hexdigest()
+
+    def output(self, job):
+        # The file which shows the job's output was written, or None if there isn't one
+        if job.output_filename == None:
+            return None
+        for output in [job.output_filename, compressed_filename(job.output_filename), job.output_filename + self.manifest_suffix]:
+            if os.path.exists(output):
+                return output
+        return None
+
+    def output_is_intact(self, output, output_size):
+        if not os.path.exists(output) or os.path.getsize(output) != output_size:
+            return False
+        if not output.endswith(self.manifest_suffix):
+            return True
+        # the shards are listed by name, next to the manifest, with their sizes
+        shard_directory = os.path.dirname(output)
+        with open(output, 'r') as manifest_file:
+            for line in manifest_file:
+                columns = line.rstrip('\n').split('\t')
+                if len(columns) != 3:
+                    return False
+                shard_filename = os.path.join(shard_directory, columns[0])
+                if not os.path.exists(shard_filename) or str(os.path.getsize(shard_filename)) != columns[2]:
+                    return False
+        return True
+
+    def is_complete(self, job):
+        if job.name not in self.entries:
+            return False
+        input_size, input_digest, arguments_digest, output, output_size = self.entries[job.name]
+        if not os.path.exists(job.input_filename) or os.path.getsize(job.input_filename) != input_size:
+            return False
+        if output != self.output(job) or not self.output_is_intact(output, output_size):
+            return False
+        return arguments_digest == self.arguments_digest(job) and input_digest == self.input_digest(job)
+
+    def record(self, job):
+        # Returns False, recording nothing, if the job's output can't be found
+        output = self.output(job)
+        if output == None:
+            return False
+        entry = (os.path.getsize(job.input_filename), self.input_digest(job), self.arguments_digest(job), output, os.path.getsize(output))
+        self.entries[job.name] = entry
+        journal_size = os.path.getsize(self.journal_filename) if os.path.exists(self.journal_filename) else 0
+        with open(self.journal_filename, 'a') as journal_file:
+            if journal_size == 0:
+                journal_file.write(self.header)
+            elif not self.ends_with_new_line(journal_size):
+                # a line left partly written is ended so the next one starts on its own line
+                journal_file.write("\n")
+            journal_file.write("\t".join(str(column) for column in (job.name,) + entry) + "\n")
+            journal_file.flush()
+            os.fsync(journal_file.fileno())
+        return True
+
+    def ends_with_new_line(self, journal_size):
+        with open(self.journal_filename, 'rb') as journal_file:
+            journal_file.seek(journal_size - 1)
+            return journal_file.read(1) == b'\n'
@@ -0,0 +1,196 @@
+import os
+import subprocess
+import sys
+import time
+
+class BatchJob(object):
+    # One conversion: the arguments for the gff3_to_embl command, the GFF3
+    # file, which its cost is estimated from, and the file it writes
+
+    def __init__(self, name, arguments, input_filename, output_filename = None):
+        self.name                = name
+        self.arguments           = arguments
+        self.input_filename      = input_filename
+        self.output_filename     = output_filename
+        self.input_digest        = None
+        self.input_size          = 0
+        self.sequence_length     = 0
+        self.predicted_seconds   = None
+        self.predicted_megabytes = None
+        self.started             = None
+        self.actual_seconds      = None
+        self.actual_megabytes    = None
+        self.exit_status         = None
+
+    def cost(self, sequence_length_weight):
+        return self.input_size + sequence_length_weight * self.sequence_length
+
+class BatchRunner(object):
+    # Runs many conversions as separate processes.  Each job's run time and
+    # peak memory are predicted from the size of its GFF3 file and the length
+    # of its sequences, and:
+    #
+    #   - the longest jobs are started first, so a few huge assemblies don't
+    #     start last and hold up the end of the batch
+    #   - a job is only started if the predicted memory of all of the running
+    #     jobs stays within memory_budget megabytes, so several big ones
+    #     landing together don't run the node out of memory
+    #
+    # The predictions start from rough defaults and are corrected from each
+    # job which finishes.  Predicted and actual time and peak RSS are written
+    # to report_filename for every job.
+    #
+    # With a BatchJournal each job which succeeds is recorded in it, and with
+    # resume the jobs it records as done, whose inputs haven't changed since,
+    # are skipped.
+
+    seconds_per_byte          = 5e-7 # roughly 2 MB/s of GFF3
+    megabytes_per_byte        = 5.0 / (1024 * 1024) # contigs take several times the size of the file
+    base_megabytes            = 50 # the interpreter and GT
+    sequence_length_weight    = 0.25 # sequence is cheap compared to features, per byte
+
+    def __init__(self, jobs, workers = 1, memory_budget = None, report_filename = None, command = None, clock = time.time, journal = None, resume = False, progress = False):
+        self.jobs            = jobs
+        self.workers         = workers
+        self.memory_budget   = memory_budget
+        self.report_filename = report_filename
+        self.command         = command if command != None else ['gff3_to_embl']
+        self.clock           = clock
+        self.journal         = journal
+        self.resume          = resume
+        # each job is only reported on stderr when asked for, as gff3_to_embl --progress
+        self.progress        = progress
+        self.running         = {} # pid: (job, process)
+        self.finished_jobs   = []
+
+    def sequence_length(self, input_filename):
+        # From the ##sequence-region directives at the top of the file, so
+        # only the header has to be read
+        sequence_length = 0
+        with open(input_filename, 'r') as input_file:
+            for line in input_file:
+                if line.startswith('##sequence-region'):
+                    columns = line.split()
+                    try:
+                        sequence_length += int(columns[3]) - int(columns[2]) + 1
+                    except (IndexError, ValueError):
+                        pass
+                elif not line.startswith('#'):
+                    break
+        return sequence_length
+
+    def estimate(self, job):
+        job.input_size = os.path.getsize(job.input_filename)
+        job.sequence_length = self.sequence_length(job.input_filename)
+        self.predict(job)
+
+    def predict(self, job):
+        cost = job.cost(self.sequence_length_weight)
+        job.predicted_seconds = cost * self.seconds_per_byte
+        job.predicted_megabytes = self.base_megabytes + cost * self.megabytes_per_byte
+
+    def learn(self, job):
+        # Averages the time per unit of cost over the jobs which succeeded, but keeps
+        # the largest memory per unit of cost, as it's better to under fill a
+        # node than to run it out of memory
+        cost = job.cost(self.sequence_length_weight)
+        if cost <= 0 or job.exit_status != 0:
+            return
+        succeeded_jobs = [finished_job for finished_job in self.finished_jobs if finished_job.exit_status == 0]
+        finished_costs = sum(finished_job.cost(self.sequence_length_weight) for finished_job in succeeded_jobs)
+        finished_seconds = sum(finished_job.actual_seconds for finished_job in succeeded_jobs)
+        if finished_costs > 0:
+            self.seconds_per_byte = finished_seconds / finished_costs
+        if job.actual_megabytes != None:
+            self.megabytes_per_byte = max(self.megabytes_per_byte, (job.actual_megabytes - self.base_megabytes) / cost)
+
+    def run(self):
+        # Returns True if every job succeeded
+        jobs = self.jobs
+        if self.resume and self.journal != None:
+            self.journal.read()
+            jobs = [job for job in self.jobs if not self.skip(job)]
+        for job in jobs:
+            self.estimate(job)
+        pending = sorted(jobs, key=lambda job: -job.predicted_seconds)
+        report_file = open(self.report_filename, 'w') if self.report_filename != None else None
+        try:
+            if report_file != None:
+                report_file.write("job\tpredicted_seconds\tactual_seconds\tpredicted_peak_rss_megabytes\tactual_peak_rss_megabytes\texit_status\n")
+            while pending or self.running:
+                job = self.next_job(pending)
+                if job != None:
+                    pending.remove(job)
+                    self.start(job)
+                    continue
+                job = self.wait()
+                if self.journal != None and job.exit_status == 0 and not self.journal.record(job):
+                    sys.stderr.write("{}: output not found, not recorded in the journal\n".format(job.name))
+                self.learn(job)
+                for pending_job in pending:
+                    self.predict(pending_job)
+                pending.sort(key=lambda job: -job.predicted_seconds)
+                self.report(job, report_file)
+        finally:
+            if report_file != None:
+                report_file.close()
+        return all(job.exit_status == 0 for job in self.finished_jobs)
+
+    def skip(self, job):
+        if not self.journal.is_complete(job):
+            return False
+        if self.progress:
+            sys.stderr.write("{}: already converted, skipping\n".format(job.name))
+        return True
+
+    def next_job(self, pending):
+        # The longest pending job which fits in the memory left over, if there's a free worker
+        if not pending or len(self.running) >= self.workers:
+            return None
+        if self.memory_budget == None:
+            return pending[0]
+        running_megabytes = sum(job.predicted_megabytes for job, process in self.running.values())
+        for job in pending:
+            if running_megabytes + job.predicted_megabytes <= self.memory_budget:
+                return job
+        # a job bigger than the whole budget still has to run, on its own
+        if not self.running:
+            return pending[0]
+        return None
+
+    def start(self, job):
+        if self.journal != None:
+            # hashed before the conversion starts, so a change while it runs makes it stale
+            self.journal.input_digest(job)
+        job.started = self.clock()
+        process = subprocess.Popen(self.command + job.arguments)
+        self.running[process.pid] = (job, process)
+
+    def wait(self):
+        # os.wait4 gives the peak RSS of just the job which finished
+        pid, status, resource_usage = os.wait4(-1, 0)
+        while pid not in self.running:
+            pid, status, resource_usage = os.wait4(-1, 0)
+        job, process = self.running.pop(pid)
+        process.returncode = os.WEXITSTATUS(status) if os.WIFEXITED(status) else -os.WTERMSIG(status)
+        job.exit_status = process.returncode
+        job.actual_seconds = self.clock() - job.started
+        job.actual_megabytes = self.peak_megabytes(resource_usage.ru_maxrss)
+        self.finished_jobs.append(job)
+        return job
+
+    def peak_megabytes(self, maximum_resident_set_size):
+        # kilobytes on Linux but bytes on OS X
+        if sys.platform == 'darwin':
+            return maximum_resident_set_size / (1024.0 * 1024.0)
+        return maximum_resident_set_size / 1024.0
+
+    def report(self, job, report_file):
+        if self.progress:
+            sys.stderr.write("{}: {} in {:.1f}s (predicted {:.1f}s), peak RSS {:.0f} MB (predicted {:.0f} MB)\n".format(
+                job.name, 'finished' if job.exit_status == 0 else 'failed with exit status {}'.format(job.exit_status),
+                job.actual_seconds, job.predicted_seconds, job.actual_megabytes, job.predicted_megabytes))
+        if report_file != None:
+            report_file.write("{}\t{:.1f}\t{:.1f}\t{:.0f}\t{:.0f}\t{}\n".format(job.name, job.predicted_seconds, job.actual_seconds,
+                                                                          job.predicted_megabytes, job.actual_megabytes, job.exit_status))
+            report_file.flush()
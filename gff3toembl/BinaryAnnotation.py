@@ -0,0 +1,202 @@
+import mmap
+import shutil
+import struct
+import sys
+import tempfile
+from array import array
+
+from gff3toembl.EMBLContig import EMBLContig, EMBLFeature
+
+class BinaryAnnotation(object):
+    # Saves the contigs parsed from a GFF3 file so later runs can start from
+    # them without running GT again.  Everything is stored in columns of
+    # little endian integers:
+    #
+    #   header      magic, version, number of strings, contigs, features and
+    #               attributes, and the offset of the sequences
+    #   strings     the end offset of each string, then the strings themselves.
+    #               Every feature type, strand, attribute key and value and
+    #               sequence identifier is stored once and referred to by number
+    #   contigs     sequence identifier, first feature, number of features,
+    #               sequence offset and sequence length
+    #   features    type, start, end, strand, first attribute, number of attributes
+    #   attributes  key, value and whether the value is a number
+    #   sequences   the raw sequences, which start on an 8 byte boundary so the
+    #               file can be memory mapped and the sequences sliced out of it
+
+    magic         = 'GFF3EMBL'
+    version       = 1
+    header_format = '<8sIIIIIQ'
+    no_sequence   = 0xFFFFFFFFFFFFFFFF
+
+    def __init__(self, filename):
+        self.filename = filename
+
+    def is_binary_annotation(self):
+        try:
+            with open(self.filename, 'rb') as input_file:
+                return input_file.read(len(self.magic)) == self.magic
+        except IOError:
+            return False
+
+    def write(self, contigs):
+        strings = []
+        string_numbers = {}
+        def string_number(value):
+            if value not in string_numbers:
+                string_numbers[value] = len(strings)
+                strings.append(value)
+            return string_numbers[value]
+
+        contig_columns = [[] for column in range(3)]
+        sequence_offsets = []
+        sequence_lengths = []
+        feature_columns = [[] for column in range(6)]
+        attribute_columns = [[] for column in range(3)]
+        # The sequences go at the end of the file but their offsets are needed
+        # before then, so they are spilled to a temporary file as they are
+        # numbered rather than all held in memory
+        sequences_file = tempfile.TemporaryFile(prefix='gff3toembl_sequences_')
+        sequences_length = 0
+
+        for sequence_identifier in sorted(contigs.keys()):
+            contig = contigs[sequence_identifier]
+            features = contig.sorted_features()
+            for column, value in zip(contig_columns, [string_number(sequence_identifier), len(feature_columns[0]), len(features)]):
+                column.append(value)
+            for feature in features:
+                feature_values = [string_number(feature.feature_type), feature.start, feature.end,
+                                  string_number(feature.strand), len(attribute_columns[0]), len(feature.attributes)]
+                for column, value in zip(feature_columns, feature_values):
+                    column.append(value)
+                for attribute_key, attribute_value in feature.attributes:
+                    attribute_columns[0].append(string_number(attribute_key))
+                    attribute_columns[1].append(string_number(str(attribute_value)))
+                    attribute_columns[2].append(1 if isinstance(attribute_value, int) else 0)
+            if contig.sequence == None:
+                sequence_offsets.append(self.no_sequence)
+                sequence_lengths.append(0)
+            else:
+                sequence_offsets.append(sequences_length)
+                sequence_lengths.append(contig.sequence.length)
+                for sequence_block in contig.sequence.sequence_blocks():
+                    sequences_file.write(sequence_block)
+                sequences_length += contig.sequence.length
+
+        string_ends = []
+        strings_length = 0
+        for value in strings:
+            strings_length += len(value)
+            string_ends.append(strings_length)
+
+        body = [self.pack('I', string_ends), ''.join(strings)]
+        body += [self.pack('I', column) for column in contig_columns]
+        body += [struct.pack('<%dQ' % len(sequence_offsets), *sequence_offsets), struct.pack('<%dQ' % len(sequence_lengths), *sequence_lengths)]
+        body += [self.pack('I', column) for column in feature_columns]
+        body += [self.pack('I', attribute_columns[0]), self.pack('I', attribute_columns[1]), self.pack('B', attribute_columns[2])]
+        body_length = struct.calcsize(self.header_format) + sum(map(len, body))
+        padding = '\0' * (-body_length % 8)
+        sequences_offset = body_length + len(padding)
+
+        with open(self.filename, 'wb') as output_file:
+            output_file.write(struct.pack(self.header_format, self.magic, self.version, len(strings), len(contig_columns[0]),
+                                          len(feature_columns[0]), len(attribute_columns[0]), sequences_offset))
+            for section in body:
+                output_file.write(section)
+            output_file.write(padding)
+            sequences_file.seek(0)
+            shutil.copyfileobj(sequences_file, output_file)
+        sequences_file.close()
+
+    def pack(self, typecode, values):
+        column = array(typecode, values)
+        if sys.byteorder != 'little':
+            column.byteswap()
+        return column.tostring()
+
+    def unpack(self, typecode, data, offset, count):
+        column = array(typecode)
+        column.fromstring(data[offset:offset + count * column.itemsize])
+        if sys.byteorder != 'little':
+            column.byteswap()
+        return column, offset + count * column.itemsize
+
+    def read(self, contigs, locus_tag = None, translation_table = None, sequence_cache = None, pack_sequences = False):
+        # Fills contigs (a dictionary or a ContigStore) with the saved contigs.
+        # locus_tag and translation_table are applied again in the same way as
+        # when the GFF3 file is parsed.
+        with open(self.filename, 'rb') as input_file:
+            data = mmap.mmap(input_file.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self.read_contigs(data, contigs, locus_tag, translation_table, sequence_cache, pack_sequences)
+        finally:
+            data.close()
+        return contigs
+
+    def read_contigs(self, data, contigs, locus_tag, translation_table, sequence_cache, pack_sequences = False):
+        magic, version, number_of_strings, number_of_contigs, number_of_features, number_of_attributes, sequences_offset = struct.unpack_from(self.header_format, data, 0)
+        if magic != self.magic or version != self.version:
+            raise ValueError("Could not read %s, it is not a version %d binary annotation file" % (self.filename, self.version))
+        offset = struct.calcsize(self.header_format)
+
+        string_ends, offset = self.unpack('I', data, offset, number_of_strings)
+        strings = []
+        strings_offset = offset
+        for string_end in string_ends:
+            strings.append(data[offset:strings_offset + string_end])
+            offset = strings_offset + string_end
+
+        contig_columns = []
+        for column in range(3):
+            values, offset = self.unpack('I', data, offset, number_of_contigs)
+            contig_columns.append(values)
+        sequence_offsets = struct.unpack_from('<%dQ' % number_of_contigs, data, offset)
+        offset += 8 * number_of_contigs
+        sequence_lengths = struct.unpack_from('<%dQ' % number_of_contigs, data, offset)
+        offset += 8 * number_of_contigs
+        feature_columns = []
+        for column in range(6):
+            values, offset = self.unpack('I', data, offset, number_of_features)
+            feature_columns.append(values)
+        attribute_keys, offset = self.unpack('I', data, offset, number_of_attributes)
+        attribute_values, offset = self.unpack('I', data, offset, number_of_attributes)
+        attribute_is_number, offset = self.unpack('B', data, offset, number_of_attributes)
+
+        feature_types, feature_starts, feature_ends, feature_strands, first_attributes, attribute_counts = feature_columns
+        for contig_number, (sequence_identifier, first_feature, feature_count) in enumerate(zip(*contig_columns)):
+            sequence_identifier = strings[sequence_identifier]
+            contig = EMBLContig()
+            for feature_number in range(first_feature, first_feature + feature_count):
+                attributes = []
+                first_attribute = first_attributes[feature_number]
+                for attribute_number in range(first_attribute, first_attribute + attribute_counts[feature_number]):
+                    attribute_value = strings[attribute_values[attribute_number]]
+                    if attribute_is_number[attribute_number]:
+                        attribute_value = int(attribute_value)
+                    attributes.append((strings[attribute_keys[attribute_number]], attribute_value))
+                feature = self.build_feature(strings[feature_types[feature_number]], feature_starts[feature_number], feature_ends[feature_number],
+                                             strings[feature_strands[feature_number]], attributes, locus_tag, translation_table)
+                contig.insert_feature(sequence_identifier, feature)
+            if sequence_offsets[contig_number] != self.no_sequence:
+                sequence_start = sequences_offset + sequence_offsets[contig_number]
+                contig.add_sequence(data[sequence_start:sequence_start + sequence_lengths[contig_number]], sequence_cache, pack_sequences)
+            contigs[sequence_identifier] = contig
+
+    def build_feature(self, feature_type, start, end, strand, attributes, locus_tag, translation_table):
+        feature = EMBLFeature.__new__(EMBLFeature)
+        feature.feature_type = feature_type
+        feature.start = start
+        feature.end = end
+        feature.strand = strand
+        feature.locus_tag = locus_tag
+        feature.translation_table = translation_table
+        feature.attributes = []
+        for attribute_key, attribute_value in attributes:
+            if attribute_key == 'locus_tag' and locus_tag != None:
+                feature.attributes += feature.create_locus_tag_attributes(attribute_key, attribute_value)
+            elif attribute_key == 'transl_table' and translation_table != None:
+                feature.attributes += feature.create_translation_table_attributes(attribute_key, translation_table)
+            else:
+                feature.attributes.append((attribute_key, attribute_value))
+        feature.attributes = feature.share_attributes(feature.attributes)
+        return feature
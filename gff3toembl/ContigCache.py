@@ -0,0 +1,76 @@
+import json
+import os
+
+class ContigCache(object):
+    # Remembers where each contig was written in the previous output file,
+    # along with a hash of everything it was formatted from, in a sidecar file
+    # next to the output.  Contigs which haven't changed since then are copied
+    # straight out of the previous output file instead of being formatted again.
+
+    version = 1 # increase whenever the formatting changes so old caches are ignored
+
+    def __init__(self, output_filename):
+        self.output_filename   = output_filename
+        self.cache_filename    = str(output_filename) + ".cache"
+        self.previous_contigs  = self.load()
+        self.previous_output   = open(self.output_filename, 'r') if self.previous_contigs else None
+        self.contigs           = {}
+        self.offset            = 0
+        self.reused_contigs    = 0
+
+    def load(self):
+        if not os.path.exists(self.cache_filename) or not os.path.exists(self.output_filename):
+            return {}
+        try:
+            with open(self.cache_filename, 'r') as cache_file:
+                cache = json.load(cache_file)
+        except (IOError, ValueError):
+            return {}
+        # Ignore the cache if the output has been changed by something else since it was written
+        output_stat = os.stat(self.output_filename)
+        if cache.get('version') != self.version or cache.get('output_size') != output_stat.st_size or cache.get('output_mtime') != output_stat.st_mtime:
+            return {}
+        return cache['contigs']
+
+    def format_contig(self, sequence_identifier, contig, validator = None):
+        contig_hash = contig.calculate_hash()
+        block = self.cached_block(sequence_identifier, contig_hash)
+        if block == None:
+            block = contig.format(validator) + "//\n"
+        else:
+            self.reused_contigs += 1
+        self.contigs[sequence_identifier] = [contig_hash, self.offset, len(block)]
+        self.offset += len(block)
+        return block
+
+    def cached_block(self, sequence_identifier, contig_hash):
+        previous_contig = self.previous_contigs.get(sequence_identifier)
+        if previous_contig == None:
+            return None
+        previous_hash, offset, length = previous_contig
+        if previous_hash != contig_hash:
+            return None
+        self.previous_output.seek(offset)
+        block = self.previous_output.read(length)
+        if len(block) != length or not block.endswith("//\n"):
+            return None
+        return block
+
+    def close(self):
+        if self.previous_output != None:
+            self.previous_output.close()
+            self.previous_output = None
+
+    def save(self):
+        # Called once the new output file is in place
+        output_stat = os.stat(self.output_filename)
+        cache = {
+          'version': self.version,
+          'output_size': output_stat.st_size,
+          'output_mtime': output_stat.st_mtime,
+          'contigs': self.contigs
+        }
+        temporary_cache_filename = self.cache_filename + ".tmp"
+        with open(temporary_cache_filename, 'w') as cache_file:
+            json.dump(cache, cache_file)
+        os.rename(temporary_cache_filename, self.cache_filename)
@@ -0,0 +1,94 @@
+import os
+import pickle
+import sqlite3
+import tempfile
+from collections import OrderedDict
+
+class ContigStore(object):
+    # Holds the contigs like a dictionary, but once the contigs in memory are
+    # estimated to take up more than memory_budget bytes the ones which were
+    # least recently added to are spilled to a temporary SQLite database.
+    # They are read back when they are next needed, normally when their
+    # sequence is parsed from the FASTA section at the end of the GFF3 file.
+    # Contigs must be stored again after they are changed, as a contig read
+    # back from the database is a copy.
+
+    def __init__(self, memory_budget, temporary_directory = None):
+        self.memory_budget = memory_budget
+        self.in_memory     = OrderedDict() # least recently stored first
+        self.sizes         = {}
+        self.memory_used   = 0
+        self.spilled       = set()
+        database_file_descriptor, self.database_filename = tempfile.mkstemp(prefix='gff3toembl_contigs_', suffix='.sqlite', dir=temporary_directory)
+        os.close(database_file_descriptor)
+        self.database = sqlite3.connect(self.database_filename)
+        self.database.execute("CREATE TABLE contigs (sequence_identifier TEXT PRIMARY KEY, contig BLOB)")
+
+    def __len__(self):
+        return len(self.in_memory) + len(self.spilled)
+
+    def __contains__(self, sequence_identifier):
+        return sequence_identifier in self.in_memory or sequence_identifier in self.spilled
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self):
+        return list(self.in_memory.keys()) + list(self.spilled)
+
+    def __getitem__(self, sequence_identifier):
+        if sequence_identifier in self.in_memory:
+            return self.in_memory[sequence_identifier]
+        if sequence_identifier in self.spilled:
+            row = self.database.execute("SELECT contig FROM contigs WHERE sequence_identifier = ?", (sequence_identifier,)).fetchone()
+            return pickle.loads(str(row[0]))
+        raise KeyError(sequence_identifier)
+
+    def get(self, sequence_identifier, default = None):
+        try:
+            return self[sequence_identifier]
+        except KeyError:
+            return default
+
+    def setdefault(self, sequence_identifier, default = None):
+        if sequence_identifier not in self:
+            self[sequence_identifier] = default
+        return self[sequence_identifier]
+
+    def __setitem__(self, sequence_identifier, contig):
+        if sequence_identifier in self.spilled:
+            self.database.execute("DELETE FROM contigs WHERE sequence_identifier = ?", (sequence_identifier,))
+            self.spilled.remove(sequence_identifier)
+        previous_size = self.sizes.get(sequence_identifier, 0)
+        if sequence_identifier in self.in_memory:
+            # move it to the end so it is the last to be spilled
+            del self.in_memory[sequence_identifier]
+        self.in_memory[sequence_identifier] = contig
+        self.sizes[sequence_identifier] = contig.estimated_size
+        self.memory_used += contig.estimated_size - previous_size
+        if self.memory_used > self.memory_budget:
+            self.spill()
+
+    def __delitem__(self, sequence_identifier):
+        if sequence_identifier in self.in_memory:
+            del self.in_memory[sequence_identifier]
+            self.memory_used -= self.sizes.pop(sequence_identifier)
+        elif sequence_identifier in self.spilled:
+            self.database.execute("DELETE FROM contigs WHERE sequence_identifier = ?", (sequence_identifier,))
+            self.spilled.remove(sequence_identifier)
+        else:
+            raise KeyError(sequence_identifier)
+
+    def spill(self):
+        # The most recently stored contig is kept as it is probably still being added to
+        while self.memory_used > self.memory_budget and len(self.in_memory) > 1:
+            sequence_identifier, contig = self.in_memory.popitem(last=False)
+            self.memory_used -= self.sizes.pop(sequence_identifier)
+            pickled_contig = pickle.dumps(contig, pickle.HIGHEST_PROTOCOL)
+            self.database.execute("INSERT INTO contigs (sequence_identifier, contig) VALUES (?, ?)", (sequence_identifier, sqlite3.Binary(pickled_contig)))
+            self.spilled.add(sequence_identifier)
+
+    def close(self):
+        self.database.close()
+        if os.path.exists(self.database_filename):
+            os.remove(self.database_filename)
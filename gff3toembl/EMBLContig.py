@@ -1,37 +1,64 @@
+import hashlib
 import re
+import sys
 from textwrap import TextWrapper
 from urllib import unquote as gff3_unescape
+from gff3toembl.ErrorReport import QualifierError
+from gff3toembl.FeatureIndex import FeatureIndex
+from gff3toembl.LineLengthValidator import LineLengthValidator
+from gff3toembl.PackedSequence import PackedSequence
+try:
+  # optional compiled formatting, see _cformat.c
+  from gff3toembl import _cformat
+except ImportError:
+  _cformat = None
 
 class EMBLContig(object):
   def __init__(self):
     self.header = None
+    self.header_details = {}
     self.features = {}
+    self.feature_index = FeatureIndex()
+    self.indexed_features = self.features
     self.sequence = None
-
-  def format(self):
+    self.estimated_size = sys.getsizeof(self)
+
+  def format(self, validator=None):
+    # Header and feature lines are checked as they are formatted, so a line
+    # which is too long is found before the sequence is formatted.  A
+    # validator which collects the long lines can be passed in, otherwise a
+    # LineLengthError is raised for the first one.
+    if validator == None:
+      validator = LineLengthValidator()
+    validator.contig = self.header_details.get('sequence_identifier')
     try:
-      header = self.header.format()
+      header = self.header.format(validator)
     except AttributeError:
       raise ValueError("Could not format contig, no header data found")
-    feature_strings = [feature.format() for feature in self.sorted_features()]
+    feature_strings = [feature.format(validator) for feature in self.sorted_features()]
     features = "".join(feature_strings)
     try:
       sequence = self.sequence.format()
     except AttributeError:
       raise ValueError("Could not format contig, no sequence data found")
-    formatted_string = header + features + sequence
-    header_features_formatted_string = header + features
-    line_lengths = map(len, header_features_formatted_string.split('\n'))
-    maximum_line_length = max(line_lengths)
-    if maximum_line_length > 80:
-      raise ValueError("Could not format contig, a line exceeded 80 characters in length")
-    return formatted_string
+    return header + features + sequence
 
   def add_header(self, **kwargs):
     if self.header != None:
       raise ValueError("Contig already has header data")
     header = EMBLHeader(**kwargs)
     self.header = header
+    self.header_details = kwargs
+
+  def calculate_hash(self):
+    # A hash of everything the formatted contig depends on, so that a contig
+    # which hasn't changed since a previous run doesn't need to be formatted again
+    contig_hash = hashlib.sha1()
+    contig_hash.update(repr(sorted(self.header_details.items())))
+    for feature in self.sorted_features():
+      contig_hash.update(repr((feature.feature_type, feature.start, feature.end, feature.strand, feature.attributes)))
+    contig_hash.update(self.sequence.calculate_digest())
+    return contig_hash.hexdigest()
 
   def add_feature(self, sequence_id, **kwargs):
     feature = EMBLFeature(**kwargs)
@@ -43,20 +70,49 @@ class EMBLContig(object):
       # some feature types should be ignored; format() returns None in these cases
       return False
     else:
-      self.features[unique_feature_reference] = feature
+      self.store_feature(unique_feature_reference, feature)
       return True
 
-  def add_sequence(self, sequence_string):
+  def insert_feature(self, sequence_id, feature):
+    # Adds a feature which has already been built, eg one read back from a BinaryAnnotation file
+    unique_feature_reference = "{}_{}_{}_{}".format(sequence_id, feature.feature_type, feature.start, feature.end)
+    if unique_feature_reference in self.features:
+      return False
+    self.store_feature(unique_feature_reference, feature)
+    return True
+
+  def store_feature(self, unique_feature_reference, feature):
+    self.features[unique_feature_reference] = feature
+    self.feature_index.add(feature)
+    self.estimated_size += feature.estimated_size()
+
+  def add_sequence(self, sequence_string, sequence_cache=None, packed=False):
     if self.sequence != None:
       raise ValueError("Contig already has sequence data")
-    sequence = EMBLSequence(sequence_string)
+    sequence = EMBLSequence(sequence_string, sequence_cache, packed)
     self.sequence = sequence
+    self.estimated_size += sequence.estimated_size()
 
   def sorted_features(self):
     # Features should be sorted by start and then by end irrespective of strand
-    def sort_key(feature):
-      return (feature.start, feature.end)
-    return sorted(self.features.values(), key=sort_key)
+    return self.index().sorted_features()
+
+  def overlapping_features(self, start, end):
+    return self.index().overlapping(start, end)
+
+  def features_within(self, start, end):
+    return self.index().within(start, end)
+
+  def features_containing(self, start, end):
+    return self.index().containing(start, end)
+
+  def index(self):
+    # The index is kept up to date by add_feature but features can also be
+    # set directly, in which case it is rebuilt
+    if self.indexed_features is not self.features or len(self.feature_index) != len(self.features):
+      self.feature_index = FeatureIndex(self.features.values())
+      self.indexed_features = self.features
+    return self.feature_index
 
 class EMBLFeature(object):
   inference_to_db_xref_map = {
@@ -66,6 +122,21 @@ class EMBLFeature(object):
           'protein motif:Cdd': "CDD",
           'protein motif:TIGRFAMs': "TIGRFAM"
   }
+  formatting_kernel = _cformat
+  # Source features share most of their qualifiers with every other contig
+  # in a run, the formatted qualifiers are kept here so they're only wrapped once
+  shared_attribute_keys = ()
+  formatted_shared_attributes = {}
+  maximum_formatted_shared_attributes = 1024
+  # Feature types which are dropped rather than converted
+  ignored_feature_types = frozenset(['ncRNA'])
+  # Qualifiers like /inference="ab initio prediction:Prodigal:2.60" and
+  # /transl_table=11 are repeated on thousands of features, so each distinct
+  # (key, value) is kept once here and shared by every feature which has it.
+  # Only the keys are shared for qualifiers which differ on every feature.
+  shared_attributes = {}
+  maximum_shared_attributes = 100000
+  unshared_attribute_keys = frozenset(['locus_tag', 'gene'])
 
   def __init__(self, feature_type, start, end, strand, feature_attributes,
                locus_tag=None, translation_table=11):
@@ -78,10 +149,11 @@ class EMBLFeature(object):
                     translation_table=translation_table)
 
   def pick_feature_builder(self, feature_type):
+    if feature_type in self.ignored_feature_types:
+      return self.create_empty_feature
     feature_builders = {
       'CDS': self.create_CDS_feature,
-      'source': self.create_source_feature,
-      'ncRNA': self.create_empty_feature
+      'source': self.create_source_feature
     }
     return feature_builders.get(feature_type, self.create_default_feature)
 
@@ -95,12 +167,17 @@ class EMBLFeature(object):
     self.attributes = []
     for attribute_key, attribute_value in feature_attributes.items():
       attribute_creator = self.lookup_attribute_creator(attribute_key)
-      new_attributes = attribute_creator(attribute_key, attribute_value)
+      try:
+        new_attributes = attribute_creator(attribute_key, attribute_value)
+      except ValueError as e:
+        # say which attribute it was, for the error report
+        raise QualifierError(attribute_key, e)
       self.attributes += new_attributes
+    self.attributes = self.share_attributes(self.attributes)
 
   def create_CDS_feature(self, **kwargs):
     self.create_default_feature(**kwargs)
-    self.attributes += self.create_translation_table_attributes('transl_table', self.translation_table)
+    self.attributes += self.share_attributes(self.create_translation_table_attributes('transl_table', self.translation_table))
 
   def create_source_feature(self, feature_type, start, end, strand, feature_attributes, locus_tag, translation_table):
     self.feature_type = feature_type
@@ -117,18 +194,43 @@ class EMBLFeature(object):
     # We hard code the order and composition of attributes for source features
     # Source features are only created as part of the header
     self.attributes = [("organism", organism), ("mol_type", "genomic DNA"), ("db_xref", db_xref), ("note", note)]
+    self.shared_attribute_keys = ("organism", "mol_type", "db_xref")
 
   def create_empty_feature(self, **kwargs):
     # Some features should be ignored.  This is how this is done
-    self.format = lambda: None
+    # The type and coordinates are still needed to tell if it's a duplicate
+    self.feature_type = kwargs['feature_type']
+    self.start = kwargs['start']
+    self.end = kwargs['end']
+    self.format = lambda validator=None: None
+
+  def share_attributes(self, attributes):
+    shared_attributes = []
+    for attribute in attributes:
+      if len(self.shared_attributes) >= self.maximum_shared_attributes:
+        self.shared_attributes.clear()
+      attribute_key = attribute[0]
+      if attribute_key in self.unshared_attribute_keys:
+        shared_attributes.append((self.shared_attributes.setdefault(attribute_key, attribute_key), attribute[1]))
+      else:
+        shared_attributes.append(self.shared_attributes.setdefault(attribute, attribute))
+    return shared_attributes
 
-  def format(self):
+  def format(self, validator=None):
     coordinates = self.format_coordinates(self.start, self.end, self.strand)
     header_string = "FT   {feature_type: <16}{coordinates}".format( feature_type=self.feature_type,
                                                                      coordinates=coordinates)
+    if validator != None:
+      validator.feature = "{} {}".format(self.feature_type, coordinates)
+      validator.check(header_string)
     attribute_strings = [header_string]
     for attribute_key,attribute_value in self.attributes:
-      attribute_strings.append(self.format_attribute(attribute_key, attribute_value))
+      attribute_string = self.format_attribute(attribute_key, attribute_value)
+      if validator != None:
+        validator.check(attribute_string, attribute_key)
+      attribute_strings.append(attribute_string)
+    if validator != None:
+      validator.feature = None
 
     return '\n'.join(attribute_strings) + '\n'
 
@@ -136,9 +238,21 @@ class EMBLFeature(object):
     # Looks up a formatter for an attribute and formats the attribute
     # Some attributes are formatted a little differently
     # Also un-escapes the GFF3 mandated percent encoding here
+    if key in self.shared_attribute_keys:
+      return self.format_shared_attribute(key, value)
     formatter = self.lookup_attribute_formatter(key)
     return formatter(key, gff3_unescape(str(value)))
 
+  def format_shared_attribute(self, key, value):
+    formatted_attribute = self.formatted_shared_attributes.get((key, value))
+    if formatted_attribute == None:
+      formatter = self.lookup_attribute_formatter(key)
+      formatted_attribute = formatter(key, gff3_unescape(str(value)))
+      if len(self.formatted_shared_attributes) >= self.maximum_formatted_shared_attributes:
+        self.formatted_shared_attributes.clear()
+      self.formatted_shared_attributes[(key, value)] = formatted_attribute
+    return formatted_attribute
+
   def lookup_attribute_formatter(self, attribute_type):
     formatters = {
       'transl_table': self.number_attribute_formatter,
@@ -150,34 +264,77 @@ class EMBLFeature(object):
 
   def number_attribute_formatter(self, key, value):
     # transl_table attributes do not have their values in quotes
+    attribute_text_template='/{attribute_key}={attribute_value}'
+    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
+    attribute_line = self.wrap_attribute_on_one_line(attribute_text)
+    if attribute_line != None:
+      return attribute_line
     wrapper = TextWrapper()
     wrapper.initial_indent='FT                   '
     wrapper.subsequent_indent='FT                   '
     wrapper.width=80  # can use 80 characters plus the new line
-    attribute_text_template='/{attribute_key}={attribute_value}'
-    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
     return wrapper.fill(attribute_text)
 
   def product_attribute_formatter(self, key, value):
     # Products can include very long enzyme names which we don't want to break
+    attribute_text_template='/{attribute_key}="{attribute_value}"'
+    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
+    attribute_line = self.wrap_attribute_on_one_line(attribute_text)
+    if attribute_line != None:
+      return attribute_line
     wrapper = TextWrapper()
     wrapper.initial_indent='FT                   '
     wrapper.subsequent_indent='FT                   '
     wrapper.width=80  # can use 80 characters plus the new line
     wrapper.break_on_hyphens=True
-    attribute_text_template='/{attribute_key}="{attribute_value}"'
-    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
     return wrapper.fill(attribute_text)
 
   def default_attribute_formatter(self, key, value):
+    attribute_text_template='/{attribute_key}="{attribute_value}"'
+    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
+    attribute_line = self.wrap_attribute_on_one_line(attribute_text)
+    if attribute_line != None:
+      return attribute_line
     wrapper = TextWrapper()
     wrapper.initial_indent='FT                   '
     wrapper.subsequent_indent='FT                   '
     wrapper.width=80  # can use 80 characters plus the new line
-    attribute_text_template='/{attribute_key}="{attribute_value}"'
-    attribute_text=attribute_text_template.format(attribute_key=key, attribute_value=value)
     return wrapper.fill(attribute_text)
 
+  def wrap_attribute_on_one_line(self, attribute_text):
+    # The compiled formatting kernel indents qualifiers which fit on one line,
+    # giving the same line as TextWrapper.  It returns None for the rest.
+    if self.formatting_kernel == None:
+      return None
+    return self.formatting_kernel.wrap_attribute(attribute_text)
+
+  def estimated_size(self):
+    # Roughly how many bytes of memory the feature and its attributes take up
+    return sys.getsizeof(self) + sys.getsizeof(self.__dict__) + self.estimated_attributes_size()
+
+  def estimated_attributes_size(self):
+    # Qualifiers held in shared_attributes are counted once, by
+    # shared_attributes_size, rather than by every feature which has them
+    size = sys.getsizeof(self.attributes)
+    for attribute in self.attributes:
+      if self.shared_attributes.get(attribute) is attribute:
+        continue
+      attribute_key, attribute_value = attribute
+      size += sys.getsizeof(attribute) + sys.getsizeof(attribute_value)
+      if self.shared_attributes.get(attribute_key) is not attribute_key:
+        size += sys.getsizeof(attribute_key)
+    return size
+
+  @classmethod
+  def shared_attributes_size(cls):
+    # The table of shared qualifiers and the qualifiers and keys in it
+    size = sys.getsizeof(cls.shared_attributes)
+    for shared_attribute in cls.shared_attributes:
+      size += sys.getsizeof(shared_attribute)
+      if isinstance(shared_attribute, tuple):
+        size += sum(map(sys.getsizeof, shared_attribute))
+    return size
+
   def format_coordinates(self, start, end, strand):
     if strand == '-':
       return "complement({start}..{end})".format(start=start, end=end)
@@ -307,6 +464,31 @@ class EMBLFeature(object):
     return [('transl_table', attribute_value)]
 
 class EMBLHeader(object):
+  # Everything but the sequence identifier and length is normally the same
+  # for every contig in a run, so those parts of the header are only
+  # formatted once and kept here, keyed by the values they were formatted from
+  shared_blocks = {}
+  maximum_shared_blocks = 1024
+  header_template = """\
+ID   XXX; XXX; {genome_type}; genomic DNA; STD; {classification}; {sequence_length} BP.
+XX
+AC   XXX;
+XX
+AC * _{sequence_identifier}
+XX
+{project_line}
+XX
+DE   XXX;
+XX
+RN   [1]
+{publication_authors}
+{publication_title}
+{publication_name}
+XX
+FH   Key             Location/Qualifiers
+FH
+"""
+
   def __init__(self,
                authors="Pathogen Genomics",
                classification="UNC",
@@ -335,25 +517,6 @@ class EMBLHeader(object):
     source_attributes = self.build_source_attributes(organism, taxon_id, sequence_name)
     self.source_feature = EMBLFeature(feature_type='source', start=1, end=sequence_length,
                                       strand='+', feature_attributes=source_attributes)
-    self.header_template = """\
-ID   XXX; XXX; {genome_type}; genomic DNA; STD; {classification}; {sequence_length} BP.
-XX
-AC   XXX;
-XX
-AC * _{sequence_identifier}
-XX
-{project_line}
-XX
-DE   XXX;
-XX
-RN   [1]
-{publication_authors}
-{publication_title}
-{publication_name}
-XX
-FH   Key             Location/Qualifiers
-FH
-"""
 
   def header_attribute_formatter(self, key, header_text, quote_character, final_character):
     wrapper = TextWrapper()
@@ -369,15 +532,36 @@ FH
   def remove_non_word_characters(self, sequence_identifier):
     return re.sub(r'\W+', '', sequence_identifier)
 
-  def format(self):
+  def format(self, validator=None):
+    before_length, before_identifier, after_identifier = self.format_shared_blocks()
+    header = before_length + str(self.sequence_length) + before_identifier + str(self.sequence_identifier) + after_identifier
+    if validator != None:
+      validator.check(header)
+    return header + self.source_feature.format(validator)
+
+  def format_shared_blocks(self):
+    # The header split either side of the sequence length and identifier
+    shared_values = (self.genome_type, self.classification, self.project, self.authors, self.title, self.publication)
+    shared_blocks = self.shared_blocks.get(shared_values)
+    if shared_blocks != None:
+      return shared_blocks
     project_line = self.header_attribute_formatter("PR", "Project:" + self.project, '', ';' )                              
     publication_authors = self.header_attribute_formatter("RA", self.authors,'',';' )
     publication_title   = self.header_attribute_formatter("RT", self.title,'"',';' )
     publication_name    = self.header_attribute_formatter("RL", self.publication,'','.' )
-    return self.header_template.format(project_line        = project_line, 
-                                       publication_authors = publication_authors, 
-                                       publication_title   = publication_title, 
-                                       publication_name    = publication_name,  **self.__dict__) + self.source_feature.format()
+    header = self.header_template.format(project_line        = project_line, 
+                                         publication_authors = publication_authors, 
+                                         publication_title   = publication_title, 
+                                         publication_name    = publication_name,
+                                         genome_type         = self.genome_type,
+                                         classification      = self.classification,
+                                         sequence_length     = '\0',
+                                         sequence_identifier = '\0')
+    shared_blocks = tuple(header.split('\0'))
+    if len(self.shared_blocks) >= self.maximum_shared_blocks:
+      self.shared_blocks.clear()
+    self.shared_blocks[shared_values] = shared_blocks
+    return shared_blocks
 
   def build_source_attributes(self, organism, taxon_id, sequence_name):
     def empty_string_if_none(value):
@@ -388,15 +572,85 @@ FH
     return {"organism": organism, "db_xref": "taxon:{}".format(taxon_id), "note": sequence_name}
 
 class EMBLSequence(object):
-
-  def __init__(self, sequence_string):
-    nucleotide_counts = self.calculate_nucleotide_counts(sequence_string)
-    self.header = self.format_header(nucleotide_counts)
-    self.body = self.format_sequence_body(sequence_string)
+  sequence_cache = None
+  packed_sequence = None
+  formatting_kernel = _cformat
+  # A packed sequence is unpacked and formatted this many bases at a time, a
+  # multiple of the 60 bases on each line
+  packed_block_size = 60 * 1024
+
+  def __init__(self, sequence_string, sequence_cache=None, packed=False):
+    # The header and body are only formatted when they are needed, so contigs
+    # which are copied from a previous run never have their sequence formatted
+    self.sequence_cache = sequence_cache
     self.length = len(sequence_string)
+    self.formatted_header = None
+    self.formatted_body = None
+    self.digest = None
+    if packed:
+      # held at 2 bits per base, see PackedSequence
+      self.packed_sequence = PackedSequence(sequence_string)
+      self.sequence_string = None
+      self.digest = self.packed_sequence.digest
+    else:
+      self.sequence_string = sequence_string
+
+  @property
+  def header(self):
+    if self.formatted_header == None:
+      if self.packed_sequence != None:
+        nucleotide_counts = dict(self.packed_sequence.nucleotide_counts)
+      else:
+        nucleotide_counts = self.calculate_nucleotide_counts(self.sequence_string)
+      self.formatted_header = self.format_header(nucleotide_counts)
+    return self.formatted_header
+
+  @header.setter
+  def header(self, header):
+    self.formatted_header = header
+
+  @property
+  def body(self):
+    # The body isn't kept once formatted, it is bigger than the sequence itself
+    if self.formatted_body == None:
+      if self.packed_sequence != None:
+        return self.format_packed_sequence_body()
+      return self.format_sequence_body(self.sequence_string)
+    return self.formatted_body
+
+  @body.setter
+  def body(self, body):
+    self.formatted_body = body
 
   def format(self):
-    return self.header + '\n' + self.body
+    if self.sequence_cache == None:
+      return self.header + '\n' + self.body
+    # The assembly is often reused with different annotations so formatted
+    # sequences are cached on disk against a hash of the sequence
+    digest = self.calculate_digest()
+    formatted_sequence = self.sequence_cache.get(digest)
+    if formatted_sequence == None:
+      formatted_sequence = self.header + '\n' + self.body
+      self.sequence_cache.put(digest, formatted_sequence)
+    return formatted_sequence
+
+  def estimated_size(self):
+    if self.packed_sequence != None:
+      return sys.getsizeof(self) + self.packed_sequence.estimated_size()
+    return sys.getsizeof(self) + sys.getsizeof(self.sequence_string)
+
+  def sequence_blocks(self):
+    # The sequence a block at a time, so a packed one is never unpacked in full
+    if self.packed_sequence == None:
+      yield self.sequence_string
+      return
+    for block_start in range(0, self.length, self.packed_block_size):
+      yield self.packed_sequence.unpack(block_start, block_start + self.packed_block_size)
+
+  def calculate_digest(self):
+    if self.digest == None:
+      self.digest = hashlib.sha1(self.sequence_string).hexdigest()
+    return self.digest
 
   def calculate_nucleotide_counts(self, sequence):
     sequence = sequence.lower()
@@ -416,7 +670,20 @@ class EMBLSequence(object):
     nucleotide_counts['total'] = total_counts
     return template.format(**nucleotide_counts)
 
-  def format_sequence_body(self, sequence_string):
+  def format_packed_sequence_body(self):
+    # Only a block of the sequence is unpacked at a time
+    if self.length == 0:
+      return self.format_sequence_body('')
+    formatted_blocks = []
+    for block_start in range(0, self.length, self.packed_block_size):
+      block = self.packed_sequence.unpack(block_start, block_start + self.packed_block_size)
+      formatted_blocks.append(self.format_sequence_body(block, block_start))
+    return ''.join(formatted_blocks)
+
+  def format_sequence_body(self, sequence_string, offset=0):
+    # offset is the position of the first base, for formatting part of a sequence
+    if self.formatting_kernel != None:
+      return self.formatting_kernel.format_sequence_body(sequence_string, offset)
     sequence_string = sequence_string.lower()
     lines = self.split_sequence(sequence_string)
     def format_a_line(line):
@@ -425,7 +692,7 @@ class EMBLSequence(object):
       # and should look like
       # "     1234567890 12345                                                         15"
       blocks_of_sequence, end_of_line = line
-      format_arguments = blocks_of_sequence + [end_of_line]
+      format_arguments = blocks_of_sequence + [end_of_line + offset]
       return "     {:<10} {:<10} {:<10} {:<10} {:<10} {:<10} {:>9}".format(*format_arguments)
     formatted_lines = map(format_a_line, lines)
     return '\n'.join(formatted_lines) + '\n'
@@ -1,33 +1,59 @@
 import gff3toembl
 from gt import CustomVisitor
-from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.EMBLContig import EMBLContig, EMBLFeature
 
 class EMBLConverter(CustomVisitor):
 
-    def __init__(self, locus_tag=None, translation_table=11):
+    def __init__(self, locus_tag=None, translation_table=11, sequence_cache=None, contigs=None, pack_sequences=False):
         CustomVisitor.__init__(self)
-        self.contigs = {}
+        # contigs can be a ContigStore to limit how much is held in memory
+        self.contigs = contigs if contigs != None else {}
         self.locus_tag = locus_tag
         self.translation_table = translation_table
+        self.sequence_cache = sequence_cache
+        self.pack_sequences = pack_sequences
+        self.contig_complete_callback = None
+        # with an ErrorReport a feature or sequence which can't be added is
+        # reported and its contig left out, rather than stopping the conversion
+        self.error_report = None
+        self.features_parsed = 0
+        self.sequences_parsed = 0
 
     def visit_feature_node(self, feature_node):
-      sequence_id = feature_node.get_seqid()
-      contig = self.contigs.get(sequence_id)
-      if contig: # contig already exists, just try and update it
-        contig.add_feature(sequence_id = sequence_id, feature_type = feature_node.get_type(), start = feature_node.get_start(),
-                           end = feature_node.get_end(), strand = feature_node.get_strand(),
-                           feature_attributes = feature_node.attribs,
-                           locus_tag = self.locus_tag, translation_table = self.translation_table)
+      self.add_feature_record(*self.feature_record(feature_node))
+
+    def feature_record(self, feature_node):
+      # Every field of a feature node, pulled out of GT with as few calls
+      # through ctypes as possible: one get_range() for both coordinates, and
+      # no attributes, which GT passes back one at a time, for feature types
+      # which are going to be ignored anyway
+      feature_type = feature_node.get_type()
+      feature_range = feature_node.get_range()
+      if feature_type in EMBLFeature.ignored_feature_types:
+        feature_attributes = {}
       else:
+        feature_attributes = feature_node.attribs
+      return (feature_node.get_seqid(), feature_type, feature_range.start, feature_range.end,
+              feature_node.get_strand(), feature_attributes)
+
+    def add_feature_record(self, sequence_id, feature_type, start, end, strand, feature_attributes):
+      self.features_parsed += 1
+      contig = self.contigs.get(sequence_id)
+      new_contig = contig == None
+      if new_contig:
         contig = EMBLContig()
-        successfully_added_feature = contig.add_feature(sequence_id = sequence_id, feature_type = feature_node.get_type(), start = feature_node.get_start(),
-                           end = feature_node.get_end(), strand = feature_node.get_strand(),
-                           feature_attributes = feature_node.attribs,
+      try:
+        successfully_added_feature = contig.add_feature(sequence_id = sequence_id, feature_type = feature_type, start = start,
+                           end = end, strand = strand, feature_attributes = feature_attributes,
                            locus_tag = self.locus_tag, translation_table = self.translation_table)
-        if successfully_added_feature:
-          self.contigs[sequence_id] = contig
-        else:
-          pass # discard the contig because we didn't add a feature so it is empty
+      except Exception as e:
+        if self.error_report == None:
+          raise
+        self.error_report.add(sequence_id, "{} {}..{}".format(feature_type, start, end), getattr(e, 'qualifier', None), e)
+        successfully_added_feature = False
+      # a new contig is discarded if we didn't add a feature as it is empty
+      if successfully_added_feature or not new_contig:
+        self.contigs[sequence_id] = contig
 
     def visit_region_node(self, region_node):
         pass  # for now
@@ -36,6 +62,16 @@ class EMBLConverter(CustomVisitor):
         pass  # for now
 
     def visit_sequence_node(self, sequence_node):
+      self.sequences_parsed += 1
       sequence_id = sequence_node.get_description()
       contig = self.contigs.setdefault(sequence_id, EMBLContig())
-      contig.add_sequence(sequence_node.get_sequence())
+      try:
+        contig.add_sequence(sequence_node.get_sequence(), self.sequence_cache, self.pack_sequences)
+      except Exception as e:
+        if self.error_report == None:
+          raise
+        self.error_report.add(sequence_id, None, None, e)
+      self.contigs[sequence_id] = contig
+      # sequences come after all of the features so the contig is now complete
+      if self.contig_complete_callback != None:
+        self.contig_complete_callback(sequence_id, contig)
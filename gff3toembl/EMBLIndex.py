@@ -0,0 +1,115 @@
+import os
+from collections import OrderedDict
+
+class EMBLIndex(object):
+    # A sidecar file next to an EMBL file giving the byte offset and length of
+    # each contig's record, so a single record can be read or replaced by
+    # seeking to it rather than reading the file from the top.  It is written
+    # as the EMBL file is written, one tab separated line per contig:
+    #
+    #   sequence_identifier  offset  length  sequence_length  features
+    #
+    # Records are in the order they appear in the EMBL file.
+
+    suffix = ".index"
+    header = "#sequence_identifier\toffset\tlength\tsequence_length\tfeatures\n"
+    copy_buffer_size = 1024 * 1024
+
+    def __init__(self, embl_filename, index_filename = None):
+        self.embl_filename  = embl_filename
+        self.index_filename = index_filename if index_filename != None else str(embl_filename) + self.suffix
+        self.records        = OrderedDict() # sequence identifier: [offset, length, sequence length, features]
+        self.offset         = 0
+
+    def add(self, sequence_identifier, length, sequence_length, number_of_features):
+        # Records are added in the order they are written
+        if sequence_identifier in self.records:
+            raise ValueError("Contig {} is already in the index".format(sequence_identifier))
+        self.records[sequence_identifier] = [self.offset, length, sequence_length, number_of_features]
+        self.offset += length
+
+    def write(self):
+        # Replaced in one go so a reader never sees a partial index
+        temporary_filename = self.index_filename + ".tmp"
+        with open(temporary_filename, 'w') as index_file:
+            index_file.write(self.header)
+            for sequence_identifier, (offset, length, sequence_length, number_of_features) in self.records.items():
+                index_file.write("{}\t{}\t{}\t{}\t{}\n".format(sequence_identifier, offset, length, sequence_length, number_of_features))
+        os.rename(temporary_filename, self.index_filename)
+
+    def read(self):
+        self.records = OrderedDict()
+        self.offset = 0
+        with open(self.index_filename, 'r') as index_file:
+            for line in index_file:
+                if line.startswith('#') or line.strip() == '':
+                    continue
+                try:
+                    sequence_identifier, offset, length, sequence_length, number_of_features = line.rstrip('\n').split('\t')
+                    self.records[sequence_identifier] = [int(offset), int(length), int(sequence_length), int(number_of_features)]
+                except ValueError:
+                    raise ValueError("Could not read {}, malformed line: {}".format(self.index_filename, line.rstrip('\n')))
+                self.offset = max(self.offset, int(offset) + int(length))
+        # the last record has to end at the end of the file, otherwise the EMBL file has changed since
+        if self.offset != os.path.getsize(self.embl_filename):
+            raise ValueError("{} is out of date, {} is {} bytes but the index covers {}".format(
+                self.index_filename, self.embl_filename, os.path.getsize(self.embl_filename), self.offset))
+        return self
+
+    def sequence_identifiers(self):
+        return list(self.records.keys())
+
+    def record(self, sequence_identifier):
+        # (offset, length, sequence length, features)
+        if sequence_identifier not in self.records:
+            raise KeyError("Contig {} is not in {}".format(sequence_identifier, self.index_filename))
+        return tuple(self.records[sequence_identifier])
+
+    def fetch(self, sequence_identifier):
+        # The contig's record, from its ID line to the closing //
+        offset, length, sequence_length, number_of_features = self.record(sequence_identifier)
+        with open(self.embl_filename, 'r') as embl_file:
+            embl_file.seek(offset)
+            block = embl_file.read(length)
+        if len(block) != length or not block.startswith("ID   ") or not block.endswith("//\n"):
+            raise ValueError("{} does not match {}, the record for {} is not where it should be".format(
+                self.index_filename, self.embl_filename, sequence_identifier))
+        return block
+
+    def rewrite(self, sequence_identifier, block, sequence_length = None, number_of_features = None):
+        # Replaces a contig's record.  One the same length is overwritten in
+        # place; otherwise the records after it are copied into a new file,
+        # which then replaces the old one, and their offsets are moved along.
+        if not block.endswith("//\n"):
+            raise ValueError("The record for {} has to end with //".format(sequence_identifier))
+        offset, length, previous_sequence_length, previous_number_of_features = self.record(sequence_identifier)
+        if len(block) == length:
+            with open(self.embl_filename, 'r+') as embl_file:
+                embl_file.seek(offset)
+                embl_file.write(block)
+        else:
+            temporary_filename = self.embl_filename + ".tmp"
+            with open(self.embl_filename, 'r') as embl_file:
+                with open(temporary_filename, 'w') as temporary_file:
+                    self.copy(embl_file, temporary_file, offset)
+                    temporary_file.write(block)
+                    embl_file.seek(offset + length)
+                    self.copy(embl_file, temporary_file, self.offset - offset - length)
+            os.rename(temporary_filename, self.embl_filename)
+            shift = len(block) - length
+            for record in self.records.values():
+                if record[0] > offset:
+                    record[0] += shift
+            self.offset += shift
+        self.records[sequence_identifier] = [offset, len(block),
+                                             sequence_length if sequence_length != None else previous_sequence_length,
+                                             number_of_features if number_of_features != None else previous_number_of_features]
+        self.write()
+
+    def copy(self, input_file, output_file, length):
+        while length > 0:
+            data = input_file.read(min(length, self.copy_buffer_size))
+            if not data:
+                break
+            output_file.write(data)
+            length -= len(data)
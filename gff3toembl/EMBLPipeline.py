@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import threading
+from gff3toembl.EMBLIndex import EMBLIndex
+from Queue import Queue
+
+def format_contig(contig):
+    # Runs in a worker process so it has to be a plain function
+    return contig.format() + "//\n"
+
+class EMBLPipeline(object):
+    # Overlaps parsing, formatting and writing instead of running them one
+    # after the other.  GFF3 puts the sequences at the end of the file so a
+    # contig is complete as soon as its sequence has been parsed; it is then
+    # handed to a pool of worker processes to be formatted while parsing
+    # carries on, and a writer thread writes the formatted contigs out in the
+    # order they were handed over.  Both hand overs go through a bounded queue
+    # so a slow stage holds back the ones before it rather than memory filling up.
+    #
+    # Contigs are normally parsed in sorted order, in which case the written
+    # file is simply renamed to the output file.  Otherwise the contigs are
+    # copied into the output file in sorted order at the end.
+
+    def __init__(self, emblwriter, workers = 2, queue_size = 16):
+        self.emblwriter         = emblwriter
+        self.workers            = workers
+        self.queue_size         = queue_size
+        self.output_filename    = emblwriter.output_filename
+        self.temporary_filename = str(emblwriter.output_filename) + ".tmp"
+        self.written_contigs    = []
+        self.submitted_contigs  = set()
+        self.contig_sizes       = {} # sequence length and number of features, for the index
+        self.accessions         = {} # for the chromosome list
+        self.error              = None
+
+    def run(self, visitor_stream):
+        converter = self.emblwriter.conv
+        # start the workers before parsing so they don't get a copy of the parsed contigs
+        self.pool = multiprocessing.Pool(self.workers)
+        self.write_queue = Queue(self.queue_size)
+        writer_thread = threading.Thread(target=self.write_contigs)
+        writer_thread.start()
+        converter.contig_complete_callback = self.submit_contig
+        parsed = False
+        try:
+            while (visitor_stream.next_tree()):
+                self.emblwriter.progress.parsing(converter.features_parsed, converter.sequences_parsed)
+            # anything left over has no sequence, which is reported when its header is added
+            for sequence_identifier in sorted(converter.contigs.keys()):
+                self.submit_contig(sequence_identifier, converter.contigs[sequence_identifier])
+            parsed = True
+        finally:
+            converter.contig_complete_callback = None
+            self.write_queue.put(None)
+            writer_thread.join()
+            self.pool.close()
+            self.pool.join()
+            if not parsed or self.error != None:
+                os.remove(self.temporary_filename)
+        if self.error != None:
+            raise self.error
+        self.finish()
+
+    def submit_contig(self, sequence_identifier, contig):
+        if self.error != None:
+            raise self.error
+        if sequence_identifier in self.submitted_contigs:
+            raise ValueError("Contig already has sequence data")
+        self.emblwriter.add_contig_header(sequence_identifier, contig, self.emblwriter.organism, self.emblwriter.taxonid, self.emblwriter.project,
+                                          self.emblwriter.authors, self.emblwriter.title, self.emblwriter.publication,
+                                          self.emblwriter.genome_type, self.emblwriter.classification)
+        formatted_contig = self.pool.apply_async(format_contig, (contig,))
+        self.contig_sizes[sequence_identifier] = (contig.sequence.length, len(contig.features))
+        self.accessions[sequence_identifier] = contig.header.sequence_identifier
+        self.write_queue.put((sequence_identifier, formatted_contig))
+        # the worker has its own copy now so the parsed contig can be freed
+        self.submitted_contigs.add(sequence_identifier)
+        del self.emblwriter.conv.contigs[sequence_identifier]
+
+    def write_contigs(self):
+        offset = 0
+        with open(self.temporary_filename, 'w') as output_file:
+            while True:
+                queued_contig = self.write_queue.get()
+                if queued_contig == None:
+                    break
+                if self.error != None:
+                    continue # keep emptying the queue so the parser isn't blocked
+                sequence_identifier, formatted_contig = queued_contig
+                try:
+                    block = formatted_contig.get()
+                    output_file.write(block)
+                except Exception as e:
+                    self.error = e
+                    continue
+                self.written_contigs.append((sequence_identifier, offset, len(block)))
+                offset += len(block)
+                # the number of contigs isn't known until parsing has finished
+                self.emblwriter.progress.writing(len(self.written_contigs), None, offset)
+
+    def finish(self):
+        sorted_contigs = sorted(self.written_contigs)
+        self.emblwriter.written_contigs = [(self.accessions[sequence_identifier], self.contig_sizes[sequence_identifier][0])
+                                           for sequence_identifier, offset, length in sorted_contigs]
+        if self.emblwriter.index:
+            self.write_index(sorted_contigs)
+        if sorted_contigs == self.written_contigs:
+            os.rename(self.temporary_filename, self.output_filename)
+            return
+        # sorted into a second temporary file, so the output only appears once complete
+        with open(self.temporary_filename, 'r') as temporary_file:
+            with open(self.temporary_filename + ".sorted", 'w') as output_file:
+                for sequence_identifier, offset, length in sorted_contigs:
+                    temporary_file.seek(offset)
+                    output_file.write(temporary_file.read(length))
+        os.remove(self.temporary_filename)
+        os.rename(self.temporary_filename + ".sorted", self.output_filename)
+
+    def write_index(self, sorted_contigs):
+        # The output file has the contigs in sorted order, whatever order they were written in
+        embl_index = EMBLIndex(self.output_filename)
+        for sequence_identifier, offset, length in sorted_contigs:
+            sequence_length, number_of_features = self.contig_sizes[sequence_identifier]
+            embl_index.add(sequence_identifier, length, sequence_length, number_of_features)
+        embl_index.write()
@@ -4,19 +4,36 @@ from gt import GFF3InStream
 import os
 import re
 
+from gff3toembl.BinaryAnnotation import BinaryAnnotation
+from gff3toembl.ContigCache import ContigCache
+from gff3toembl.ContigStore import ContigStore
 from gff3toembl.EMBLConverter import EMBLConverter
+from gff3toembl.EMBLIndex import EMBLIndex
+from gff3toembl.EMBLPipeline import EMBLPipeline
+from gff3toembl.ErrorReport import ErrorReport
+from gff3toembl.GFF3Index import GFF3Index
+from gff3toembl.GFF3Sorter import GFF3Sorter
+from gff3toembl.LineLengthValidator import LineLengthValidator
+from gff3toembl.MemoryReport import MemoryReport
+from gff3toembl.OutputFile import OutputFile
+from gff3toembl.ProgressReporter import ProgressReporter
+from gff3toembl.SequenceCache import SequenceCache
+from gff3toembl.ShardedOutput import ShardedOutput
 from gff3toembl.VisitorStream import VisitorStream
 
 class EMBLWriter(object):
 
-    def __init__(self, gff3_file, organism, taxonid, project, description, authors, title,  publication, genome_type, classification,  output_filename, locus_tag = None, translation_table = 11, chromosome_list = None):
+    def __init__(self, gff3_file, organism, taxonid, project, description, authors, title,  publication, genome_type, classification,  output_filename, locus_tag = None, translation_table = 11, chromosome_list = None, sort_memory_budget = None, assume_sorted = False, incremental = False, sequence_cache_directory = None, sequence_cache_size = 1024*1024*1024, shards = None, shard_by_replicon = False, workers = 1, pipeline = False, memory_budget = None, save_parsed = None, memory_report = None, memory_report_contigs = 10, progress = None, collect_line_length_errors = False, pack_sequences = False, index = False, seqids = None, error_report = None, compress = False, checksums = False, webin_manifest = None, webin_manifest_fields = None):
         self.locus_tag          = locus_tag
         self.translation_table  = translation_table
-        self.conv               = EMBLConverter(locus_tag, translation_table)
+        self.sequence_cache     = SequenceCache(sequence_cache_directory, sequence_cache_size) if sequence_cache_directory else None
+        self.contig_store       = ContigStore(memory_budget) if memory_budget else None
+        self.conv               = EMBLConverter(locus_tag, translation_table, self.sequence_cache, self.contig_store, pack_sequences)
         self.gff3_file          = gff3_file
         self.organism           = organism
         self.taxonid            = taxonid
         self.project            = project
+        self.description        = description
         self.authors            = authors
         self.title              = title
         self.publication        = publication
@@ -24,48 +41,146 @@ class EMBLWriter(object):
         self.classification     = classification
         self.output_filename    = output_filename
         self.chromosome_list    = chromosome_list
+        self.sort_memory_budget = sort_memory_budget
+        self.assume_sorted      = assume_sorted
+        self.incremental        = incremental
+        self.shards             = shards
+        self.shard_by_replicon  = shard_by_replicon
+        self.workers            = workers
+        self.pipeline           = pipeline
+        self.save_parsed        = save_parsed
+        self.memory_report      = memory_report
+        self.memory_report_contigs = memory_report_contigs
+        self.progress           = progress if progress != None else ProgressReporter()
+        self.collect_line_length_errors = collect_line_length_errors
+        self.pack_sequences     = pack_sequences
+        self.index              = index
+        self.seqids             = seqids
+        # contigs which can't be converted are listed here instead of stopping the conversion
+        self.error_report       = ErrorReport(error_report) if error_report != None else None
+        self.conv.error_report  = self.error_report
+        self.compress           = compress
+        self.checksums          = checksums
+        self.webin_manifest     = webin_manifest
+        self.webin_manifest_fields = webin_manifest_fields if webin_manifest_fields != None else []
+        # (accession, sequence length) of each contig in the order written, for the chromosome list
+        self.written_contigs    = []
+        self.subset_gff_file    = None
         self.fixed_gff_file     = str(self.gff3_file)+"_fixed.gff"
 
     def create_output_file(self, organism, taxonid, project, authors, title, publication, genome_type, classification):
-        target = open(self.output_filename, 'w')
-        for sequence_identifier, contig in sorted(self.conv.contigs.items()):
-            contig.add_header(
-              authors = authors,
-              classification = classification,
-              genome_type = genome_type,
-              organism = organism,
-              project = project,
-              publication = publication,
-              sequence_identifier = sequence_identifier,
-              sequence_length = contig.sequence.length,
-              sequence_name = sequence_identifier,
-              taxon_id = taxonid,
-              title = title,
-            )
-            target.write(contig.format())
-            target.write("//\n")
-        target.close()
-
-    def create_chromosome_list(self, chromosome_list_filename, embl_filename):
-        if chromosome_list_filename == None:
-          return
-        if not os.path.exists(embl_filename):
-          return
+        # Written to a temporary file which is renamed into place once it is
+        # complete, so an output file which exists is never partly written
+        temporary_filename = self.output_filename + ".tmp"
+        if self.incremental:
+          # the previous output is read from while the new one is written
+          cache = ContigCache(self.output_filename)
+        # compressed and checksummed as it is written, rather than read back to do it afterwards
+        target = OutputFile(temporary_filename, self.compress, self.checksums)
+        # Either stop at the first line which is too long, or write everything
+        # and then list all of the long lines
+        validator = LineLengthValidator(collect = True) if self.collect_line_length_errors else None
+        # the offsets of the records are known as they're written, so the index costs nothing extra
+        embl_index = EMBLIndex(self.output_filename) if self.index else None
+        # contigs are fetched one at a time as they may have been spilled to disk
+        sequence_identifiers = sorted(self.conv.contigs.keys())
+        bytes_written = 0
+        try:
+          for contigs_written, sequence_identifier in enumerate(sequence_identifiers, 1):
+              contig = self.conv.contigs[sequence_identifier]
+              self.add_contig_header(sequence_identifier, contig, organism, taxonid, project, authors, title, publication, genome_type, classification)
+              if self.error_report != None:
+                block = self.format_isolated_contig(sequence_identifier, contig, cache if self.incremental else None)
+                if block == None:
+                  continue
+              elif self.incremental:
+                block = cache.format_contig(sequence_identifier, contig, validator)
+              else:
+                block = contig.format(validator) + "//\n"
+              target.write(block)
+              bytes_written += len(block)
+              self.written_contigs.append((contig.header.sequence_identifier, contig.sequence.length))
+              if embl_index != None:
+                embl_index.add(sequence_identifier, len(block), contig.sequence.length, len(contig.features))
+              self.progress.writing(contigs_written, len(sequence_identifiers), bytes_written)
+          target.close()
+        except:
+          target.close()
+          os.remove(temporary_filename)
+          raise
+        if self.incremental:
+          cache.close()
+        os.rename(temporary_filename, self.output_filename)
+        if self.checksums:
+          target.write_checksums(self.output_filename)
+        if self.incremental:
+          # an output file with long lines or left out contigs isn't cached, so it is checked again next time
+          if (validator == None or not validator.violations) and (self.error_report == None or not self.error_report.errors):
+            cache.save()
+        if embl_index != None:
+          embl_index.write()
+        if validator != None:
+          validator.raise_violations()
 
-        embl_file = open(embl_filename, 'r')
-        chromosome_list_file = open(chromosome_list_filename, 'w')
-        object_accessions = []
-        object_sizes = []
+    def format_isolated_contig(self, sequence_identifier, contig, cache):
+        # The contig's record, or None if it can't be converted, once the reasons
+        # why are added to the error report
+        if self.error_report.failed(sequence_identifier):
+          # one of its features couldn't be parsed
+          return None
+        validator = LineLengthValidator(collect = True)
+        try:
+          if cache != None:
+            block = cache.format_contig(sequence_identifier, contig, validator)
+          else:
+            block = contig.format(validator) + "//\n"
+        except Exception as e:
+          self.error_report.add(sequence_identifier, validator.feature, getattr(e, 'qualifier', None), e)
+          return None
+        if validator.violations:
+          self.error_report.add_line_length_violations(validator.violations)
+          return None
+        return block
 
-        for embl_line in embl_file.readlines():
-          sequence_size_match = re.search("; (\d+) BP.", embl_line)
-          if sequence_size_match != None and sequence_size_match.group(1):
-            object_sizes.append(int(sequence_size_match.group(1)))
-          m = re.match("AC \* _(\w+)", embl_line)
-          if m != None and m.group(1):
-            object_accessions.append(m.group(1))
+    def add_contig_header(self, sequence_identifier, contig, organism, taxonid, project, authors, title, publication, genome_type, classification):
+        contig.add_header(
+          authors = authors,
+          classification = classification,
+          genome_type = genome_type,
+          organism = organism,
+          project = project,
+          publication = publication,
+          sequence_identifier = sequence_identifier,
+          # a contig without a sequence fails when it is formatted, with a clearer error
+          sequence_length = contig.sequence.length if contig.sequence != None else 0,
+          sequence_name = sequence_identifier,
+          taxon_id = taxonid,
+          title = title,
+        )
 
-        for index, object_accession in enumerate(object_accessions):
+    def create_sharded_output_files(self, organism, taxonid, project, authors, title, publication, genome_type, classification):
+        sorted_contigs = [(sequence_identifier, self.conv.contigs[sequence_identifier]) for sequence_identifier in sorted(self.conv.contigs.keys())]
+        for sequence_identifier, contig in sorted_contigs:
+            self.add_contig_header(sequence_identifier, contig, organism, taxonid, project, authors, title, publication, genome_type, classification)
+        # concatenating the shards in order gives the sorted contigs
+        self.written_contigs = [(contig.header.sequence_identifier, contig.sequence.length) for sequence_identifier, contig in sorted_contigs]
+        number_of_shards = None if self.shard_by_replicon else self.shards
+        return ShardedOutput(self.output_filename, number_of_shards, self.workers, self.progress, self.index).write(sorted_contigs)
+
+    def write_memory_report(self):
+        # Written after parsing, when the most memory is held
+        report = MemoryReport(self.memory_report_contigs)
+        spilled_contigs = self.contig_store.spilled if self.contig_store != None else ()
+        report.add_contigs(self.conv.contigs, spilled_contigs)
+        report.write_file(self.memory_report)
+
+    def create_chromosome_list(self, chromosome_list_filename):
+        # From the contigs as they were written, so the EMBL file isn't read back
+        if chromosome_list_filename == None:
+          return
+
+        chromosome_list_file = OutputFile(chromosome_list_filename + ".tmp", self.compress)
+        for index, (object_accession, object_size) in enumerate(self.written_contigs):
           chromosome_name = str((index+1))
           # TODO make it work for more than just Bacteria
           chromosome_type = "Chromosome"
@@ -73,9 +188,26 @@ class EMBLWriter(object):
           chr_name_search = re.search("chr", object_accession)
           if chr_name_search != None and chr_name_search.group():
             chromosome_type = "Chromosome"
-          elif index > 0 and object_sizes[index] < 1000000:
+          elif index > 0 and object_size < 1000000:
             chromosome_type = "Plasmid"
           chromosome_list_file.write(object_accession + "\t" + chromosome_name + "\t" + chromosome_type + "\n")
+        chromosome_list_file.close()
+        os.rename(chromosome_list_filename + ".tmp", chromosome_list_filename)
+
+    def create_webin_manifest(self, manifest_filename):
+        # A Webin-CLI genome manifest for submitting the output to ENA.  Files
+        # are given relative to the manifest, which Webin-CLI reads them from.
+        manifest_directory = os.path.dirname(os.path.abspath(manifest_filename))
+        fields = [('STUDY', self.project), ('ASSEMBLYNAME', self.description)]
+        given_fields = [field_name for field_name, value in self.webin_manifest_fields]
+        fields = [(field_name, value) for field_name, value in fields if field_name not in given_fields] + self.webin_manifest_fields
+        fields.append(('FLATFILE', os.path.relpath(os.path.abspath(self.output_filename), manifest_directory)))
+        if self.chromosome_list != None:
+          fields.append(('CHROMOSOME_LIST', os.path.relpath(os.path.abspath(self.chromosome_list), manifest_directory)))
+        with open(manifest_filename + ".tmp", 'w') as manifest_file:
+          for field_name, value in fields:
+            manifest_file.write("{}\t{}\n".format(field_name, value))
+        os.rename(manifest_filename + ".tmp", manifest_filename)
 
     def sort_and_tidy_gff_file(self):
         try:
@@ -83,17 +215,122 @@ class EMBLWriter(object):
         except:
           sys.exit("Failed to sort and tidy gff file with GT")
 
-    def parse_and_run(self):
-        self.sort_and_tidy_gff_file()
+    def external_sort_gff_file(self):
+        # GT sorts in memory, so large files are sorted in chunks of at most
+        # sort_memory_budget bytes instead and GT is only used to tidy them while parsing
+        try:
+          GFF3Sorter(self.sort_memory_budget).sort(self.gff3_file, self.fixed_gff_file)
+        except (IOError, OSError, ValueError) as e:
+          sys.exit("Failed to sort gff file: " + str(e))
+
+    def gff_file_is_sorted(self):
+        try:
+          return GFF3Sorter().is_sorted(self.gff3_file)
+        except ValueError:
+          # let GT report the malformed line when it sorts the file
+          return False
+
+    def open_gff_stream(self):
+        if self.assume_sorted and self.gff_file_is_sorted():
+          # already sorted, so parse the original file without rewriting it
+          ins = GFF3InStream(self.gff3_file)
+          ins.enable_tidy_mode()
+          return ins
+        if self.sort_memory_budget == None:
+          self.sort_and_tidy_gff_file()
+          return GFF3InStream(self.fixed_gff_file)
+        self.external_sort_gff_file()
         ins = GFF3InStream(self.fixed_gff_file)
+        ins.enable_tidy_mode()
+        return ins
+
+    def extract_seqids(self):
+        # Only the requested sequences are converted, so they are copied out of
+        # the GFF3 file on their own using its GFF3Index.  The copy is next to
+        # the output so that workers converting different sequences from the
+        # same file don't get in each other's way.
+        self.subset_gff_file = str(self.output_filename) + "_subset.gff"
+        try:
+          GFF3Index(self.gff3_file).load().write_subset(self.seqids, self.subset_gff_file)
+        except (IOError, OSError, ValueError) as e:
+          sys.exit("Failed to extract sequences from gff file: " + str(e))
+        self.gff3_file = self.subset_gff_file
+        self.fixed_gff_file = self.subset_gff_file + "_fixed.gff"
+
+    def remove_other_seqids(self):
+        # A saved BinaryAnnotation file has all of the contigs in it.  A seqid
+        # which isn't one of them is an error, as it is for a GFF3 file.
+        missing_seqids = [seqid for seqid in self.seqids if seqid not in self.conv.contigs]
+        if missing_seqids:
+          sys.exit("Failed to extract sequences from saved annotation file: Could not find {} in {}".format(
+            ', '.join(missing_seqids), self.gff3_file))
+        for sequence_identifier in list(self.conv.contigs.keys()):
+          if sequence_identifier not in self.seqids:
+            del self.conv.contigs[sequence_identifier]
+
+    def parse_gff_file(self):
+        if self.seqids != None:
+          self.extract_seqids()
+        ins = self.open_gff_stream()
         vs = VisitorStream(ins, self.conv)
         try:
-            while (vs.next_tree()):
-                pass
+            if self.pipeline:
+                EMBLPipeline(self, self.workers).run(vs)
+            else:
+                while (vs.next_tree()):
+                    self.progress.parsing(self.conv.features_parsed, self.conv.sequences_parsed)
         except Exception as e:
             print(e)
+            self.progress.failed(e)
+            if self.error_report != None:
+              # the GFF3 file itself couldn't be read, so no contigs are converted
+              self.error_report.add(None, None, None, e)
+              self.error_report.write()
             exit(1)
-        self.create_output_file(self.organism, self.taxonid, self.project, self.authors, self.title, self.publication, self.genome_type, self.classification)
-        self.create_chromosome_list(self.chromosome_list, self.output_filename)
-        os.remove(self.fixed_gff_file)
+
+    def remove_temporary_files(self):
+        # The spilled contigs can take up gigabytes, so they are removed
+        # whether or not the conversion worked
+        if self.contig_store != None:
+          self.contig_store.close()
+        if os.path.exists(self.fixed_gff_file):
+          os.remove(self.fixed_gff_file)
+        if self.subset_gff_file != None and os.path.exists(self.subset_gff_file):
+          os.remove(self.subset_gff_file)
+
+    def parse_and_run(self):
+        try:
+          # The input can also be a BinaryAnnotation file saved by an earlier run
+          binary_annotation = BinaryAnnotation(self.gff3_file)
+          binary_input = binary_annotation.is_binary_annotation()
+          if binary_input:
+            binary_annotation.read(self.conv.contigs, self.locus_tag, self.translation_table, self.sequence_cache, self.pack_sequences)
+            if self.seqids != None:
+              self.remove_other_seqids()
+          else:
+            self.parse_gff_file()
+          if self.save_parsed != None:
+            BinaryAnnotation(self.save_parsed).write(self.conv.contigs)
+          if self.memory_report != None:
+            self.write_memory_report()
+          if self.pipeline and not binary_input:
+            # the output was written while parsing
+            pass
+          elif self.shards or self.shard_by_replicon:
+            self.create_sharded_output_files(self.organism, self.taxonid, self.project, self.authors, self.title, self.publication, self.genome_type, self.classification)
+          else:
+            self.create_output_file(self.organism, self.taxonid, self.project, self.authors, self.title, self.publication, self.genome_type, self.classification)
+          self.create_chromosome_list(self.chromosome_list)
+          if self.webin_manifest != None and (self.error_report == None or not self.error_report.errors):
+            # not for an output with contigs left out, which shouldn't be submitted
+            self.create_webin_manifest(self.webin_manifest)
+        finally:
+          self.remove_temporary_files()
+        if self.error_report != None:
+          self.error_report.write()
+          if self.error_report.errors:
+            # the good contigs have been written, but the conversion still failed
+            self.progress.failed(self.error_report.summary())
+            sys.exit(self.error_report.summary())
+        self.progress.finished()
 
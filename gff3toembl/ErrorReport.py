@@ -0,0 +1,64 @@
+import os
+
+class QualifierError(ValueError):
+    # Raised for a GFF3 attribute which can't be made into a qualifier, saying which
+    def __init__(self, qualifier, error):
+        self.qualifier = qualifier
+        ValueError.__init__(self, str(error))
+
+class ConversionError(object):
+    def __init__(self, contig, feature, qualifier, message):
+        self.contig    = contig
+        self.feature   = feature
+        self.qualifier = qualifier
+        self.message   = message
+
+class ErrorReport(object):
+    # The contigs which couldn't be converted and why, so that one bad feature
+    # doesn't stop the rest of the contigs being written.  A contig with a
+    # feature which can't be parsed, or which can't be formatted, is left out
+    # of the output and listed in a tab separated file:
+    #
+    #   contig  feature  qualifier  error
+    #
+    # with a line for each problem found; a long line is one for every line
+    # over 80 characters in the contig, as collected by LineLengthValidator.
+    # Columns which don't apply are -.
+
+    header = "#contig\tfeature\tqualifier\terror\n"
+
+    def __init__(self, report_filename):
+        self.report_filename = report_filename
+        self.errors          = []
+        self.failed_contigs  = set()
+
+    def add(self, contig, feature, qualifier, error):
+        self.errors.append(ConversionError(contig, feature, qualifier, str(error)))
+        if contig != None:
+            self.failed_contigs.add(contig)
+
+    def add_line_length_violations(self, violations):
+        for violation in violations:
+            self.add(violation.contig, violation.feature, violation.qualifier,
+                     "line of {} characters: {}".format(len(violation.line), violation.line))
+
+    def failed(self, contig):
+        return contig in self.failed_contigs
+
+    def summary(self):
+        return "Could not convert {} contig(s), {} error(s) listed in {}".format(
+            len(self.failed_contigs), len(self.errors), self.report_filename)
+
+    def write(self):
+        temporary_filename = self.report_filename + ".tmp"
+        with open(temporary_filename, 'w') as report_file:
+            report_file.write(self.header)
+            for error in self.errors:
+                columns = [error.contig, error.feature, error.qualifier, error.message]
+                report_file.write("\t".join(self.format_column(column) for column in columns) + "\n")
+        os.rename(temporary_filename, self.report_filename)
+
+    def format_column(self, column):
+        if column == None:
+            return '-'
+        return str(column).replace('\t', ' ').replace('\n', ' ')
@@ -0,0 +1,56 @@
+import bisect
+import sys
+
+class FeatureIndex(object):
+  # Keeps a contig's features sorted by (start, end) as they are added, so
+  # they never need to be sorted from scratch, and answers interval queries
+  # with binary searches over the sorted start coordinates.
+  # Coordinates are 1-based and inclusive, like in the GFF3 and EMBL files.
+
+  def __init__(self, features=()):
+    self.keys = []
+    self.starts = []
+    self.features = []
+    self.longest_feature = 0
+    for feature in features:
+      self.add(feature)
+
+  def __len__(self):
+    return len(self.features)
+
+  def add(self, feature):
+    # Features with the same coordinates are kept in the order they were added
+    key = (feature.start, feature.end, len(self.keys))
+    position = bisect.bisect_right(self.keys, key)
+    self.keys.insert(position, key)
+    self.starts.insert(position, feature.start)
+    self.features.insert(position, feature)
+    self.longest_feature = max(self.longest_feature, feature.end - feature.start)
+
+  def sorted_features(self):
+    return list(self.features)
+
+  def estimated_size(self):
+    # Bytes taken up by the index itself, not the features in it
+    size = sys.getsizeof(self) + sys.getsizeof(self.keys) + sys.getsizeof(self.starts) + sys.getsizeof(self.features)
+    return size + sum(map(sys.getsizeof, self.keys))
+
+  def overlapping(self, start, end):
+    # Features which share at least one base with start..end.  No feature is
+    # longer than longest_feature so nothing starting before
+    # start - longest_feature can reach the region.
+    first = bisect.bisect_left(self.starts, start - self.longest_feature)
+    last = bisect.bisect_right(self.starts, end)
+    return [feature for feature in self.features[first:last] if feature.end >= start]
+
+  def within(self, start, end):
+    # Features which lie entirely inside start..end
+    first = bisect.bisect_left(self.starts, start)
+    last = bisect.bisect_right(self.starts, end)
+    return [feature for feature in self.features[first:last] if feature.end <= end]
+
+  def containing(self, start, end):
+    # Features which cover all of start..end
+    first = bisect.bisect_left(self.starts, end - self.longest_feature)
+    last = bisect.bisect_right(self.starts, start)
+    return [feature for feature in self.features[first:last] if feature.end >= end]
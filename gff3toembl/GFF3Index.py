@@ -0,0 +1,161 @@
+import json
+import os
+
+class GFF3Index(object):
+    # Where each sequence's features, ##sequence-region directive and FASTA
+    # record are in a GFF3 file, so a subset of the sequences can be pulled
+    # out by seeking straight to them instead of converting the whole file.
+    # The index is built by reading the file once and kept in a sidecar file
+    # next to it, which is rebuilt whenever the GFF3 file changes.  If the
+    # sidecar can't be written the index is just kept in memory.
+    #
+    # Bgzipped, tabix indexed files aren't supported; the GFF3 file has to be
+    # uncompressed so it can be read by GT.
+
+    version = 1
+    suffix = ".seqidx"
+    copy_buffer_size = 1024 * 1024
+
+    def __init__(self, gff3_filename, index_filename = None):
+        self.gff3_filename  = gff3_filename
+        self.index_filename = index_filename if index_filename != None else str(gff3_filename) + self.suffix
+        self.seqids         = [] # in the order they first appear
+        self.features       = {} # seqid: [[offset, length], ...], runs of feature lines
+        self.regions        = {} # seqid: ##sequence-region line
+        self.sequences      = {} # seqid: [offset, length] of the FASTA record
+
+    def load(self):
+        # Reads the sidecar if it is up to date, otherwise builds the index and saves it
+        if not self.read():
+            self.build()
+            self.save()
+        return self
+
+    def read(self):
+        try:
+            with open(self.index_filename, 'r') as index_file:
+                index = json.load(index_file)
+        except (IOError, ValueError):
+            return False
+        gff3_stat = os.stat(self.gff3_filename)
+        if index.get('version') != self.version or index.get('gff3_size') != gff3_stat.st_size or index.get('gff3_mtime') != gff3_stat.st_mtime:
+            return False
+        self.seqids    = index['seqids']
+        self.features  = index['features']
+        self.regions   = index['regions']
+        self.sequences = index['sequences']
+        return True
+
+    def save(self):
+        gff3_stat = os.stat(self.gff3_filename)
+        index = {
+          'version': self.version,
+          'gff3_size': gff3_stat.st_size,
+          'gff3_mtime': gff3_stat.st_mtime,
+          'seqids': self.seqids,
+          'features': self.features,
+          'regions': self.regions,
+          'sequences': self.sequences
+        }
+        temporary_index_filename = self.index_filename + ".tmp"
+        try:
+            with open(temporary_index_filename, 'w') as index_file:
+                json.dump(index, index_file)
+            os.rename(temporary_index_filename, self.index_filename)
+        except (IOError, OSError):
+            # eg the GFF3 file is in a read only directory
+            if os.path.exists(temporary_index_filename):
+                os.remove(temporary_index_filename)
+
+    def build(self):
+        self.seqids    = []
+        self.features  = {}
+        self.regions   = {}
+        self.sequences = {}
+        offset = 0
+        in_fasta = False
+        sequence = None
+        with open(self.gff3_filename, 'rb') as gff3_file:
+            for line in gff3_file:
+                line_length = len(line)
+                if in_fasta or line.startswith('>'):
+                    in_fasta = True
+                    if line.startswith('>'):
+                        # the whole description, as used by GT and so by the converter
+                        sequence = [offset, 0]
+                        self.sequences[self.add_seqid(line[1:].strip())] = sequence
+                    if sequence != None:
+                        sequence[1] += line_length
+                elif line.startswith('##FASTA'):
+                    in_fasta = True
+                elif line.startswith('##sequence-region'):
+                    columns = line.split()
+                    if len(columns) > 1:
+                        self.regions[self.add_seqid(columns[1])] = line if line.endswith('\n') else line + '\n'
+                elif not line.startswith('#') and line.strip() != '':
+                    feature_runs = self.features.setdefault(self.add_seqid(line.split('\t', 1)[0]), [])
+                    if feature_runs and feature_runs[-1][0] + feature_runs[-1][1] == offset:
+                        feature_runs[-1][1] += line_length
+                    else:
+                        feature_runs.append([offset, line_length])
+                offset += line_length
+        return self
+
+    def add_seqid(self, seqid):
+        if seqid not in self.features and seqid not in self.regions and seqid not in self.sequences:
+            self.seqids.append(seqid)
+        return seqid
+
+    def size(self, seqid):
+        # Bytes of features and sequence, roughly how much work the seqid is to convert
+        size = sum(length for offset, length in self.features.get(seqid, []))
+        if seqid in self.sequences:
+            size += self.sequences[seqid][1]
+        return size
+
+    def partition(self, number_of_parts):
+        # Splits the seqids into at most number_of_parts disjoint sets of similar
+        # size, so each can be converted by a separate worker.  The largest seqids
+        # are placed first, each into the set which is smallest so far.
+        positions = dict((seqid, position) for position, seqid in enumerate(self.seqids))
+        parts = [[0, []] for part_number in range(max(1, min(number_of_parts, len(self.seqids))))]
+        for seqid in sorted(self.seqids, key=lambda seqid: (-self.size(seqid), positions[seqid])):
+            smallest_part = min(parts, key=lambda part: part[0])
+            smallest_part[0] += self.size(seqid)
+            smallest_part[1].append(seqid)
+        return [sorted(seqids, key=positions.get) for size, seqids in parts if seqids]
+
+    def write_subset(self, seqids, output_filename):
+        # A GFF3 file of just these seqids' features and sequences
+        positions = dict((seqid, position) for position, seqid in enumerate(self.seqids))
+        missing_seqids = [seqid for seqid in seqids if seqid not in positions]
+        if missing_seqids:
+            raise ValueError("Could not find {} in {}".format(', '.join(missing_seqids), self.gff3_filename))
+        seqids = sorted(set(seqids), key=positions.get)
+        with open(self.gff3_filename, 'rb') as gff3_file:
+            with open(output_filename, 'wb') as output_file:
+                output_file.write("##gff-version 3\n")
+                for seqid in seqids:
+                    if seqid in self.regions:
+                        output_file.write(self.regions[seqid])
+                for seqid in seqids:
+                    for offset, length in self.features.get(seqid, []):
+                        self.copy(gff3_file, output_file, offset, length)
+                sequences = [self.sequences[seqid] for seqid in seqids if seqid in self.sequences]
+                if sequences:
+                    output_file.write("##FASTA\n")
+                    for offset, length in sequences:
+                        self.copy(gff3_file, output_file, offset, length)
+
+    def copy(self, input_file, output_file, offset, length):
+        input_file.seek(offset)
+        data = ''
+        while length > 0:
+            data = input_file.read(min(length, self.copy_buffer_size))
+            if not data:
+                break
+            output_file.write(data)
+            length -= len(data)
+        # the last line of the file might not end in a new line
+        if data and not data.endswith('\n'):
+            output_file.write('\n')
@@ -0,0 +1,150 @@
+import heapq
+import os
+import shutil
+import tempfile
+
+class GFF3Sorter(object):
+    # Sorts the feature lines of a GFF3 file by (seqid, start, end) without
+    # holding the whole file in memory.  Features are read in runs of at most
+    # memory_budget bytes, each run is sorted and spilled to a temporary file
+    # and the runs are then merged.  Directives are kept at the top of the
+    # output and the ##FASTA section is copied through unchanged.
+    #
+    # A big file with a small budget can make thousands of runs, too many to
+    # have open at once, so they are merged maximum_open_runs at a time into
+    # longer runs until there are few enough to merge in one go.
+
+    line_overhead = 100 # rough per line cost of holding a line and its sort key in memory
+    maximum_open_runs = 64
+
+    def __init__(self, memory_budget = 64*1024*1024, temporary_directory = None):
+        self.memory_budget       = memory_budget
+        self.temporary_directory = temporary_directory
+
+    def sort(self, input_filename, output_filename):
+        directives = []
+        run_filenames = []
+        fasta_offset = None
+        try:
+            with open(input_filename, 'r') as input_file:
+                run = []
+                run_size = 0
+                for line in iter(input_file.readline, ''):
+                    if line.startswith('##FASTA') or line.startswith('>'):
+                        fasta_offset = input_file.tell() - len(line)
+                        break
+                    elif line.startswith('###'):
+                        continue
+                    elif line.startswith('##'):
+                        directives.append(line)
+                    elif line.startswith('#') or line.strip() == '':
+                        continue
+                    else:
+                        if not line.endswith('\n'):
+                            line += '\n'
+                        run.append((self.sort_key(line), len(run), line))
+                        run_size += len(line) + self.line_overhead
+                        if run_size >= self.memory_budget:
+                            run_filenames.append(self.spill_run(run))
+                            run = []
+                            run_size = 0
+                if run:
+                    run_filenames.append(self.spill_run(run))
+
+            self.reduce_runs(run_filenames)
+            with open(output_filename, 'w') as output_file:
+                for directive in directives:
+                    output_file.write(directive)
+                self.merge_runs(run_filenames, output_file)
+                if fasta_offset != None:
+                    with open(input_filename, 'r') as input_file:
+                        input_file.seek(fasta_offset)
+                        shutil.copyfileobj(input_file, output_file)
+        finally:
+            for run_filename in run_filenames:
+                os.remove(run_filename)
+
+    def is_sorted(self, input_filename):
+        # A cheap streaming check which stops at the first feature out of order.
+        # Each sequence's features must be together and ordered by (start, end),
+        # the order of the sequences themselves doesn't matter.
+        seen_seqids = set()
+        previous_key = None
+        with open(input_filename, 'r') as input_file:
+            for line in input_file:
+                if line.startswith('##FASTA') or line.startswith('>'):
+                    break
+                elif line.startswith('#') or line.strip() == '':
+                    continue
+                key = self.sort_key(line)
+                if previous_key == None or key[0] != previous_key[0]:
+                    if key[0] in seen_seqids:
+                        return False
+                    seen_seqids.add(key[0])
+                elif key < previous_key:
+                    return False
+                previous_key = key
+        return True
+
+    def sort_key(self, line):
+        columns = line.split('\t', 5)
+        try:
+            return (columns[0], int(columns[3]), int(columns[4]))
+        except (IndexError, ValueError):
+            raise ValueError("Could not sort GFF3 file, malformed feature line: %s" % line.rstrip('\n'))
+
+    def spill_run(self, run):
+        # Python sorts stably, the position in the run only breaks ties between identical keys
+        run.sort()
+        return self.write_run(line for key, position, line in run)
+
+    def write_run(self, lines):
+        run_file_descriptor, run_filename = tempfile.mkstemp(prefix='gff3toembl_sort_', suffix='.gff', dir=self.temporary_directory)
+        try:
+            with os.fdopen(run_file_descriptor, 'w') as run_file:
+                for line in lines:
+                    run_file.write(line)
+        except:
+            os.remove(run_filename)
+            raise
+        return run_filename
+
+    def reduce_runs(self, run_filenames):
+        # Each pass merges consecutive groups of runs, so ties between
+        # identical keys still go to the earlier run.  run_filenames is
+        # updated as each group is merged so that every run file left, merged
+        # or not, is removed if anything goes wrong.
+        while len(run_filenames) > self.maximum_open_runs:
+            groups = [run_filenames[group_start:group_start + self.maximum_open_runs]
+                      for group_start in range(0, len(run_filenames), self.maximum_open_runs)]
+            for group in groups:
+                if len(group) == 1:
+                    merged_filename = group[0]
+                else:
+                    merged_filename = self.write_run(line for key, run_index, position, line in self.merge_lines(group))
+                for run_filename in group:
+                    run_filenames.remove(run_filename)
+                    if run_filename != merged_filename:
+                        os.remove(run_filename)
+                run_filenames.append(merged_filename)
+
+    def read_run(self, run_index, run_filename):
+        with open(run_filename, 'r') as run_file:
+            for position, line in enumerate(run_file):
+                yield (self.sort_key(line), run_index, position, line)
+
+    def merge_runs(self, run_filenames, output_file):
+        # Features on different sequences can never be related to each other so
+        # a ### separator is written whenever the seqid changes.  This lets GT
+        # release each sequence's features as soon as it has been parsed.
+        previous_seqid = None
+        for key, run_index, position, line in self.merge_lines(run_filenames):
+            seqid = key[0]
+            if previous_seqid != None and seqid != previous_seqid:
+                output_file.write("###\n")
+            previous_seqid = seqid
+            output_file.write(line)
+
+    def merge_lines(self, run_filenames):
+        runs = [self.read_run(run_index, run_filename) for run_index, run_filename in enumerate(run_filenames)]
+        return heapq.merge(*runs)
@@ -0,0 +1,64 @@
+class LineLengthError(ValueError):
+    # Raised for a line which is too long, saying where it came from
+    def __init__(self, violations):
+        self.violations = violations
+        message = "Could not format contig, a line exceeded 80 characters in length"
+        locations = "\n".join(violation.location() for violation in violations)
+        ValueError.__init__(self, message + ": " + locations if len(violations) == 1 else message + ":\n" + locations)
+
+class LineLengthViolation(object):
+    def __init__(self, line, contig = None, feature = None, qualifier = None):
+        self.line      = line
+        self.contig    = contig
+        self.feature   = feature
+        self.qualifier = qualifier
+
+    def location(self):
+        location = []
+        if self.contig != None:
+            location.append("contig {}".format(self.contig))
+        if self.feature != None:
+            location.append("feature {}".format(self.feature))
+        if self.qualifier != None:
+            location.append("qualifier /{}".format(self.qualifier))
+        location.append("{} characters: {}".format(len(self.line), self.line))
+        return ", ".join(location)
+
+class LineLengthValidator(object):
+    # Checks each piece of formatted text as it is produced, so a contig
+    # fails as soon as a line is too long rather than after all of it has been
+    # formatted.  The lines are found without splitting or copying the text.
+    #
+    # collect = False raises a LineLengthError for the first line which is too
+    # long, collect = True keeps going and records all of them in violations.
+
+    maximum_line_length = 80
+
+    def __init__(self, collect = False):
+        self.collect    = collect
+        self.violations = []
+        self.contig     = None
+        self.feature    = None
+
+    def check(self, text, qualifier = None):
+        # Almost all text is short enough that there's nothing to look for
+        if len(text) <= self.maximum_line_length:
+            return
+        line_start = 0
+        text_length = len(text)
+        while line_start < text_length:
+            line_end = text.find('\n', line_start)
+            if line_end == -1:
+                line_end = text_length
+            if line_end - line_start > self.maximum_line_length:
+                self.add_violation(LineLengthViolation(text[line_start:line_end], self.contig, self.feature, qualifier))
+            line_start = line_end + 1
+
+    def add_violation(self, violation):
+        self.violations.append(violation)
+        if not self.collect:
+            raise LineLengthError([violation])
+
+    def raise_violations(self):
+        if self.violations:
+            raise LineLengthError(self.violations)
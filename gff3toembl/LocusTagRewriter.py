@@ -0,0 +1,105 @@
+import re
+
+class LocusTagRewriter(object):
+    # Rewrites locus tags in GFF3 or EMBL files line by line, without parsing
+    # or converting the annotation.  A locus tag is looked up in this order:
+    #
+    #   locus_tags    an explicit old tag to new tag mapping
+    #   prefixes      old prefix to new prefix, where the prefix is everything
+    #                 before the last underscore (ABC_00001 has the prefix ABC)
+    #   locus_tag     a new prefix for every other tag, the same as --locus_tag
+    #                 when converting
+    #
+    # Tags which match none of them are left alone.  The mappings are plain
+    # dictionaries so each lookup takes the same time however many tags there are.
+
+    gff_locus_tag  = re.compile(r'(^|;)locus_tag=([^;\t\n]*)')
+    embl_locus_tag = re.compile(r'^(FT {19}/locus_tag=")([^"]*)(")')
+
+    def __init__(self, locus_tag = None, prefixes = None, locus_tags = None):
+        self.locus_tag         = locus_tag
+        self.prefixes          = prefixes if prefixes != None else {}
+        self.locus_tags        = locus_tags if locus_tags != None else {}
+        self.rewritten_tags    = 0
+
+    @staticmethod
+    def read_table(filename):
+        # Two tab separated columns, old then new.  Blank lines and lines
+        # starting with # are ignored.
+        table = {}
+        with open(filename, 'r') as table_file:
+            for line_number, line in enumerate(table_file, 1):
+                if line.strip() == '' or line.startswith('#'):
+                    continue
+                columns = line.rstrip('\r\n').split('\t')
+                if len(columns) != 2 or columns[0] == '' or columns[1] == '':
+                    raise ValueError("Line {} of {} should have an old and a new value separated by a tab".format(line_number, filename))
+                if columns[0] in table and table[columns[0]] != columns[1]:
+                    raise ValueError("Line {} of {} maps {} a second time".format(line_number, filename, columns[0]))
+                table[columns[0]] = columns[1]
+        return table
+
+    def rewrite_tag(self, tag):
+        new_tag = self.locus_tags.get(tag)
+        if new_tag != None:
+            return new_tag
+        prefix, separator, suffix = tag.rpartition('_')
+        new_prefix = self.prefixes.get(prefix)
+        if new_prefix == None:
+            new_prefix = self.locus_tag
+        if new_prefix == None:
+            return tag
+        return "{}_{}".format(new_prefix, suffix)
+
+    def rewrite_gff_line(self, line):
+        if line.startswith('#') or 'locus_tag=' not in line:
+            return line
+        columns = line.split('\t')
+        if len(columns) < 9:
+            return line
+        columns[8] = self.gff_locus_tag.sub(self.replace_gff_tag, columns[8])
+        return '\t'.join(columns)
+
+    def replace_gff_tag(self, match):
+        return "{}locus_tag={}".format(match.group(1), self.count_rewrite(match.group(2)))
+
+    def rewrite_embl_line(self, line):
+        if not line.startswith('FT') or '/locus_tag=' not in line:
+            return line
+        return self.embl_locus_tag.sub(self.replace_embl_tag, line)
+
+    def replace_embl_tag(self, match):
+        return "{}{}{}".format(match.group(1), self.count_rewrite(match.group(2)), match.group(3))
+
+    def count_rewrite(self, tag):
+        new_tag = self.rewrite_tag(tag)
+        if new_tag != tag:
+            self.rewritten_tags += 1
+        return new_tag
+
+    def rewrite(self, input_file, output_file):
+        # The format is taken from the first line; GFF3 files start with a
+        # ##gff-version directive and EMBL files with an ID line
+        self.rewritten_tags = 0
+        rewrite_line = None
+        for line in input_file:
+            if rewrite_line == None:
+                if line.startswith('ID   '):
+                    rewrite_line = self.rewrite_embl_line
+                elif line.startswith('##gff-version'):
+                    rewrite_line = self.rewrite_gff_line
+                else:
+                    raise ValueError("Could not tell if {} is a GFF3 or an EMBL file".format(getattr(input_file, 'name', 'the input')))
+            elif rewrite_line == self.rewrite_gff_line and (line.startswith('##FASTA') or line.startswith('>')):
+                # nothing left to rewrite in the sequences
+                output_file.write(line)
+                for line in input_file:
+                    output_file.write(line)
+                break
+            output_file.write(rewrite_line(line))
+        return self.rewritten_tags
+
+    def rewrite_file(self, input_filename, output_filename):
+        with open(input_filename, 'r') as input_file:
+            with open(output_filename, 'w') as output_file:
+                return self.rewrite(input_file, output_file)
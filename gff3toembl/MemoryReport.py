@@ -0,0 +1,93 @@
+import sys
+from collections import defaultdict
+from gff3toembl.EMBLContig import EMBLFeature
+
+class MemoryReport(object):
+    # Estimates the memory held by the parsed contigs, so it is clear whether
+    # the sequences, the features or their qualifiers take up the most.  The
+    # sizes come from sys.getsizeof so they are close to, but not exactly,
+    # what the process uses.  Contigs spilled to disk by a ContigStore are
+    # counted separately as they are not held in memory at the time.  The
+    # qualifiers shared between features are counted once, on their own.
+
+    def __init__(self, number_of_contigs = 10):
+        self.number_of_contigs    = number_of_contigs
+        self.contigs              = [] # (total, sequence identifier, sequence, features, number of features)
+        self.sequence_bytes       = 0
+        self.feature_bytes        = 0
+        self.qualifier_bytes      = 0
+        self.contig_bytes         = 0
+        self.spilled_bytes        = 0
+        self.spilled_contigs      = 0
+        self.number_of_features   = 0
+        self.number_of_qualifiers = 0
+        self.feature_types        = defaultdict(lambda: [0, 0, 0]) # features, bytes, qualifier bytes
+
+    def add_contig(self, sequence_identifier, contig, in_memory = True):
+        sequence_bytes = contig.sequence.estimated_size() if contig.sequence != None else 0
+        feature_bytes = 0
+        for feature in contig.features.values():
+            size = feature.estimated_size()
+            qualifier_size = feature.estimated_attributes_size()
+            feature_type = self.feature_types[feature.feature_type]
+            feature_type[0] += 1
+            feature_type[1] += size
+            feature_type[2] += qualifier_size
+            feature_bytes += size
+            self.qualifier_bytes += qualifier_size
+            self.number_of_qualifiers += len(feature.attributes)
+        # the contig itself, its dictionary of features and the index over them
+        contig_bytes = sys.getsizeof(contig) + sys.getsizeof(contig.__dict__) + sys.getsizeof(contig.features)
+        contig_bytes += sum(map(sys.getsizeof, contig.features.keys())) + contig.index().estimated_size()
+        total = sequence_bytes + feature_bytes + contig_bytes
+
+        self.sequence_bytes += sequence_bytes
+        self.feature_bytes += feature_bytes
+        self.contig_bytes += contig_bytes
+        self.number_of_features += len(contig.features)
+        if not in_memory:
+            self.spilled_bytes += total
+            self.spilled_contigs += 1
+        self.contigs.append((total, sequence_identifier, sequence_bytes, feature_bytes, len(contig.features)))
+
+    def add_contigs(self, contigs, spilled = ()):
+        # contigs can be a dictionary or a ContigStore
+        for sequence_identifier in sorted(contigs.keys()):
+            self.add_contig(sequence_identifier, contigs[sequence_identifier], sequence_identifier not in spilled)
+
+    def shared_qualifier_bytes(self):
+        return EMBLFeature.shared_attributes_size()
+
+    def total_bytes(self):
+        return self.sequence_bytes + self.feature_bytes + self.contig_bytes + self.shared_qualifier_bytes()
+
+    def write(self, output_file):
+        # Tab separated sections so the report can be read by other tools as well as people
+        output_file.write("# Memory held by the parsed contigs, in bytes\n")
+        for name, value in [('total', self.total_bytes()),
+                            ('sequences', self.sequence_bytes),
+                            ('features', self.feature_bytes),
+                            ('qualifiers', self.qualifier_bytes),
+                            ('shared_qualifiers', self.shared_qualifier_bytes()),
+                            ('contigs_and_indexes', self.contig_bytes),
+                            ('spilled_to_disk', self.spilled_bytes),
+                            ('number_of_contigs', len(self.contigs)),
+                            ('number_of_spilled_contigs', self.spilled_contigs),
+                            ('number_of_features', self.number_of_features),
+                            ('number_of_qualifiers', self.number_of_qualifiers)]:
+            output_file.write("{}\t{}\n".format(name, value))
+
+        output_file.write("\n# By feature type, qualifiers are included in the feature bytes but shared qualifiers aren't\n")
+        output_file.write("feature_type\tfeatures\tbytes\tqualifier_bytes\n")
+        for feature_type, (features, size, qualifier_size) in sorted(self.feature_types.items(), key=lambda item: (-item[1][1], item[0])):
+            output_file.write("{}\t{}\t{}\t{}\n".format(feature_type, features, size, qualifier_size))
+
+        output_file.write("\n# Largest {} contigs\n".format(self.number_of_contigs))
+        output_file.write("contig\tbytes\tsequence_bytes\tfeature_bytes\tfeatures\n")
+        largest_contigs = sorted(self.contigs, key=lambda contig: (-contig[0], contig[1]))[:self.number_of_contigs]
+        for total, sequence_identifier, sequence_bytes, feature_bytes, number_of_features in largest_contigs:
+            output_file.write("{}\t{}\t{}\t{}\t{}\n".format(sequence_identifier, total, sequence_bytes, feature_bytes, number_of_features))
+
+    def write_file(self, filename):
+        with open(filename, 'w') as output_file:
+            self.write(output_file)
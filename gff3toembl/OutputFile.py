@@ -0,0 +1,81 @@
+import gzip
+import hashlib
+import os
+
+compressed_suffix = '.gz'
+
+def compressed_filename(filename):
+    # The name to give a file which is gzip compressed, so that it ends in .gz
+    # as Webin-CLI and most other tools expect
+    if filename == None or filename.endswith(compressed_suffix):
+        return filename
+    return filename + compressed_suffix
+
+class DigestFile(object):
+    # Passes writes through to a file, counting and hashing the bytes on the way
+    def __init__(self, output_file, checksums = False):
+        self.output_file = output_file
+        self.size        = 0
+        self.md5         = hashlib.md5() if checksums else None
+        self.sha256      = hashlib.sha256() if checksums else None
+
+    def write(self, data):
+        self.output_file.write(data)
+        self.size += len(data)
+        if self.md5 != None:
+            self.md5.update(data)
+            self.sha256.update(data)
+
+    def flush(self):
+        self.output_file.flush()
+
+    def close(self):
+        self.output_file.close()
+
+class OutputFile(object):
+    # A file written in one pass, optionally gzip compressed, with its size
+    # and, with checksums, the MD5 and SHA-256 of the bytes which reach the
+    # disk worked out as it is written.  Nothing has to read the file back
+    # afterwards to compress it or to checksum it for submission.
+
+    compress_level = 6 # as gzip's default, 9 is a lot slower for little gain
+
+    def __init__(self, filename, compress = False, checksums = False):
+        self.filename          = filename
+        self.digest_file       = DigestFile(open(filename, 'wb'), checksums)
+        self.uncompressed_size = 0
+        # no name or time in the gzip header, so the same records always give the same checksums
+        self.compressor        = gzip.GzipFile(filename = '', mode = 'wb', compresslevel = self.compress_level,
+                                               fileobj = self.digest_file, mtime = 0) if compress else None
+
+    def write(self, data):
+        self.uncompressed_size += len(data)
+        if self.compressor != None:
+            self.compressor.write(data)
+        else:
+            self.digest_file.write(data)
+
+    def close(self):
+        if self.compressor != None:
+            self.compressor.close()
+        self.digest_file.close()
+
+    def size(self):
+        return self.digest_file.size
+
+    def md5(self):
+        return self.digest_file.md5.hexdigest()
+
+    def sha256(self):
+        return self.digest_file.sha256.hexdigest()
+
+    def write_checksums(self, filename):
+        # filename.md5 and filename.sha256, in the format md5sum -c and sha256sum -c check,
+        # and filename.size with the bytes on disk and, uncompressed, in the file
+        basename = os.path.basename(filename)
+        for suffix, line in [('.md5', "{}  {}\n".format(self.md5(), basename)),
+                             ('.sha256', "{}  {}\n".format(self.sha256(), basename)),
+                             ('.size', "#file\tbytes\tuncompressed_bytes\n{}\t{}\t{}\n".format(basename, self.size(), self.uncompressed_size))]:
+            with open(filename + suffix + ".tmp", 'w') as sidecar_file:
+                sidecar_file.write(line)
+            os.rename(filename + suffix + ".tmp", filename + suffix)
@@ -0,0 +1,98 @@
+import bisect
+import hashlib
+import re
+import sys
+from array import array
+
+def every_four_bases(bases):
+    return [first + second + third + fourth for first in bases for second in bases for third in bases for fourth in bases]
+
+class PackedSequence(object):
+    # A sequence held in memory at 2 bits per base, a quarter of the size of
+    # the string.  A, C, G and T are packed four to a byte; N and the other
+    # IUPAC codes are packed as A and listed separately as runs of the same
+    # character, which is compact for the long runs of N between scaffolded
+    # contigs.  Everything which needs the whole sequence (its length, base
+    # counts and digest) is worked out while packing so the sequence never has
+    # to be unpacked in full again.
+    #
+    # Bases are kept in lower case, as they are written in the EMBL file, but
+    # the digest is of the original sequence so it matches that of an
+    # unpacked EMBLSequence.
+
+    bases = 'acgt'
+    unpack_table = every_four_bases(bases)
+    pack_table = dict((four_bases, byte) for byte, four_bases in enumerate(unpack_table))
+    exception_pattern = re.compile(r'([^acgt])\1*', re.S)
+    four_bases_pattern = re.compile('....', re.S)
+    # packed a chunk at a time so that only a chunk is ever copied, a multiple of 4
+    chunk_size = 64 * 1024
+
+    def __init__(self, sequence_string):
+        self.length            = len(sequence_string)
+        self.digest            = hashlib.sha1(sequence_string).hexdigest()
+        self.nucleotide_counts = {'a': 0, 'c': 0, 'g': 0, 't': 0}
+        self.packed            = bytearray()
+        self.exception_starts  = array('l')
+        self.exception_ends    = array('l')
+        self.exception_bases   = []
+        for chunk_start in range(0, self.length, self.chunk_size):
+            self.pack_chunk(chunk_start, sequence_string[chunk_start:chunk_start + self.chunk_size].lower())
+        # copied to drop the spare space extend() leaves at the end
+        self.packed = bytearray(self.packed)
+        self.exception_bases = ''.join(self.exception_bases)
+        self.nucleotide_counts['other'] = self.length - sum(self.nucleotide_counts.values())
+
+    def pack_chunk(self, chunk_start, chunk):
+        for base in self.bases:
+            self.nucleotide_counts[base] += chunk.count(base)
+        if self.exception_pattern.search(chunk) != None:
+            chunk = self.exception_pattern.sub(lambda match: self.add_exception(chunk_start, match), chunk)
+        chunk += 'a' * (-len(chunk) % 4)
+        self.packed.extend(map(self.pack_table.__getitem__, self.four_bases_pattern.findall(chunk)))
+
+    def add_exception(self, chunk_start, match):
+        start = chunk_start + match.start()
+        end = chunk_start + match.end()
+        base = match.group(1)
+        if self.exception_ends and self.exception_ends[-1] == start and self.exception_bases[-1] == base:
+            # the run carries on from the previous chunk
+            self.exception_ends[-1] = end
+        else:
+            self.exception_starts.append(start)
+            self.exception_ends.append(end)
+            self.exception_bases.append(base)
+        return 'a' * (end - start)
+
+    def __len__(self):
+        return self.length
+
+    def unpack(self, start = 0, end = None):
+        # The bases from start to end, in lower case
+        if end == None or end > self.length:
+            end = self.length
+        if start >= end:
+            return ''
+        first_byte = start // 4
+        unpacked = ''.join(map(self.unpack_table.__getitem__, self.packed[first_byte:(end + 3) // 4]))
+        unpacked = unpacked[start - first_byte * 4:end - first_byte * 4]
+
+        # put back any N or IUPAC runs which overlap
+        exception_number = bisect.bisect_right(self.exception_ends, start)
+        pieces = []
+        position = start
+        while exception_number < len(self.exception_starts) and self.exception_starts[exception_number] < end:
+            run_start = max(self.exception_starts[exception_number], start)
+            run_end = min(self.exception_ends[exception_number], end)
+            pieces.append(unpacked[position - start:run_start - start])
+            pieces.append(self.exception_bases[exception_number] * (run_end - run_start))
+            position = run_end
+            exception_number += 1
+        if not pieces:
+            return unpacked
+        pieces.append(unpacked[position - start:])
+        return ''.join(pieces)
+
+    def estimated_size(self):
+        return (sys.getsizeof(self) + sys.getsizeof(self.packed) + sys.getsizeof(self.exception_starts) +
+                sys.getsizeof(self.exception_ends) + sys.getsizeof(self.exception_bases))
@@ -0,0 +1,164 @@
+import json
+import os
+import sys
+import threading
+import time
+
+class ProgressReporter(object):
+    # Reports how far a conversion has got every interval seconds, so long
+    # running jobs can be watched and stalled jobs spotted.  Progress can go to
+    # any of:
+    #
+    #   stderr               a line of text per report
+    #   metrics_filename     a JSON object per report, appended to the file
+    #   prometheus_filename  metrics for the Prometheus node exporter textfile
+    #                        collector, replaced on every report
+    #
+    # With none of them reporting does nothing.  The parsing and writing loops
+    # call parsing() and writing() as often as they like; they only report
+    # once the interval has passed, even when both run at once with
+    # --pipeline.  Parsing and writing each have their own start time, so
+    # their rates are right however their calls are interleaved.  Only
+    # finished() and failed() report straight away.
+
+    def __init__(self, stderr = False, metrics_filename = None, prometheus_filename = None, interval = 10, output_filename = None, clock = time.time):
+        self.stderr              = stderr
+        self.metrics_filename    = metrics_filename
+        self.prometheus_filename = prometheus_filename
+        self.interval            = interval
+        self.output_filename     = output_filename
+        self.clock               = clock
+        self.lock                = threading.Lock()
+        self.started             = clock()
+        self.last_reported       = None
+        self.stage               = 'starting'
+        self.parsing_started     = None
+        self.writing_started     = None
+        self.features_parsed     = 0
+        self.sequences_parsed    = 0
+        self.contigs_written     = 0
+        self.contigs_total       = None
+        self.bytes_written       = 0
+
+    def is_enabled(self):
+        return self.stderr or self.metrics_filename != None or self.prometheus_filename != None
+
+    def parsing(self, features_parsed, sequences_parsed):
+        self.features_parsed = features_parsed
+        self.sequences_parsed = sequences_parsed
+        if self.parsing_started == None:
+            self.parsing_started = self.clock()
+        self.update('parsing')
+
+    def writing(self, contigs_written, contigs_total, bytes_written):
+        self.contigs_written = contigs_written
+        self.contigs_total = contigs_total
+        self.bytes_written = bytes_written
+        if self.writing_started == None:
+            self.writing_started = self.clock()
+        self.update('writing')
+
+    def finished(self):
+        self.update('finished', True)
+
+    def failed(self, error):
+        self.update('failed', True, str(error))
+
+    def update(self, stage, force = False, error = None):
+        if not self.is_enabled():
+            return
+        now = self.clock()
+        with self.lock:
+            self.stage = stage
+            if not force and self.last_reported != None and now - self.last_reported < self.interval:
+                return
+            self.last_reported = now
+            event = self.create_event(now, error)
+            if self.stderr:
+                self.write_stderr(event)
+            if self.metrics_filename != None:
+                self.write_metrics(event)
+            if self.prometheus_filename != None:
+                self.write_prometheus(event)
+
+    def create_event(self, now, error = None):
+        rate = None
+        eta = None
+        parsing_elapsed = now - self.parsing_started if self.parsing_started != None else 0
+        writing_elapsed = now - self.writing_started if self.writing_started != None else 0
+        if self.stage == 'parsing' and parsing_elapsed > 0:
+            rate = self.features_parsed / parsing_elapsed
+        elif self.stage == 'writing' and writing_elapsed > 0:
+            rate = self.bytes_written / writing_elapsed
+            # there is only an estimate once all of the contigs are known, ie not while pipelining
+            if self.contigs_total != None and self.contigs_written > 0:
+                eta = writing_elapsed * (self.contigs_total - self.contigs_written) / self.contigs_written
+        event = {
+            'time': now,
+            'elapsed_seconds': now - self.started,
+            'stage': self.stage,
+            'features_parsed': self.features_parsed,
+            'sequences_parsed': self.sequences_parsed,
+            'contigs_written': self.contigs_written,
+            'contigs_total': self.contigs_total,
+            'bytes_written': self.bytes_written,
+            'rate': rate,
+            'eta_seconds': eta,
+        }
+        if self.output_filename != None:
+            event['output'] = self.output_filename
+        if error != None:
+            event['error'] = error
+        return event
+
+    def write_stderr(self, event):
+        if event['stage'] == 'parsing':
+            message = "{features_parsed} features and {sequences_parsed} sequences parsed".format(**event)
+            if event['rate'] != None:
+                message += ", {:.0f} features/s".format(event['rate'])
+        elif event['stage'] == 'writing':
+            if event['contigs_total'] != None:
+                message = "{contigs_written}/{contigs_total} contigs written, {bytes_written} bytes".format(**event)
+            else:
+                message = "{contigs_written} contigs written, {bytes_written} bytes".format(**event)
+            if event['rate'] != None:
+                message += ", {:.1f} MB/s".format(event['rate'] / (1024 * 1024))
+            if event['eta_seconds'] != None:
+                message += ", {:.0f}s left".format(event['eta_seconds'])
+        elif event['stage'] == 'failed':
+            message = "failed: {}".format(event['error'])
+        else:
+            message = "{features_parsed} features parsed, {contigs_written} contigs written, {bytes_written} bytes".format(**event)
+        sys.stderr.write("gff3_to_embl [{:.0f}s] {}: {}\n".format(event['elapsed_seconds'], event['stage'], message))
+
+    def write_metrics(self, event):
+        with open(self.metrics_filename, 'a') as metrics_file:
+            metrics_file.write(json.dumps(event, sort_keys=True) + "\n")
+
+    def write_prometheus(self, event):
+        labels = ''
+        if self.output_filename != None:
+            labels = '{{output="{}"}}'.format(str(self.output_filename).replace('\\', '\\\\').replace('"', '\\"'))
+        metrics = [
+            ('features_parsed', 'Features parsed from the GFF3 file', event['features_parsed']),
+            ('sequences_parsed', 'Sequences parsed from the GFF3 file', event['sequences_parsed']),
+            ('contigs_written', 'Contigs written to the EMBL file', event['contigs_written']),
+            ('contigs_total', 'Contigs to be written, 0 when not yet known', event['contigs_total'] or 0),
+            ('bytes_written', 'Bytes written to the EMBL file', event['bytes_written']),
+            ('elapsed_seconds', 'Seconds since the conversion started', event['elapsed_seconds']),
+            ('last_progress_timestamp_seconds', 'Unix time of the last progress report', event['time']),
+            ('finished', '1 once the conversion has finished', 1 if event['stage'] == 'finished' else 0),
+            ('failed', '1 if the conversion failed', 1 if event['stage'] == 'failed' else 0),
+        ]
+        if event['eta_seconds'] != None:
+            metrics.append(('eta_seconds', 'Estimated seconds until the EMBL file is written', event['eta_seconds']))
+        lines = []
+        for name, description, value in metrics:
+            lines.append("# HELP gff3toembl_{} {}\n".format(name, description))
+            lines.append("# TYPE gff3toembl_{} gauge\n".format(name))
+            lines.append("gff3toembl_{}{} {}\n".format(name, labels, value))
+        # The collector may read the file at any time so it is replaced in one go
+        temporary_filename = self.prometheus_filename + ".tmp"
+        with open(temporary_filename, 'w') as prometheus_file:
+            prometheus_file.write(''.join(lines))
+        os.rename(temporary_filename, self.prometheus_filename)
@@ -0,0 +1,87 @@
+import os
+import tempfile
+import time
+
+class SequenceCache(object):
+    # An on disk cache of formatted SQ blocks (the SQ header line and the
+    # sequence body) named after a hash of the sequence they were formatted
+    # from.  When the total size of the cache goes over maximum_size the least
+    # recently used blocks are removed, down to low_water_fraction of it so
+    # that the cache isn't rescanned again on the very next put.  The size and
+    # last use of each entry are kept in memory between rescans.
+
+    suffix = ".sq"
+    low_water_fraction = 0.9
+
+    def __init__(self, cache_directory, maximum_size = 1024*1024*1024):
+        self.cache_directory = cache_directory
+        self.maximum_size    = maximum_size
+        if not os.path.isdir(self.cache_directory):
+            os.makedirs(self.cache_directory)
+        self.entry_sizes     = {} # filename: [size, last used]
+        self.total_size      = 0
+        self.scan()
+
+    def entry_filename(self, digest):
+        return os.path.join(self.cache_directory, digest + self.suffix)
+
+    def get(self, digest):
+        try:
+            with open(self.entry_filename(digest), 'r') as entry_file:
+                formatted_sequence = entry_file.read()
+            # the modification time records when the entry was last used
+            os.utime(self.entry_filename(digest), None)
+        except (IOError, OSError):
+            return None
+        entry_size = self.entry_sizes.get(digest + self.suffix)
+        if entry_size != None:
+            entry_size[1] = time.time()
+        return formatted_sequence
+
+    def put(self, digest, formatted_sequence):
+        # Written to a temporary file and renamed so that other processes
+        # sharing the cache never see a partial entry
+        entry_file_descriptor, temporary_filename = tempfile.mkstemp(dir=self.cache_directory, suffix='.tmp')
+        with os.fdopen(entry_file_descriptor, 'w') as entry_file:
+            entry_file.write(formatted_sequence)
+        os.rename(temporary_filename, self.entry_filename(digest))
+        # an entry which is replaced no longer counts towards the total
+        previous_entry_size = self.entry_sizes.get(digest + self.suffix)
+        if previous_entry_size != None:
+            self.total_size -= previous_entry_size[0]
+        self.entry_sizes[digest + self.suffix] = [len(formatted_sequence), time.time()]
+        self.total_size += len(formatted_sequence)
+        if self.total_size > self.maximum_size:
+            self.evict()
+
+    def entries(self):
+        entries = []
+        for filename in os.listdir(self.cache_directory):
+            if not filename.endswith(self.suffix):
+                continue
+            try:
+                entry_stat = os.stat(os.path.join(self.cache_directory, filename))
+            except OSError:
+                continue
+            entries.append((filename, entry_stat.st_size, entry_stat.st_mtime))
+        return entries
+
+    def scan(self):
+        # Other processes may share the cache, so the table is refreshed from the directory
+        self.entry_sizes = dict((filename, [size, last_used]) for filename, size, last_used in self.entries())
+        self.total_size = sum(size for size, last_used in self.entry_sizes.values())
+
+    def evict(self):
+        self.scan()
+        if self.total_size <= self.maximum_size:
+            return
+        low_water_size = self.maximum_size * self.low_water_fraction
+        for filename, (size, last_used) in sorted(self.entry_sizes.items(), key=lambda entry: entry[1][1]):
+            if self.total_size <= low_water_size:
+                break
+            try:
+                os.remove(os.path.join(self.cache_directory, filename))
+            except OSError:
+                pass
+            del self.entry_sizes[filename]
+            self.total_size -= size
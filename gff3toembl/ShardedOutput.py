@@ -0,0 +1,110 @@
+import multiprocessing
+import os
+import re
+from gff3toembl.EMBLIndex import EMBLIndex
+
+def write_shard(shard):
+    # Runs in a worker process so it has to be a plain function
+    shard_filename, contigs, index = shard
+    embl_index = EMBLIndex(shard_filename) if index else None
+    # renamed into place once complete, like the single output file
+    with open(shard_filename + ".tmp", 'w') as shard_file:
+        for sequence_identifier, contig in contigs:
+            block = contig.format() + "//\n"
+            shard_file.write(block)
+            if embl_index != None:
+                embl_index.add(sequence_identifier, len(block), contig.sequence.length, len(contig.features))
+    os.rename(shard_filename + ".tmp", shard_filename)
+    if embl_index != None:
+        embl_index.write()
+    return (shard_filename, len(contigs), os.path.getsize(shard_filename))
+
+class ShardedOutput(object):
+    # Splits the contigs across several EMBL files which are written in
+    # parallel, either one file per replicon or a fixed number of shards.
+    # Shards hold consecutive runs of the sorted contigs balanced by sequence
+    # length, so concatenating the shards in order gives the single output file.
+    # A manifest lists each shard with its number of contigs and size in bytes.
+    # With index each shard gets its own EMBLIndex.
+
+    def __init__(self, output_filename, number_of_shards = None, workers = 1, progress = None, index = False):
+        self.output_filename   = output_filename
+        self.number_of_shards  = number_of_shards
+        self.workers           = workers
+        self.progress          = progress
+        self.index             = index
+        self.manifest_filename = str(output_filename) + ".manifest"
+
+    def shard_filename(self, shard_name):
+        output_root, output_extension = os.path.splitext(self.output_filename)
+        return "{}.{}{}".format(output_root, shard_name, output_extension)
+
+    def replicon_shard_names(self, sorted_contigs):
+        # Only the word characters of each identifier are kept for its file
+        # name, so different identifiers like contig.1 and contig1 can end up
+        # the same.  Later ones get a numbered suffix so no shard overwrites another.
+        used_names = set()
+        shard_names = []
+        for sequence_identifier, contig in sorted_contigs:
+            base_name = re.sub(r'\W+', '', sequence_identifier) or 'contig'
+            shard_name = base_name
+            suffix = 2
+            while shard_name in used_names:
+                shard_name = "{}_{}".format(base_name, suffix)
+                suffix += 1
+            used_names.add(shard_name)
+            shard_names.append(shard_name)
+        return shard_names
+
+    def split_contigs(self, sorted_contigs):
+        if self.number_of_shards == None:
+            return [(self.shard_filename(shard_name), [(sequence_identifier, contig)])
+                    for shard_name, (sequence_identifier, contig) in zip(self.replicon_shard_names(sorted_contigs), sorted_contigs)]
+
+        if self.number_of_shards >= len(sorted_contigs):
+            return [(self.shard_filename(shard_number + 1), [(sequence_identifier, contig)])
+                    for shard_number, (sequence_identifier, contig) in enumerate(sorted_contigs)]
+        number_of_shards = max(1, self.number_of_shards)
+        total_length = sum(contig.sequence.length for sequence_identifier, contig in sorted_contigs)
+        shards = [[] for shard_number in range(number_of_shards)]
+        cumulative_length = 0
+        for sequence_identifier, contig in sorted_contigs:
+            # place each contig by where its middle falls in the whole assembly
+            middle = cumulative_length + contig.sequence.length / 2.0
+            shard_number = min(int(middle * number_of_shards / max(total_length, 1)), number_of_shards - 1)
+            shards[shard_number].append((sequence_identifier, contig))
+            cumulative_length += contig.sequence.length
+        return [(self.shard_filename(shard_number + 1), contigs) for shard_number, contigs in enumerate(shards) if contigs]
+
+    def write(self, sorted_contigs):
+        shards = [(shard_filename, contigs, self.index) for shard_filename, contigs in self.split_contigs(sorted_contigs)]
+        if self.workers > 1 and len(shards) > 1:
+            pool = multiprocessing.Pool(min(self.workers, len(shards)))
+            try:
+                written_shards = self.report_progress(pool.imap(write_shard, shards, 1), len(sorted_contigs))
+            finally:
+                pool.close()
+                pool.join()
+        else:
+            written_shards = self.report_progress((write_shard(shard) for shard in shards), len(sorted_contigs))
+        self.write_manifest(written_shards)
+        return [shard_filename for shard_filename, number_of_contigs, shard_size in written_shards]
+
+    def report_progress(self, written_shards, number_of_contigs):
+        # Progress is reported as each shard is finished, in order
+        reported_shards = []
+        contigs_written = 0
+        bytes_written = 0
+        for shard_filename, number_of_shard_contigs, shard_size in written_shards:
+            reported_shards.append((shard_filename, number_of_shard_contigs, shard_size))
+            contigs_written += number_of_shard_contigs
+            bytes_written += shard_size
+            if self.progress != None:
+                self.progress.writing(contigs_written, number_of_contigs, bytes_written)
+        return reported_shards
+
+    def write_manifest(self, written_shards):
+        with open(self.manifest_filename + ".tmp", 'w') as manifest_file:
+            for shard_filename, number_of_contigs, shard_size in written_shards:
+                manifest_file.write("{}\t{}\t{}\n".format(os.path.basename(shard_filename), number_of_contigs, shard_size))
+        os.rename(self.manifest_filename + ".tmp", self.manifest_filename)
@@ -0,0 +1,142 @@
+/*
+ * Compiled versions of the two hottest formatting loops in EMBLContig:
+ *
+ *   format_sequence_body  the 60 bases per line SQ body written by
+ *                         EMBLSequence.format_sequence_body
+ *   wrap_attribute        the common case of EMBLFeature's qualifier
+ *                         wrapping, where the qualifier fits on one line
+ *
+ * Both give exactly the same output as the pure Python code, which is used
+ * instead whenever this module has not been built.
+ */
+
+#define PY_SSIZE_T_CLEAN
+#include <Python.h>
+#include <ctype.h>
+#include <stdio.h>
+#include <string.h>
+
+#if PY_MAJOR_VERSION >= 3
+#define TEXT_FROM_STRING_AND_SIZE PyUnicode_FromStringAndSize
+#else
+#define TEXT_FROM_STRING_AND_SIZE PyString_FromStringAndSize
+#endif
+
+#define BASES_PER_BLOCK 10
+#define BLOCKS_PER_LINE 6
+#define BASES_PER_LINE (BASES_PER_BLOCK * BLOCKS_PER_LINE)
+
+/* FT, spaces up to column 21, and 80 characters in all */
+#define ATTRIBUTE_INDENT "FT                   "
+#define ATTRIBUTE_INDENT_LENGTH 21
+#define ATTRIBUTE_LINE_WIDTH 80
+
+static PyObject *
+format_sequence_body(PyObject *self, PyObject *args)
+{
+    const char *sequence;
+    Py_ssize_t sequence_length;
+    Py_ssize_t offset = 0;
+    Py_ssize_t number_of_lines, line_start, position, block;
+    size_t maximum_length;
+    char *body, *output;
+    PyObject *result;
+
+    if (!PyArg_ParseTuple(args, "s#|n:format_sequence_body", &sequence, &sequence_length, &offset))
+        return NULL;
+
+    number_of_lines = (sequence_length + BASES_PER_LINE - 1) / BASES_PER_LINE;
+    /* 5 leading spaces, 6 blocks and the spaces after them, a position of
+       up to 20 digits and a new line */
+    maximum_length = (size_t)number_of_lines * (5 + BLOCKS_PER_LINE * (BASES_PER_BLOCK + 1) + 20 + 1) + 1;
+    body = (char *)PyMem_Malloc(maximum_length);
+    if (body == NULL)
+        return PyErr_NoMemory();
+
+    output = body;
+    for (line_start = 0; line_start < sequence_length; line_start += BASES_PER_LINE) {
+        Py_ssize_t line_end = line_start + BASES_PER_LINE;
+        if (line_end > sequence_length)
+            line_end = sequence_length;
+
+        memset(output, ' ', 5);
+        output += 5;
+        position = line_start;
+        for (block = 0; block < BLOCKS_PER_LINE; block++) {
+            Py_ssize_t column;
+            for (column = 0; column < BASES_PER_BLOCK; column++) {
+                if (position < line_end)
+                    *output++ = (char)tolower((unsigned char)sequence[position++]);
+                else
+                    *output++ = ' ';
+            }
+            if (block < BLOCKS_PER_LINE - 1)
+                *output++ = ' ';
+        }
+        output += sprintf(output, " %9ld\n", (long)(offset + line_end));
+    }
+    /* an empty sequence is still a single new line */
+    if (number_of_lines == 0)
+        *output++ = '\n';
+
+    result = TEXT_FROM_STRING_AND_SIZE(body, output - body);
+    PyMem_Free(body);
+    return result;
+}
+
+static PyObject *
+wrap_attribute(PyObject *self, PyObject *args)
+{
+    /* TextWrapper only changes text which fits on one line if it has
+       whitespace which would be replaced or dropped, so anything else is
+       just indented.  None is returned for everything else, which is wrapped
+       by TextWrapper as before. */
+    const char *text;
+    Py_ssize_t text_length, position;
+    char *line;
+    PyObject *result;
+
+    if (!PyArg_ParseTuple(args, "s#:wrap_attribute", &text, &text_length))
+        return NULL;
+
+    if (text_length == 0 || text_length > ATTRIBUTE_LINE_WIDTH - ATTRIBUTE_INDENT_LENGTH || text[text_length - 1] == ' ')
+        Py_RETURN_NONE;
+    for (position = 0; position < text_length; position++) {
+        char character = text[position];
+        if (character == '\t' || character == '\n' || character == '\v' || character == '\f' || character == '\r' || (unsigned char)character >= 0x80)
+            Py_RETURN_NONE;
+    }
+
+    line = (char *)PyMem_Malloc(ATTRIBUTE_INDENT_LENGTH + text_length);
+    if (line == NULL)
+        return PyErr_NoMemory();
+    memcpy(line, ATTRIBUTE_INDENT, ATTRIBUTE_INDENT_LENGTH);
+    memcpy(line + ATTRIBUTE_INDENT_LENGTH, text, text_length);
+    result = TEXT_FROM_STRING_AND_SIZE(line, ATTRIBUTE_INDENT_LENGTH + text_length);
+    PyMem_Free(line);
+    return result;
+}
+
+static PyMethodDef cformat_methods[] = {
+    {"format_sequence_body", format_sequence_body, METH_VARARGS, "Format a sequence as the body of an EMBL SQ section, optionally numbered from an offset."},
+    {"wrap_attribute", wrap_attribute, METH_VARARGS, "Indent a qualifier which fits on one line, or return None."},
+    {NULL, NULL, 0, NULL}
+};
+
+#if PY_MAJOR_VERSION >= 3
+static struct PyModuleDef cformat_module = {
+    PyModuleDef_HEAD_INIT, "_cformat", NULL, -1, cformat_methods
+};
+
+PyMODINIT_FUNC
+PyInit__cformat(void)
+{
+    return PyModule_Create(&cformat_module);
+}
+#else
+PyMODINIT_FUNC
+init_cformat(void)
+{
+    Py_InitModule("_cformat", cformat_methods);
+}
+#endif
@@ -0,0 +1,80 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.BatchJournal import BatchJournal
+from gff3toembl.BatchRunner import BatchJob
+
+class TestBatchJournal(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.journal_filename = os.path.join(self.temporary_directory, 'journal')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def write_file(self, filename, content):
+    with open(os.path.join(self.temporary_directory, filename), 'w') as output_file:
+      output_file.write(content)
+    return os.path.join(self.temporary_directory, filename)
+
+  def create_job(self, name, arguments = ['Organism']):
+    input_filename = self.write_file(name + '.gff', "##gff-version 3\n" + name + "\n")
+    output_filename = self.write_file(name + '.embl', "ID   " + name + "\n//\n")
+    return BatchJob(name, arguments, input_filename, output_filename)
+
+  def test_record_and_read(self):
+    job = self.create_job('first')
+    BatchJournal(self.journal_filename).record(job)
+    journal = BatchJournal(self.journal_filename).read()
+    self.assertTrue(journal.is_complete(self.create_job('first')))
+    self.assertFalse(journal.is_complete(self.create_job('second')))
+    with open(self.journal_filename, 'r') as journal_file:
+      self.assertEqual(journal_file.readline(), BatchJournal.header)
+
+  def test_changed_input(self):
+    job = self.create_job('first')
+    BatchJournal(self.journal_filename).record(job)
+    job = BatchJob('first', job.arguments, self.write_file('first.gff', "##gff-version 3\nFIRST\n"), job.output_filename)
+    self.assertFalse(BatchJournal(self.journal_filename).read().is_complete(job))
+
+  def test_changed_arguments(self):
+    BatchJournal(self.journal_filename).record(self.create_job('first'))
+    self.assertFalse(BatchJournal(self.journal_filename).read().is_complete(self.create_job('first', ['Another organism'])))
+
+  def test_missing_output(self):
+    job = self.create_job('first')
+    BatchJournal(self.journal_filename).record(job)
+    os.remove(job.output_filename)
+    self.assertFalse(BatchJournal(self.journal_filename).read().is_complete(job))
+
+  def test_no_output_is_not_recorded(self):
+    job = self.create_job('first')
+    os.remove(job.output_filename)
+    self.assertFalse(BatchJournal(self.journal_filename).record(job))
+    self.assertFalse(os.path.exists(self.journal_filename))
+    job.output_filename = None
+    self.assertFalse(BatchJournal(self.journal_filename).record(job))
+
+  def test_sharded_output(self):
+    job = self.create_job('first')
+    os.remove(job.output_filename)
+    shard_sizes = [len(self.write_file('first.{}.embl'.format(shard_number), "ID   shard\n//\n" * shard_number)) for shard_number in [1, 2]]
+    self.write_file('first.embl.manifest', "first.1.embl\t1\t{}\nfirst.2.embl\t2\t{}\n".format(*[os.path.getsize(os.path.join(self.temporary_directory, 'first.{}.embl'.format(shard_number))) for shard_number in [1, 2]]))
+    self.assertTrue(BatchJournal(self.journal_filename).record(job))
+    self.assertTrue(BatchJournal(self.journal_filename).read().is_complete(job))
+    os.remove(os.path.join(self.temporary_directory, 'first.2.embl'))
+    self.assertFalse(BatchJournal(self.journal_filename).read().is_complete(job))
+
+  def test_partly_written_line(self):
+    BatchJournal(self.journal_filename).record(self.create_job('first'))
+    with open(self.journal_filename, 'a') as journal_file:
+      journal_file.write("second\t12")
+    journal = BatchJournal(self.journal_filename).read()
+    self.assertEqual(list(journal.entries.keys()), ['first'])
+    journal.record(self.create_job('third'))
+    self.assertEqual(sorted(BatchJournal(self.journal_filename).read().entries.keys()), ['first', 'third'])
+
+  def test_no_journal(self):
+    self.assertEqual(BatchJournal(self.journal_filename).read().entries, {})
@@ -0,0 +1,146 @@
+import unittest
+import mock
+import os
+import shutil
+import sys
+import tempfile
+from gff3toembl.BatchJournal import BatchJournal
+from gff3toembl.BatchRunner import BatchJob, BatchRunner
+
+# Stands in for gff3_to_embl: logs that it ran, holds some memory and exits
+fake_conversion = """
+import sys
+with open(sys.argv[1], 'a') as log_file:
+    log_file.write(sys.argv[2] + '\\n')
+with open(sys.argv[5], 'w') as output_file:
+    output_file.write(sys.argv[2] + '\\n')
+memory = 'a' * (int(sys.argv[3]) * 1024 * 1024)
+sys.exit(int(sys.argv[4]))
+"""
+
+class TestBatchRunner(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.log_filename = os.path.join(self.temporary_directory, 'log')
+    self.command = [sys.executable, '-c', fake_conversion]
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def create_job(self, name, input_size, megabytes = 0, exit_status = 0, sequence_length = None):
+    input_filename = os.path.join(self.temporary_directory, name + '.gff')
+    with open(input_filename, 'w') as input_file:
+      input_file.write("##gff-version 3\n")
+      if sequence_length != None:
+        input_file.write("##sequence-region {} 1 {}\n".format(name, sequence_length))
+      input_file.write('#' * input_size + "\n")
+    output_filename = os.path.join(self.temporary_directory, name + '.embl')
+    return BatchJob(name, [self.log_filename, name, str(megabytes), str(exit_status), output_filename], input_filename, output_filename)
+
+  def read_lines(self, filename):
+    with open(filename, 'r') as input_file:
+      return input_file.read().splitlines()
+
+  def test_sequence_length(self):
+    job = self.create_job('contigs', 10, sequence_length = 5000)
+    BatchRunner([job]).estimate(job)
+    self.assertEqual(job.sequence_length, 5000)
+    self.assertEqual(job.input_size, os.path.getsize(job.input_filename))
+
+  def test_longest_jobs_first(self):
+    jobs = [self.create_job('small', 10), self.create_job('large', 10000), self.create_job('medium', 10, sequence_length = 20000)]
+    report_filename = os.path.join(self.temporary_directory, 'report')
+    self.assertTrue(BatchRunner(jobs, 1, None, report_filename, self.command).run())
+    self.assertEqual(self.read_lines(self.log_filename), ['large', 'medium', 'small'])
+    report_lines = self.read_lines(report_filename)
+    self.assertEqual(report_lines[0], "job\tpredicted_seconds\tactual_seconds\tpredicted_peak_rss_megabytes\tactual_peak_rss_megabytes\texit_status")
+    self.assertEqual([line.split('\t')[0] for line in report_lines[1:]], ['large', 'medium', 'small'])
+
+  def test_peak_memory_of_each_job(self):
+    jobs = [self.create_job('small', 10), self.create_job('large', 10000, megabytes = 64)]
+    runner = BatchRunner(jobs, 2, None, None, self.command)
+    self.assertTrue(runner.run())
+    self.assertTrue(jobs[1].actual_megabytes >= 64)
+    self.assertTrue(jobs[0].actual_megabytes < 64)
+    # a job which needed more memory than predicted makes the predictions bigger
+    self.assertTrue(runner.megabytes_per_byte > BatchRunner.megabytes_per_byte)
+
+  def test_failed_job(self):
+    jobs = [self.create_job('good', 10), self.create_job('bad', 10, exit_status = 3)]
+    runner = BatchRunner(jobs, 2, None, None, self.command)
+    self.assertFalse(runner.run())
+    self.assertEqual(sorted((job.name, job.exit_status) for job in runner.finished_jobs), [('bad', 3), ('good', 0)])
+
+  def test_resume(self):
+    journal_filename = os.path.join(self.temporary_directory, 'journal')
+    jobs = [self.create_job('first', 10), self.create_job('second', 20), self.create_job('third', 30, exit_status = 1)]
+    self.assertFalse(BatchRunner(jobs, 1, None, None, self.command, journal = BatchJournal(journal_filename)).run())
+    self.assertEqual(sorted(BatchJournal(journal_filename).read().entries.keys()), ['first', 'second'])
+
+    os.remove(self.log_filename)
+    jobs = [self.create_job('first', 10), self.create_job('second', 20), self.create_job('third', 30)]
+    self.assertTrue(BatchRunner(jobs, 1, None, None, self.command, journal = BatchJournal(journal_filename), resume = True).run())
+    self.assertEqual(self.read_lines(self.log_filename), ['third'])
+
+    # the second's input has changed since it was converted
+    os.remove(self.log_filename)
+    jobs = [self.create_job('first', 10), self.create_job('second', 25), self.create_job('third', 30)]
+    self.assertTrue(BatchRunner(jobs, 1, None, None, self.command, journal = BatchJournal(journal_filename), resume = True).run())
+    self.assertEqual(self.read_lines(self.log_filename), ['second'])
+
+    # the first's output has gone
+    os.remove(self.log_filename)
+    os.remove(jobs[0].output_filename)
+    self.assertTrue(BatchRunner(jobs, 1, None, None, self.command, journal = BatchJournal(journal_filename), resume = True).run())
+    self.assertEqual(self.read_lines(self.log_filename), ['first'])
+
+  def test_resume_compressed_output(self):
+    # with --gzip gff3_to_embl adds .gz to the output filename it is given
+    journal_filename = os.path.join(self.temporary_directory, 'journal')
+    job = self.create_job('compressed', 10)
+    job.arguments[-1] = job.output_filename + '.gz'
+    with mock.patch('sys.stderr') as stderr:
+      self.assertTrue(BatchRunner([job], 1, None, None, self.command, journal = BatchJournal(journal_filename)).run())
+    self.assertEqual(stderr.write.call_args_list, [])
+    self.assertEqual(BatchJournal(journal_filename).read().entries['compressed'][3], job.output_filename + '.gz')
+
+    os.remove(self.log_filename)
+    job = self.create_job('compressed', 10)
+    job.arguments[-1] = job.output_filename + '.gz'
+    self.assertTrue(BatchRunner([job], 1, None, None, self.command, journal = BatchJournal(journal_filename), resume = True).run())
+    self.assertFalse(os.path.exists(self.log_filename))
+
+  def test_progress(self):
+    jobs = [self.create_job('first', 10)]
+    with mock.patch('sys.stderr') as stderr:
+      self.assertTrue(BatchRunner(jobs, 1, None, None, self.command).run())
+    self.assertEqual(stderr.write.call_args_list, [])
+    with mock.patch('sys.stderr') as stderr:
+      self.assertTrue(BatchRunner(jobs, 1, None, None, self.command, progress = True).run())
+    self.assertEqual(len(stderr.write.call_args_list), 1)
+    self.assertTrue(stderr.write.call_args[0][0].startswith('first: finished in '))
+
+  def test_memory_admission(self):
+    runner = BatchRunner([], 4, 1000)
+    jobs = [self.create_job(name, 10) for name in ['first', 'second', 'third']]
+    for job, predicted_megabytes in zip(jobs, [800, 500, 150]):
+      job.predicted_megabytes = predicted_megabytes
+    self.assertEqual(runner.next_job(jobs).name, 'first')
+    runner.running[1] = (jobs[0], None)
+    # the second doesn't fit alongside the first but the third does
+    self.assertEqual(runner.next_job(jobs[1:]).name, 'third')
+    runner.running[2] = (jobs[2], None)
+    self.assertEqual(runner.next_job(jobs[1:2]), None)
+    # a job bigger than the budget runs on its own
+    runner.running = {}
+    jobs[1].predicted_megabytes = 2000
+    self.assertEqual(runner.next_job(jobs[1:2]).name, 'second')
+    runner.running[1] = (jobs[0], None)
+    self.assertEqual(runner.next_job(jobs[1:2]), None)
+
+  def test_workers(self):
+    runner = BatchRunner([], 1)
+    jobs = [self.create_job(name, 10) for name in ['first', 'second']]
+    runner.running[1] = (jobs[0], None)
+    self.assertEqual(runner.next_job(jobs[1:]), None)
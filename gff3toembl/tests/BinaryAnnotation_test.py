@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.BinaryAnnotation import BinaryAnnotation
+from gff3toembl.EMBLContig import EMBLContig
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+
+class TestBinaryAnnotation(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.binary_filename = os.path.join(self.temporary_directory, 'annotation.bin')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def create_contigs(self):
+    contig_1 = EMBLContig()
+    contig_1.add_feature(sequence_id = 'contig1', feature_type = 'CDS', start = 10, end = 90, strand = '-',
+                         feature_attributes = {'product': 'my product', 'locus_tag': 'ABC_00001', 'codon_start': '2'})
+    contig_1.add_feature(sequence_id = 'contig1', feature_type = 'tRNA', start = 1, end = 9, strand = '+',
+                         feature_attributes = {'product': 'tRNA-Ser', 'locus_tag': 'ABC_00002'})
+    contig_1.add_sequence('ACGTACGTNN' * 10)
+    contig_2 = EMBLContig()
+    contig_2.add_feature(sequence_id = 'contig2', feature_type = 'CDS', start = 1, end = 30, strand = '+',
+                         feature_attributes = {'product': 'my product', 'locus_tag': 'ABC_00003'})
+    contig_3 = EMBLContig()
+    contig_3.add_sequence('AAAAAAA')
+    return {'contig1': contig_1, 'contig2': contig_2, 'contig3': contig_3}
+
+  def describe_contigs(self, contigs):
+    description = {}
+    for sequence_identifier, contig in contigs.items():
+      features = [(feature.feature_type, feature.start, feature.end, feature.strand, feature.attributes) for feature in contig.sorted_features()]
+      sequence = contig.sequence.sequence_string if contig.sequence != None else None
+      description[sequence_identifier] = (features, sequence)
+    return description
+
+  def test_write_and_read(self):
+    contigs = self.create_contigs()
+    binary_annotation = BinaryAnnotation(self.binary_filename)
+    binary_annotation.write(contigs)
+    self.assertTrue(binary_annotation.is_binary_annotation())
+    read_contigs = binary_annotation.read({})
+    self.assertEqual(self.describe_contigs(read_contigs), self.describe_contigs(contigs))
+    self.assertEqual(read_contigs['contig1'].sorted_features()[1].attributes[-1], ('transl_table', 11))
+
+  def test_write_packed_sequences_a_block_at_a_time(self):
+    contigs = {}
+    for sequence_identifier, sequence_string in [('contig1', 'ACGTACGTNN' * 50), ('contig2', 'GGGCCCRY' * 40)]:
+      contigs[sequence_identifier] = EMBLContig()
+      contigs[sequence_identifier].add_sequence(sequence_string, packed = True)
+      contigs[sequence_identifier].sequence.packed_block_size = 64
+    unpacked_lengths = []
+    for contig in contigs.values():
+      def unpack(start, end, unpack = contig.sequence.packed_sequence.unpack):
+        unpacked_lengths.append(end - start)
+        return unpack(start, end)
+      contig.sequence.packed_sequence.unpack = unpack
+    BinaryAnnotation(self.binary_filename).write(contigs)
+    self.assertEqual(max(unpacked_lengths), 64)
+    read_contigs = BinaryAnnotation(self.binary_filename).read({})
+    self.assertEqual(read_contigs['contig1'].sequence.sequence_string, 'acgtacgtnn' * 50)
+    self.assertEqual(read_contigs['contig2'].sequence.sequence_string, 'gggcccry' * 40)
+
+  def test_read_with_new_locus_tag_and_translation_table(self):
+    BinaryAnnotation(self.binary_filename).write(self.create_contigs())
+    read_contigs = BinaryAnnotation(self.binary_filename).read({}, 'NEW', 4)
+    attributes = read_contigs['contig1'].sorted_features()[1].attributes
+    self.assertTrue(('locus_tag', 'NEW_00001') in attributes)
+    self.assertEqual(attributes[-1], ('transl_table', 4))
+
+  def test_is_binary_annotation(self):
+    self.assertFalse(BinaryAnnotation(os.path.join(data_dir, 'single_feature.gff')).is_binary_annotation())
+    self.assertFalse(BinaryAnnotation(self.binary_filename).is_binary_annotation())
+
+  def test_read_wrong_version(self):
+    BinaryAnnotation(self.binary_filename).write(self.create_contigs())
+    binary_annotation = BinaryAnnotation(self.binary_filename)
+    binary_annotation.version = 2
+    self.assertRaises(ValueError, binary_annotation.read, {})
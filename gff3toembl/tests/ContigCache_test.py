@@ -0,0 +1,75 @@
+import unittest
+import os
+import shutil
+import tempfile
+from mock import patch
+from gff3toembl.ContigCache import ContigCache
+from gff3toembl.EMBLContig import EMBLContig
+
+class TestContigCache(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.output_filename = os.path.join(self.temporary_directory, 'output.embl')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def create_contig(self, sequence_identifier, product):
+    contig = EMBLContig()
+    contig.add_feature(
+        sequence_id = sequence_identifier,
+        feature_type = 'CDS',
+        start = 1,
+        end = 9,
+        strand = '+',
+        feature_attributes =  {'product': product }
+    )
+    contig.add_sequence('ACGTACGTACGT')
+    contig.add_header(
+        organism = 'My organism',
+        sequence_identifier = sequence_identifier,
+        sequence_length = 12,
+        sequence_name = sequence_identifier,
+        taxon_id = 1234
+    )
+    return contig
+
+  def write_output(self, contigs):
+    cache = ContigCache(self.output_filename)
+    with open(self.output_filename + '.tmp', 'w') as output_file:
+      for sequence_identifier, contig in sorted(contigs.items()):
+        output_file.write(cache.format_contig(sequence_identifier, contig))
+    cache.close()
+    os.rename(self.output_filename + '.tmp', self.output_filename)
+    cache.save()
+    with open(self.output_filename, 'r') as output_file:
+      return cache, output_file.read()
+
+  def test_unchanged_contigs_are_reused(self):
+    contigs = {'contig1': self.create_contig('contig1', 'product 1'), 'contig2': self.create_contig('contig2', 'product 2')}
+    cache, first_output = self.write_output(contigs)
+    self.assertEqual(cache.reused_contigs, 0)
+    self.assertEqual(first_output, contigs['contig1'].format() + "//\n" + contigs['contig2'].format() + "//\n")
+
+    contigs = {'contig1': self.create_contig('contig1', 'product 1'), 'contig2': self.create_contig('contig2', 'new product')}
+    with patch.object(contigs['contig1'], 'format') as format_mock:
+      cache, second_output = self.write_output(contigs)
+      self.assertFalse(format_mock.called)
+    self.assertEqual(cache.reused_contigs, 1)
+    self.assertEqual(second_output, first_output.replace('product 2', 'new product'))
+
+  def test_cache_ignored_when_output_changed(self):
+    contigs = {'contig1': self.create_contig('contig1', 'product 1')}
+    self.write_output(contigs)
+    with open(self.output_filename, 'a') as output_file:
+      output_file.write("extra")
+    cache = ContigCache(self.output_filename)
+    self.assertEqual(cache.previous_contigs, {})
+    cache.close()
+
+  def test_contig_hash(self):
+    contig_hash = self.create_contig('contig1', 'product 1').calculate_hash()
+    self.assertEqual(self.create_contig('contig1', 'product 1').calculate_hash(), contig_hash)
+    self.assertNotEqual(self.create_contig('contig1', 'product 2').calculate_hash(), contig_hash)
+    self.assertNotEqual(self.create_contig('contig2', 'product 1').calculate_hash(), contig_hash)
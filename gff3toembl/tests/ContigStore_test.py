@@ -0,0 +1,54 @@
+import unittest
+import os
+from gff3toembl.ContigStore import ContigStore
+from gff3toembl.EMBLContig import EMBLContig
+
+class TestContigStore(unittest.TestCase):
+
+  def create_contig(self, sequence_identifier):
+    contig = EMBLContig()
+    contig.add_feature(
+        sequence_id = sequence_identifier,
+        feature_type = 'CDS',
+        start = 1,
+        end = 9,
+        strand = '+',
+        feature_attributes =  {'product': 'my product' }
+    )
+    return contig
+
+  def test_contigs_are_spilled_over_budget(self):
+    contig_size = self.create_contig('contig1').estimated_size
+    store = ContigStore(contig_size * 2)
+    for sequence_identifier in ['contig1', 'contig2', 'contig3', 'contig4']:
+      store[sequence_identifier] = self.create_contig(sequence_identifier)
+    self.assertEqual(list(store.in_memory.keys()), ['contig3', 'contig4'])
+    self.assertEqual(store.spilled, set(['contig1', 'contig2']))
+    self.assertEqual(len(store), 4)
+    self.assertEqual(sorted(store.keys()), ['contig1', 'contig2', 'contig3', 'contig4'])
+    self.assertTrue('contig1' in store)
+    self.assertFalse('contig5' in store)
+    self.assertEqual(store.get('contig5'), None)
+
+    # contigs read back from the database have to be stored again
+    contig = store['contig1']
+    self.assertEqual(len(contig.features), 1)
+    contig.add_sequence('ACGTACGTACGT')
+    store['contig1'] = contig
+    self.assertEqual(list(store.in_memory.keys()), ['contig1'])
+    self.assertEqual(store['contig1'].sequence.length, 12)
+    self.assertEqual(store.memory_used, contig.estimated_size)
+    store.close()
+    self.assertFalse(os.path.exists(store.database_filename))
+
+  def test_delete(self):
+    contig_size = self.create_contig('contig1').estimated_size
+    store = ContigStore(contig_size)
+    store['contig1'] = self.create_contig('contig1')
+    store['contig2'] = self.create_contig('contig2')
+    del store['contig1']
+    del store['contig2']
+    self.assertEqual(len(store), 0)
+    self.assertEqual(store.memory_used, 0)
+    self.assertRaises(KeyError, store.__delitem__, 'contig1')
+    store.close()
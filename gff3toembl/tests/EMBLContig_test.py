@@ -1,6 +1,9 @@
 import unittest
+import sys
 from mock import MagicMock, patch
 from gff3toembl.EMBLContig import EMBLContig, EMBLHeader, EMBLFeature, EMBLSequence
+from gff3toembl.ErrorReport import QualifierError
+from gff3toembl.LineLengthValidator import LineLengthValidator, LineLengthError
 
 
 class TestEMBLContig(unittest.TestCase):
@@ -196,6 +199,33 @@ Sequence
     self.assertEqual(contig.header, None)
     self.assertRaises(ValueError, contig.format)
 
+  def test_format_long_line_in_header(self):
+    contig = EMBLContig()
+    contig.sequence = self.create_blank_bit_of_contig()
+    contig.add_header(sequence_identifier = 'contig' * 20, sequence_length = 8)
+    with self.assertRaises(LineLengthError) as context:
+      contig.format()
+    self.assertEqual(context.exception.violations[0].contig, 'contig' * 20)
+    self.assertEqual(context.exception.violations[0].line, 'AC * _' + 'contig' * 20)
+    self.assertFalse(contig.sequence.format.called)
+
+  def test_format_long_lines_in_features(self):
+    contig = EMBLContig()
+    contig.add_feature(sequence_id = 'contig1', feature_type = 'misc_feature_with_a_very_long_name' * 3, start = 1, end = 10,
+                       strand = '+', feature_attributes = {'note': 'ABC'})
+    contig.add_feature(sequence_id = 'contig1', feature_type = 'tRNA', start = 20, end = 30,
+                       strand = '+', feature_attributes = {'note': 'ABC'})
+    contig.add_sequence('AAAACCCGGTNN' * 3)
+    contig.add_header(sequence_identifier = 'contig1', sequence_length = 36)
+    with self.assertRaises(LineLengthError) as context:
+      contig.format()
+    self.assertEqual(context.exception.violations[0].feature, 'misc_feature_with_a_very_long_name' * 3 + ' 1..10')
+
+    validator = LineLengthValidator(collect = True)
+    formatted_contig = contig.format(validator)
+    self.assertEqual(len(validator.violations), 1)
+    self.assertTrue('FT   tRNA            20..30' in formatted_contig)
+
 class TestEMBLHeader(unittest.TestCase):
 
   def test_initialize_header_object(self):
@@ -396,6 +426,26 @@ FT                   /note="chromX"
     self.assertEqual(calculated_attributes, expected_attributes)
 
 
+  def test_format_reuses_shared_blocks(self):
+    EMBLHeader.shared_blocks.clear()
+    EMBLFeature.formatted_shared_attributes.clear()
+    header_details = {'authors': 'John Doe', 'organism': 'My organism', 'project': 'PRJ1234', 'taxon_id': 5678}
+    header_1 = EMBLHeader(sequence_identifier = 'contig1', sequence_length = 100, sequence_name = 'contig1', **header_details)
+    header_2 = EMBLHeader(sequence_identifier = 'contig2', sequence_length = 2000, sequence_name = 'contig2', **header_details)
+    formatted_header_1 = header_1.format()
+    formatted_header_2 = header_2.format()
+    self.assertEqual(len(EMBLHeader.shared_blocks), 1)
+    self.assertEqual(sorted(EMBLFeature.formatted_shared_attributes.keys()),
+                     [('db_xref', 'taxon:5678'), ('mol_type', 'genomic DNA'), ('organism', 'My organism')])
+    self.assertEqual(formatted_header_2, formatted_header_1.replace('100 BP.', '2000 BP.')
+                                                           .replace('contig1', 'contig2')
+                                                           .replace('1..100', '1..2000'))
+
+    header_2.authors = 'Jane Doe'
+    self.assertTrue('RA   Jane Doe;\n' in header_2.format())
+    self.assertTrue('RA   John Doe;\n' in header_1.format())
+    self.assertEqual(len(EMBLHeader.shared_blocks), 2)
+
 class TestEMBLFeature(unittest.TestCase):
 
   def create_uninitialized_feature(self):
@@ -421,6 +471,39 @@ class TestEMBLFeature(unittest.TestCase):
     expected_attributes = [('some_attribute', 'ABC')]
     self.assertItemsEqual(feature.attributes, expected_attributes)
 
+  def test_initializer_shares_repeated_attributes(self):
+    def create_feature(locus_tag):
+      # new strings each time, as they would be from the GFF3 file
+      return EMBLFeature(feature_type='CDS', start=100, end=200, strand='+',
+                         feature_attributes={''.join(['inference']): ''.join(['ab initio prediction:Prodigal:2.60']),
+                                             'locus_tag': ''.join(['ABC_', locus_tag])})
+    first_feature = create_feature('00001')
+    second_feature = create_feature('00002')
+    first_attributes = dict((attribute[0], attribute) for attribute in first_feature.attributes)
+    second_attributes = dict((attribute[0], attribute) for attribute in second_feature.attributes)
+    self.assertIs(first_attributes['inference'], second_attributes['inference'])
+    self.assertIs(first_attributes['transl_table'], second_attributes['transl_table'])
+    self.assertIsNot(first_attributes['locus_tag'], second_attributes['locus_tag'])
+    self.assertEqual(second_attributes['locus_tag'], ('locus_tag', 'ABC_00002'))
+
+  def test_estimated_attributes_size_counts_shared_attributes_once(self):
+    EMBLFeature.shared_attributes.clear()
+    feature = EMBLFeature(feature_type='CDS', start=100, end=200, strand='+',
+                          feature_attributes={'inference': 'ab initio prediction:Prodigal:2.60', 'locus_tag': 'ABC_00001'})
+    locus_tag = [attribute for attribute in feature.attributes if attribute[0] == 'locus_tag'][0]
+    # only the list and the locus_tag, whose value differs on every feature, are the feature's own
+    self.assertEqual(feature.estimated_attributes_size(),
+                     sys.getsizeof(feature.attributes) + sys.getsizeof(locus_tag) + sys.getsizeof(locus_tag[1]))
+    shared_size = EMBLFeature.shared_attributes_size()
+    self.assertTrue(shared_size > sys.getsizeof(EMBLFeature.shared_attributes))
+    EMBLFeature(feature_type='CDS', start=300, end=400, strand='+',
+                feature_attributes={'inference': 'ab initio prediction:Prodigal:2.60', 'locus_tag': 'ABC_00002'})
+    self.assertEqual(EMBLFeature.shared_attributes_size(), shared_size)
+    # not shared once the table is cleared
+    EMBLFeature.shared_attributes.clear()
+    self.assertEqual(feature.estimated_attributes_size(),
+                     sys.getsizeof(feature.attributes) + sum(sys.getsizeof(attribute) + sum(map(sys.getsizeof, attribute)) for attribute in feature.attributes))
+
   def test_initializer_for_ignored_features(self):
     feature = EMBLFeature(
         feature_type='ncRNA',
@@ -431,6 +514,12 @@ class TestEMBLFeature(unittest.TestCase):
     )
     self.assertEqual(feature.format(), None)
 
+  def test_add_ignored_feature(self):
+    contig = EMBLContig()
+    self.assertFalse(contig.add_feature(sequence_id = 'contig1', feature_type = 'ncRNA', start = 100, end = 200, strand = '+',
+                                        feature_attributes = {'some_attribute': 'ABC' }))
+    self.assertEqual(contig.features, {})
+
   def test_format(self):
     feature = self.create_uninitialized_feature()
     feature.feature_type = "feature_type"
@@ -474,6 +563,19 @@ FT                   /attributeB="baz"
     )
     self.assertEqual(feature.format(), None)
 
+  def test_create_empty_feature_keeps_type_and_coordinates(self):
+    # EMBLContig.add_feature uses them to check for duplicates before it
+    # finds out that the feature is to be ignored
+    feature = EMBLFeature(feature_type = 'ncRNA', start = 100, end = 200, strand = '+',
+                          feature_attributes = {'some_attribute': 'ABC'})
+    self.assertEqual((feature.feature_type, feature.start, feature.end), ('ncRNA', 100, 200))
+    contig = EMBLContig()
+    self.assertFalse(contig.add_feature(sequence_id = 'contig1', feature_type = 'ncRNA', start = 100, end = 200, strand = '+',
+                                        feature_attributes = {}))
+    self.assertTrue(contig.add_feature(sequence_id = 'contig1', feature_type = 'tRNA', start = 100, end = 200, strand = '+',
+                                       feature_attributes = {}))
+    self.assertEqual(list(contig.features.keys()), ['contig1_tRNA_100_200'])
+
   def test_create_default_feature(self):
     feature = self.create_uninitialized_feature()
     feature.create_default_feature(
@@ -551,6 +653,20 @@ FT                   /attributeB="baz"
     expected_attributes = [('gene', 'dnaA'),('codon_start', 1), ('locus_tag', 'ABC_001'), ('transl_table', 11)]
     self.assertItemsEqual(feature.attributes, expected_attributes)
 
+  def test_create_feature_with_bad_qualifier(self):
+    feature = self.create_uninitialized_feature()
+    with self.assertRaises(QualifierError) as context:
+      feature.create_CDS_feature(
+          feature_type='CDS',
+          start = 100,
+          end = 200,
+          strand = '+',
+          feature_attributes =  {'codon_start': 'abc'},
+          locus_tag = None,
+          translation_table = 11
+      )
+    self.assertEqual(context.exception.qualifier, 'codon_start')
+
   def test_create_source_feature(self):
     feature = self.create_uninitialized_feature()
     feature.create_source_feature(
@@ -882,6 +998,34 @@ class TestEMBLSequence(unittest.TestCase):
     self.assertEqual(sequence.body, expected_body)
     self.assertEqual(sequence.length, 12)
 
+  def test_init_packed(self):
+    sequence = EMBLSequence('AAAACCCGGTNN', packed=True)
+    expected_header = "XX\nSQ   Sequence 12 BP; 4 A; 3 C; 2 G; 1 T; 2 other;"
+    expected_body = '     aaaacccggt nn                                                            12\n'
+    self.assertEqual(sequence.header, expected_header)
+    self.assertEqual(sequence.body, expected_body)
+    self.assertEqual(sequence.length, 12)
+    self.assertEqual(sequence.sequence_string, None)
+    self.assertEqual(''.join(sequence.sequence_blocks()), 'aaaacccggtnn')
+    self.assertEqual(sequence.calculate_digest(), EMBLSequence('AAAACCCGGTNN').calculate_digest())
+
+  def test_packed_sequence_is_formatted_in_blocks(self):
+    sequence_string = 'ACGTTGCANNRYacgt' * 500 + 'ACG'
+    packed_sequence = EMBLSequence(sequence_string, packed=True)
+    packed_sequence.packed_block_size = 120
+    unpacked_sequence = EMBLSequence(sequence_string)
+    self.assertEqual(packed_sequence.format(), unpacked_sequence.format())
+    self.assertEqual(EMBLSequence('', packed=True).format(), EMBLSequence('').format())
+
+  def test_sequence_blocks(self):
+    sequence_string = 'ACGTTGCANNRYacgt' * 20 + 'ACG'
+    packed_sequence = EMBLSequence(sequence_string, packed=True)
+    packed_sequence.packed_block_size = 120
+    blocks = list(packed_sequence.sequence_blocks())
+    self.assertEqual([len(block) for block in blocks], [120, 120, 83])
+    self.assertEqual(''.join(blocks), sequence_string.lower())
+    self.assertEqual(list(EMBLSequence(sequence_string).sequence_blocks()), [sequence_string])
+
   def test_format(self):
     sequence = self.create_uninitialized_sequence()
     sequence.header = "XX\nSQ   Sequence 12 BP; 4 A; 3 C; 2 G; 1 T; 2 other;"
@@ -1036,3 +1180,10 @@ SQ   Sequence 12 BP; 4 A; 3 C; 2 G; 1 T; 2 other;
 """
     calculated_string = sequence.format_sequence_body(sequence_string)
     self.assertEqual(calculated_string, expected_string)
+
+    sequence_string="tctgacaatcgctttctt"
+    expected_string = """\
+     tctgacaatc gctttctt                                                     138
+"""
+    calculated_string = sequence.format_sequence_body(sequence_string, 120)
+    self.assertEqual(calculated_string, expected_string)
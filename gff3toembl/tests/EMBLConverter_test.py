@@ -2,6 +2,7 @@ import unittest
 import mock
 from gff3toembl.EMBLConverter import EMBLConverter
 from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.ErrorReport import ErrorReport
 
 class TestEMBLConverter(unittest.TestCase):
 
@@ -11,6 +12,7 @@ class TestEMBLConverter(unittest.TestCase):
       'get_type.return_value': feature_type,
       'get_start.return_value': start,
       'get_end.return_value': end,
+      'get_range.return_value': mock.Mock(start=start, end=end),
       'get_strand.return_value': strand
     }
     return mock.Mock(attribs={'attribute_key': attributes}, **mock_methods)
@@ -76,3 +78,55 @@ class TestEMBLConverter(unittest.TestCase):
     converter.visit_feature_node(feature_node)
     self.assertEqual(converter.contigs.keys(), [1])
     self.assertIsInstance(converter.contigs[1], EMBLContig)
+
+  def test_feature_record(self):
+    converter = EMBLConverter(None)
+    feature_node = self.mock_feature_node(1, 'CDS', 1, 100, '+', {'attr_k1': 'attr_v1'})
+    self.assertEqual(converter.feature_record(feature_node), (1, 'CDS', 1, 100, '+', {'attribute_key': {'attr_k1': 'attr_v1'}}))
+    # both coordinates come from one call
+    self.assertFalse(feature_node.get_start.called)
+    self.assertFalse(feature_node.get_end.called)
+
+  def test_feature_record_ignored_type_skips_attributes(self):
+    converter = EMBLConverter(None)
+    feature_node = mock.Mock(**{
+      'get_seqid.return_value': 1,
+      'get_type.return_value': 'ncRNA',
+      'get_range.return_value': mock.Mock(start=1, end=100),
+      'get_strand.return_value': '+'
+    })
+    type(feature_node).attribs = mock.PropertyMock(side_effect=AssertionError("attributes fetched"))
+    self.assertEqual(converter.feature_record(feature_node), (1, 'ncRNA', 1, 100, '+', {}))
+    converter.visit_feature_node(feature_node)
+    self.assertEqual(converter.contigs, {})
+
+  def test_add_feature_record(self):
+    converter = EMBLConverter(None)
+    for feature_record in [
+      ('contig1', 'CDS', 1, 100, '+', {'ID': 'gene1'}),
+      ('contig1', 'CDS', 101, 200, '-', {'ID': 'gene2'}),
+      ('contig2', 'ncRNA', 1, 100, '+', {}),
+      ('contig3', 'tRNA', 1, 100, '+', {'ID': 'gene3'})
+    ]:
+      converter.add_feature_record(*feature_record)
+    self.assertEqual(sorted(converter.contigs.keys()), ['contig1', 'contig3'])
+    self.assertEqual(len(converter.contigs['contig1'].features), 2)
+    self.assertEqual(converter.features_parsed, 4)
+
+  def test_add_feature_record_with_error_report(self):
+    converter = EMBLConverter(None)
+    converter.error_report = ErrorReport('errors.tsv')
+    for feature_record in [
+      ('contig1', 'CDS', 1, 100, '+', {'ID': 'gene1'}),
+      ('contig1', 'CDS', 101, 200, '-', {'codon_start': 'abc'}),
+      ('contig2', 'CDS', 1, 100, '+', {'ID': 'gene3'})
+    ]:
+      converter.add_feature_record(*feature_record)
+    self.assertEqual(sorted(converter.contigs.keys()), ['contig1', 'contig2'])
+    self.assertEqual([(error.contig, error.feature, error.qualifier) for error in converter.error_report.errors],
+                     [('contig1', 'CDS 101..200', 'codon_start')])
+    self.assertEqual(sorted(converter.error_report.failed_contigs), ['contig1'])
+
+  def test_add_feature_record_without_error_report(self):
+    converter = EMBLConverter(None)
+    self.assertRaises(ValueError, converter.add_feature_record, 'contig1', 'CDS', 101, 200, '-', {'codon_start': 'abc'})
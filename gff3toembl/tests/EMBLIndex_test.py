@@ -0,0 +1,76 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.EMBLIndex import EMBLIndex
+
+class TestEMBLIndex(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.embl_filename = os.path.join(self.temporary_directory, 'output.embl')
+    self.records = [('contig1', "ID   contig1\nSQ   aaaa\n//\n", 4, 1),
+                    ('contig2', "ID   contig2\nFT   gene\nSQ   cc\n//\n", 2, 2),
+                    ('contig3', "ID   contig3\nSQ   g\n//\n", 1, 0)]
+    embl_index = EMBLIndex(self.embl_filename)
+    with open(self.embl_filename, 'w') as embl_file:
+      for sequence_identifier, block, sequence_length, number_of_features in self.records:
+        embl_file.write(block)
+        embl_index.add(sequence_identifier, len(block), sequence_length, number_of_features)
+    embl_index.write()
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def read_file(self, filename):
+    with open(filename, 'r') as input_file:
+      return input_file.read()
+
+  def test_write(self):
+    expected_index = """\
+#sequence_identifier\toffset\tlength\tsequence_length\tfeatures
+contig1\t0\t26\t4\t1
+contig2\t26\t34\t2\t2
+contig3\t60\t23\t1\t0
+"""
+    self.assertEqual(self.read_file(self.embl_filename + '.index'), expected_index)
+
+  def test_add_duplicate(self):
+    embl_index = EMBLIndex(self.embl_filename)
+    embl_index.add('contig1', 10, 4, 1)
+    self.assertRaises(ValueError, embl_index.add, 'contig1', 10, 4, 1)
+
+  def test_read_and_fetch(self):
+    embl_index = EMBLIndex(self.embl_filename).read()
+    self.assertEqual(embl_index.sequence_identifiers(), ['contig1', 'contig2', 'contig3'])
+    self.assertEqual(embl_index.record('contig2'), (26, 34, 2, 2))
+    for sequence_identifier, block, sequence_length, number_of_features in self.records:
+      self.assertEqual(embl_index.fetch(sequence_identifier), block)
+    self.assertRaises(KeyError, embl_index.fetch, 'contig4')
+
+  def test_read_out_of_date(self):
+    with open(self.embl_filename, 'a') as embl_file:
+      embl_file.write("ID   contig4\n//\n")
+    self.assertRaises(ValueError, EMBLIndex(self.embl_filename).read)
+
+  def test_rewrite_same_length(self):
+    embl_index = EMBLIndex(self.embl_filename).read()
+    embl_index.rewrite('contig2', "ID   contig2\nFT   CDS \nSQ   cc\n//\n")
+    self.assertEqual(self.read_file(self.embl_filename), self.records[0][1] + "ID   contig2\nFT   CDS \nSQ   cc\n//\n" + self.records[2][1])
+    self.assertEqual(EMBLIndex(self.embl_filename).read().record('contig2'), (26, 34, 2, 2))
+
+  def test_rewrite_different_length(self):
+    embl_index = EMBLIndex(self.embl_filename).read()
+    embl_index.copy_buffer_size = 5
+    new_block = "ID   contig1\nFT   gene\nFT   CDS\nSQ   aaaaaa\n//\n"
+    embl_index.rewrite('contig1', new_block, sequence_length = 6, number_of_features = 2)
+    self.assertEqual(self.read_file(self.embl_filename), new_block + self.records[1][1] + self.records[2][1])
+    embl_index = EMBLIndex(self.embl_filename).read()
+    self.assertEqual(embl_index.record('contig1'), (0, len(new_block), 6, 2))
+    self.assertEqual(embl_index.fetch('contig2'), self.records[1][1])
+    self.assertEqual(embl_index.fetch('contig3'), self.records[2][1])
+    self.assertEqual(os.listdir(self.temporary_directory).count('output.embl.tmp'), 0)
+
+  def test_rewrite_needs_a_whole_record(self):
+    embl_index = EMBLIndex(self.embl_filename).read()
+    self.assertRaises(ValueError, embl_index.rewrite, 'contig1', "ID   contig1\n")
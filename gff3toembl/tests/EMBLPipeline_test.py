@@ -0,0 +1,81 @@
+import unittest
+import os
+import shutil
+import tempfile
+from mock import MagicMock
+from gff3toembl.EMBLPipeline import EMBLPipeline
+from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.EMBLIndex import EMBLIndex
+
+class FakeVisitorStream(object):
+  # Adds one contig's sequence to the converter on each call, like visit_sequence_node
+
+  def __init__(self, converter, sequences):
+    self.converter = converter
+    self.sequences = list(sequences)
+
+  def next_tree(self):
+    if not self.sequences:
+      return None
+    sequence_identifier, sequence = self.sequences.pop(0)
+    contig = self.converter.contigs.setdefault(sequence_identifier, EMBLContig())
+    contig.add_sequence(sequence)
+    if self.converter.contig_complete_callback != None:
+      self.converter.contig_complete_callback(sequence_identifier, contig)
+    return True
+
+class TestEMBLPipeline(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.emblwriter = MagicMock()
+    self.emblwriter.output_filename = os.path.join(self.temporary_directory, 'output.embl')
+    self.emblwriter.conv.contigs = {}
+    self.emblwriter.conv.contig_complete_callback = None
+    self.emblwriter.index = False
+    def add_contig_header(sequence_identifier, contig, *args):
+      contig.add_header(sequence_identifier = sequence_identifier, sequence_length = contig.sequence.length, sequence_name = sequence_identifier)
+    self.emblwriter.add_contig_header.side_effect = add_contig_header
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def expected_output(self, sequences):
+    expected_string = ""
+    for sequence_identifier, sequence in sorted(sequences):
+      contig = EMBLContig()
+      contig.add_sequence(sequence)
+      contig.add_header(sequence_identifier = sequence_identifier, sequence_length = contig.sequence.length, sequence_name = sequence_identifier)
+      expected_string += contig.format() + "//\n"
+    return expected_string
+
+  def run_pipeline(self, sequences):
+    visitor_stream = FakeVisitorStream(self.emblwriter.conv, sequences)
+    EMBLPipeline(self.emblwriter, 2, 2).run(visitor_stream)
+    expected_files = ['output.embl', 'output.embl.index'] if self.emblwriter.index else ['output.embl']
+    self.assertEqual(sorted(os.listdir(self.temporary_directory)), expected_files)
+    with open(self.emblwriter.output_filename, 'r') as output_file:
+      return output_file.read()
+
+  def test_run_sorted(self):
+    sequences = [('contig%d' % index, 'ACGT' * index) for index in range(1, 10)]
+    self.assertEqual(self.run_pipeline(sequences), self.expected_output(sequences))
+    self.assertEqual(self.emblwriter.conv.contigs, {})
+
+  def test_run_unsorted(self):
+    sequences = [('contig3', 'AAAA'), ('contig1', 'CCCCCC'), ('contig2', 'GG')]
+    self.assertEqual(self.run_pipeline(sequences), self.expected_output(sequences))
+
+  def test_run_duplicate_sequence(self):
+    sequences = [('contig1', 'AAAA'), ('contig1', 'CCCCCC')]
+    self.assertRaises(ValueError, self.run_pipeline, sequences)
+    self.assertEqual(os.listdir(self.temporary_directory), [])
+
+  def test_run_unsorted_index(self):
+    self.emblwriter.index = True
+    sequences = [('contig3', 'AAAA'), ('contig1', 'CCCCCC'), ('contig2', 'GG')]
+    output = self.run_pipeline(sequences)
+    embl_index = EMBLIndex(self.emblwriter.output_filename).read()
+    self.assertEqual(embl_index.sequence_identifiers(), ['contig1', 'contig2', 'contig3'])
+    self.assertEqual(''.join(map(embl_index.fetch, embl_index.sequence_identifiers())), output)
+    self.assertEqual(embl_index.record('contig2')[2:], (2, 0))
@@ -1,7 +1,13 @@
 import unittest
 import sys
 import os
+import gzip
+import hashlib
+from mock import MagicMock
 from gff3toembl.EMBLWriter import EMBLWriter
+from gff3toembl.EMBLIndex import EMBLIndex
+from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.BinaryAnnotation import BinaryAnnotation
 
 test_modules_dir = os.path.dirname(os.path.realpath(__file__))
 data_dir = os.path.join(test_modules_dir, 'data')
@@ -85,6 +91,287 @@ class TestEMBLWriter(unittest.TestCase):
         self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
         os.remove('large_annotation.embl')
 
+    def test_large_conversion_assume_sorted(self):
+        '''test a large gff3 file which is already sorted converts to EMBL without being sorted'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, assume_sorted = True )
+        emblwriter.parse_and_run()
+        self.assertFalse(os.path.exists(emblwriter.fixed_gff_file))
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        os.remove('large_annotation.embl')
+
+    def test_large_conversion_incremental(self):
+        '''test a large gff3 file converts to EMBL the same way when contigs are reused from a previous run'''
+        for run in range(2):
+          emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+             'Organism',
+             1234,
+             'My project',
+             'My description',
+             'John',
+             'Some title',
+             'Some journal',
+             'circular',
+             'PROK',
+             'large_annotation.embl', None, 11, None, incremental = True )
+          emblwriter.parse_and_run()
+          self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        os.remove('large_annotation.embl')
+        os.remove('large_annotation.embl.cache')
+
+    def test_large_conversion_pipeline(self):
+        '''test a large gff3 file converts to EMBL when parsing, formatting and writing overlap'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, workers = 2, pipeline = True )
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        os.remove('large_annotation.embl')
+
+    def test_large_conversion_memory_budget(self):
+        '''test a large gff3 file converts to EMBL when most contigs are spilled to disk'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, memory_budget = 10000 )
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        self.assertFalse(os.path.exists(emblwriter.contig_store.database_filename))
+        os.remove('large_annotation.embl')
+
+    def test_large_conversion_external_sort(self):
+        '''test a large gff3 file converts to EMBL when sorted on disk in small chunks'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, sort_memory_budget = 100000 )
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        os.remove('large_annotation.embl')
+
+
+    def test_large_conversion_save_parsed(self):
+        '''test a large gff3 file converts to EMBL again from the parsed annotation it saved'''
+        arguments = ['Organism', 1234, 'My project', 'My description', 'John', 'Some title', 'Some journal',
+           'circular', 'PROK', 'large_annotation.embl', None, 11, None]
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'), *arguments, save_parsed = 'large_annotation.bin' )
+        emblwriter.parse_and_run()
+        os.remove('large_annotation.embl')
+        emblwriter = EMBLWriter('large_annotation.bin', *arguments)
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        os.remove('large_annotation.embl')
+        os.remove('large_annotation.bin')
+
+    def test_seqids_not_in_saved_annotation(self):
+        '''test a seqid which isn't in a saved annotation file is rejected, as for a gff3 file'''
+        contig = EMBLContig()
+        contig.add_feature(sequence_id = 'contig1', feature_type = 'CDS', start = 1, end = 9, strand = '+',
+                           feature_attributes = {'product': 'DNA polymerase'}, locus_tag = None, translation_table = 11)
+        contig.add_sequence('AAAACCCGG')
+        BinaryAnnotation('seqids.bin').write({'contig1': contig})
+        emblwriter = EMBLWriter('seqids.bin', 'Organism', 1234, 'My project', 'My description', 'John', 'Some title', 'Some journal',
+           'circular', 'PROK', 'seqids.embl', None, 11, None, seqids = ['contig1', 'contig2'])
+        with self.assertRaises(SystemExit) as context:
+          emblwriter.parse_and_run()
+        self.assertEqual(str(context.exception.code),
+                         "Failed to extract sequences from saved annotation file: Could not find contig2 in seqids.bin")
+        self.assertFalse(os.path.exists('seqids.embl'))
+        os.remove('seqids.bin')
+
+    def test_failed_conversion_removes_temporary_files(self):
+        '''test the spilled contigs are removed when the output can't be written'''
+        contig = EMBLContig()
+        contig.add_sequence('AAAACCCGG')
+        BinaryAnnotation('temporary_files.bin').write({'contig1': contig})
+        emblwriter = EMBLWriter('temporary_files.bin', 'Organism', 1234, 'My project', 'My description', 'John', 'Some title', 'Some journal',
+           'circular', 'PROK', 'temporary_files.embl', None, 11, None, memory_budget = 1)
+        emblwriter.create_output_file = MagicMock(side_effect=ValueError("Could not format contig"))
+        self.assertRaises(ValueError, emblwriter.parse_and_run)
+        self.assertFalse(os.path.exists(emblwriter.contig_store.database_filename))
+        os.remove('temporary_files.bin')
+
+    def test_large_conversion_memory_report(self):
+        '''test a memory report is written for the parsed contigs'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, memory_report = 'large_annotation.memory', memory_report_contigs = 3 )
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        with open('large_annotation.memory', 'r') as memory_report:
+          self.assertTrue('number_of_contigs\t10\n' in memory_report.read())
+        os.remove('large_annotation.embl')
+        os.remove('large_annotation.memory')
+
+    def test_large_conversion_index(self):
+        '''test an index of the records is written next to the EMBL file'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, index = True )
+        emblwriter.parse_and_run()
+        self.compare_files('large_annotation.embl', os.path.join(data_dir, 'expected_large_annotation.embl'))
+        embl_index = EMBLIndex('large_annotation.embl').read()
+        self.assertEqual(len(embl_index.sequence_identifiers()), 10)
+        with open('large_annotation.embl', 'r') as embl_file:
+          self.assertEqual(''.join(map(embl_index.fetch, embl_index.sequence_identifiers())), embl_file.read())
+        os.remove('large_annotation.embl')
+        os.remove('large_annotation.embl.index')
+
+    def test_large_conversion_seqids(self):
+        '''test only the requested sequences are converted'''
+        seqids = ['ERS154949|SC|contig000005', 'ERS154949|SC|contig000011']
+        emblwriter = EMBLWriter(os.path.join(data_dir,'large_annotation.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'large_annotation.embl', None, 11, None, seqids = seqids )
+        emblwriter.parse_and_run()
+        with open('large_annotation.embl', 'r') as embl_file:
+          accessions = [line for line in embl_file if line.startswith('AC * ')]
+        self.assertEqual(accessions, ['AC * _ERS154949SCcontig000005\n', 'AC * _ERS154949SCcontig000011\n'])
+        self.assertFalse(os.path.exists('large_annotation.embl_subset.gff'))
+        os.remove('large_annotation.embl')
+        os.remove(os.path.join(data_dir,'large_annotation.gff.seqidx'))
+
+    def test_failed_conversion_leaves_no_output(self):
+        '''test an output file isn't left partly written'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'single_feature.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'failed.embl', None, 11, None )
+        good_contig = MagicMock()
+        good_contig.format.return_value = "ID   good\n"
+        bad_contig = MagicMock()
+        bad_contig.format.side_effect = ValueError("Could not format contig")
+        emblwriter.conv.contigs = {'contig1': good_contig, 'contig2': bad_contig}
+        self.assertRaises(ValueError, emblwriter.create_output_file, 'Organism', 1234, 'My project', 'John', 'Some title', 'Some journal', 'circular', 'PROK')
+        self.assertFalse(os.path.exists('failed.embl'))
+        self.assertFalse(os.path.exists('failed.embl.tmp'))
+
+    def test_error_report(self):
+        '''test the good contigs are written and the bad ones reported'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'single_feature.gff'),
+           'Organism',
+           1234,
+           'My project',
+           'My description',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'error_report.embl', None, 11, None, error_report = 'error_report.tsv' )
+        long_feature_type = 'misc_feature_with_a_very_long_name' * 3
+        for sequence_identifier, feature_type, attributes in [('good', 'CDS', {'product': 'DNA polymerase'}),
+                                                              ('long', long_feature_type, {'note': 'ABC'}),
+                                                              ('unparsed', 'CDS', {'codon_start': 'abc'})]:
+          emblwriter.conv.add_feature_record(sequence_identifier, feature_type, 1, 9, '+', attributes)
+          emblwriter.conv.contigs.setdefault(sequence_identifier, EMBLContig()).add_sequence('AAAACCCGG')
+        emblwriter.conv.contigs['nosequence'] = EMBLContig()
+        emblwriter.create_output_file('Organism', 1234, 'My project', 'John', 'Some title', 'Some journal', 'circular', 'PROK')
+        with open('error_report.embl', 'r') as embl_file:
+          self.assertEqual([line for line in embl_file if line.startswith('AC * ')], ['AC * _good\n'])
+        self.assertEqual(sorted(emblwriter.error_report.failed_contigs), ['long', 'nosequence', 'unparsed'])
+        self.assertEqual([(error.contig, error.feature, error.qualifier) for error in emblwriter.error_report.errors],
+                         [('unparsed', 'CDS 1..9', 'codon_start'), ('long', long_feature_type + ' 1..9', None), ('nosequence', None, None)])
+        os.remove('error_report.embl')
+
+    def test_compressed_output_with_checksums_and_manifest(self):
+        '''test the output is compressed and checksummed as it is written'''
+        emblwriter = EMBLWriter(os.path.join(data_dir,'single_feature.gff'),
+           'Organism',
+           1234,
+           'PRJEB1234',
+           'My assembly',
+           'John',
+           'Some title',
+           'Some journal',
+           'circular',
+           'PROK',
+           'compressed.embl.gz', None, 11, 'compressed_chromosome_list.txt.gz',
+           compress = True, checksums = True, webin_manifest = 'compressed.manifest', webin_manifest_fields = [('COVERAGE', '100')] )
+        for sequence_identifier, sequence_length in [('chromosome', 2000000), ('contig2', 5000)]:
+          emblwriter.conv.add_feature_record(sequence_identifier, 'CDS', 1, 9, '+', {'product': 'DNA polymerase'})
+          emblwriter.conv.contigs[sequence_identifier].add_sequence('A' * sequence_length)
+        emblwriter.create_output_file('Organism', 1234, 'PRJEB1234', 'John', 'Some title', 'Some journal', 'circular', 'PROK')
+        emblwriter.create_chromosome_list(emblwriter.chromosome_list)
+        emblwriter.create_webin_manifest(emblwriter.webin_manifest)
+        with open('compressed.embl.gz', 'rb') as embl_file:
+          compressed_output = embl_file.read()
+        with open('compressed.embl.gz.md5', 'r') as md5_file:
+          self.assertEqual(md5_file.read(), "{}  compressed.embl.gz\n".format(hashlib.md5(compressed_output).hexdigest()))
+        with open('compressed.embl.gz.sha256', 'r') as sha256_file:
+          self.assertEqual(sha256_file.read(), "{}  compressed.embl.gz\n".format(hashlib.sha256(compressed_output).hexdigest()))
+        with open('compressed.embl.gz.size', 'r') as size_file:
+          self.assertEqual(size_file.read(), "#file\tbytes\tuncompressed_bytes\ncompressed.embl.gz\t{}\t{}\n".format(
+            len(compressed_output), len(gzip.open('compressed.embl.gz', 'rb').read())))
+        self.assertTrue(gzip.open('compressed.embl.gz', 'rb').read().startswith('ID   XXX; XXX; circular; genomic DNA; STD; PROK; 2000000 BP.'))
+        self.assertEqual(gzip.open('compressed_chromosome_list.txt.gz', 'rb').read(), "chromosome\t1\tChromosome\ncontig2\t2\tPlasmid\n")
+        with open('compressed.manifest', 'r') as manifest_file:
+          self.assertEqual(manifest_file.read(), "STUDY\tPRJEB1234\nASSEMBLYNAME\tMy assembly\nCOVERAGE\t100\n" +
+                                                 "FLATFILE\tcompressed.embl.gz\nCHROMOSOME_LIST\tcompressed_chromosome_list.txt.gz\n")
+        for filename in ['compressed.embl.gz', 'compressed.embl.gz.md5', 'compressed.embl.gz.sha256', 'compressed.embl.gz.size', 'compressed_chromosome_list.txt.gz', 'compressed.manifest']:
+          os.remove(filename)
 
     def test_chromosome_list_conversion(self):
        '''test chromosome list creation'''
@@ -123,6 +410,28 @@ class TestEMBLWriter(unittest.TestCase):
        os.remove('chromosome_list_plasmid_name.txt')
 
 
+    def test_chromosome_list_sharded_conversion(self):
+       '''test chromosome list creation when each replicon is written to its own file'''
+       emblwriter = EMBLWriter(os.path.join(data_dir,'chromosome_list.gff'),
+          'Organism',
+          1234,
+          'ABC',
+          'My description',
+          'John',
+          'Some title',
+          'Some journal',
+          'circular',
+          'PROK',
+          'chromosome_list.embl', None, 11, 'chromosome_list.txt', shard_by_replicon = True, workers = 2 )
+       emblwriter.parse_and_run()
+       self.compare_files('chromosome_list.txt', os.path.join(data_dir, 'expected_chromosome_list.txt'))
+       self.assertFalse(os.path.exists('chromosome_list.embl'))
+       with open('chromosome_list.embl.manifest', 'r') as manifest_file:
+         for manifest_line in manifest_file:
+           os.remove(manifest_line.split('\t')[0])
+       os.remove('chromosome_list.embl.manifest')
+       os.remove('chromosome_list.txt')
+
     def test_remove_duplicate_tags(self):
        '''test remove duplicate tags '''
        emblwriter = EMBLWriter(os.path.join(data_dir,'duplicate_coords.gff'),
@@ -0,0 +1,49 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.ErrorReport import ErrorReport, QualifierError
+from gff3toembl.LineLengthValidator import LineLengthViolation
+
+class TestErrorReport(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.report_filename = os.path.join(self.temporary_directory, 'errors.tsv')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def test_add(self):
+    error_report = ErrorReport(self.report_filename)
+    error_report.add('contig1', 'CDS 1..100', 'codon_start', ValueError("invalid literal for int() with base 10: 'abc'"))
+    error_report.add('contig1', None, None, "Could not format contig, no sequence data found")
+    self.assertTrue(error_report.failed('contig1'))
+    self.assertFalse(error_report.failed('contig2'))
+    self.assertEqual(error_report.summary(), "Could not convert 1 contig(s), 2 error(s) listed in {}".format(self.report_filename))
+
+  def test_add_line_length_violations(self):
+    error_report = ErrorReport(self.report_filename)
+    error_report.add_line_length_violations([LineLengthViolation('A' * 81, 'contig1', 'CDS 1..100', 'product'),
+                                             LineLengthViolation('B' * 82, 'contig2')])
+    self.assertEqual([(error.contig, error.feature, error.qualifier) for error in error_report.errors],
+                     [('contig1', 'CDS 1..100', 'product'), ('contig2', None, None)])
+    self.assertEqual(error_report.errors[1].message, 'line of 82 characters: ' + 'B' * 82)
+    self.assertEqual(sorted(error_report.failed_contigs), ['contig1', 'contig2'])
+
+  def test_write(self):
+    error_report = ErrorReport(self.report_filename)
+    error_report.add('contig1', 'CDS 1..100', 'codon_start', "bad\tvalue\n")
+    error_report.add(None, None, None, "Could not parse GFF3 file")
+    error_report.write()
+    with open(self.report_filename, 'r') as report_file:
+      self.assertEqual(report_file.read(), ErrorReport.header +
+                       "contig1\tCDS 1..100\tcodon_start\tbad value \n" +
+                       "-\t-\t-\tCould not parse GFF3 file\n")
+    self.assertFalse(os.path.exists(self.report_filename + '.tmp'))
+
+  def test_qualifier_error(self):
+    error = QualifierError('codon_start', ValueError("invalid literal"))
+    self.assertTrue(isinstance(error, ValueError))
+    self.assertEqual(error.qualifier, 'codon_start')
+    self.assertEqual(str(error), "invalid literal")
@@ -0,0 +1,68 @@
+import unittest
+from mock import MagicMock
+from gff3toembl.FeatureIndex import FeatureIndex
+from gff3toembl.EMBLContig import EMBLContig
+
+class TestFeatureIndex(unittest.TestCase):
+
+  def create_feature(self, start, end):
+    feature = MagicMock()
+    feature.start = start
+    feature.end = end
+    return feature
+
+  def create_index(self):
+    self.feature_1 = self.create_feature(100, 200)
+    self.feature_2 = self.create_feature(150, 1000)
+    self.feature_3 = self.create_feature(300, 400)
+    self.feature_4 = self.create_feature(1500, 1600)
+    return FeatureIndex([self.feature_4, self.feature_2, self.feature_3, self.feature_1])
+
+  def test_sorted_features(self):
+    index = self.create_index()
+    self.assertEqual(len(index), 4)
+    self.assertEqual(index.sorted_features(), [self.feature_1, self.feature_2, self.feature_3, self.feature_4])
+
+  def test_sorted_features_same_coordinates(self):
+    feature_1 = self.create_feature(100, 200)
+    feature_2 = self.create_feature(100, 200)
+    feature_3 = self.create_feature(100, 150)
+    index = FeatureIndex([feature_1, feature_2, feature_3])
+    self.assertEqual(index.sorted_features(), [feature_3, feature_1, feature_2])
+
+  def test_overlapping(self):
+    index = self.create_index()
+    self.assertEqual(index.overlapping(1, 99), [])
+    self.assertEqual(index.overlapping(1, 100), [self.feature_1])
+    self.assertEqual(index.overlapping(350, 360), [self.feature_2, self.feature_3])
+    self.assertEqual(index.overlapping(900, 1500), [self.feature_2, self.feature_4])
+    self.assertEqual(index.overlapping(1601, 2000), [])
+
+  def test_within(self):
+    index = self.create_index()
+    self.assertEqual(index.within(100, 400), [self.feature_1, self.feature_3])
+    self.assertEqual(index.within(100, 1000), [self.feature_1, self.feature_2, self.feature_3])
+    self.assertEqual(index.within(101, 1599), [self.feature_2, self.feature_3])
+    self.assertEqual(index.within(1001, 1499), [])
+
+  def test_containing(self):
+    index = self.create_index()
+    self.assertEqual(index.containing(160, 180), [self.feature_1, self.feature_2])
+    self.assertEqual(index.containing(300, 400), [self.feature_2, self.feature_3])
+    self.assertEqual(index.containing(900, 1500), [])
+
+  def test_contig_queries(self):
+    contig = EMBLContig()
+    for start, end in [(300, 400), (100, 200)]:
+      contig.add_feature(
+        sequence_id = 1,
+        feature_type = 'tRNA',
+        start = start,
+        end = end,
+        strand = '+',
+        feature_attributes =  {'some_attribute': 'ABC' }
+      )
+    self.assertEqual([(feature.start, feature.end) for feature in contig.sorted_features()], [(100, 200), (300, 400)])
+    self.assertEqual([(feature.start, feature.end) for feature in contig.overlapping_features(150, 350)], [(100, 200), (300, 400)])
+    self.assertEqual([(feature.start, feature.end) for feature in contig.features_within(150, 450)], [(300, 400)])
+    self.assertEqual([(feature.start, feature.end) for feature in contig.features_containing(310, 320)], [(300, 400)])
@@ -0,0 +1,97 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.GFF3Index import GFF3Index
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+
+class TestGFF3Index(unittest.TestCase):
+
+  gff3_string = """\
+##gff-version 3
+##sequence-region contig1 1 8
+##sequence-region contig2 1 4
+##sequence-region contig3 1 12
+contig1\tProkka\tCDS\t1\t6\t.\t+\t0\tID=gene1
+contig1\tProkka\tCDS\t2\t8\t.\t+\t0\tID=gene2
+###
+contig3\tProkka\tCDS\t1\t9\t.\t-\t0\tID=gene3
+contig1\tProkka\ttRNA\t3\t5\t.\t+\t0\tID=gene4
+##FASTA
+>contig1
+ACGTACGT
+>contig2
+ACGT
+>contig3
+ACGTACGT
+ACGT"""
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.gff3_filename = os.path.join(self.temporary_directory, 'input.gff')
+    with open(self.gff3_filename, 'w') as gff3_file:
+      gff3_file.write(self.gff3_string)
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def read_file(self, filename):
+    with open(filename, 'r') as input_file:
+      return input_file.read()
+
+  def test_build(self):
+    gff3_index = GFF3Index(self.gff3_filename).build()
+    self.assertEqual(gff3_index.seqids, ['contig1', 'contig2', 'contig3'])
+    self.assertEqual(len(gff3_index.features['contig1']), 2)
+    self.assertEqual(gff3_index.features.get('contig2'), None)
+    self.assertEqual(gff3_index.regions['contig2'], "##sequence-region contig2 1 4\n")
+    offset, length = gff3_index.sequences['contig2']
+    self.assertEqual(self.gff3_string[offset:offset + length], ">contig2\nACGT\n")
+
+  def test_load_saves_and_reuses_the_index(self):
+    GFF3Index(self.gff3_filename).load()
+    self.assertTrue(os.path.exists(self.gff3_filename + '.seqidx'))
+    gff3_index = GFF3Index(self.gff3_filename)
+    self.assertTrue(gff3_index.read())
+    self.assertEqual(gff3_index.seqids, ['contig1', 'contig2', 'contig3'])
+
+  def test_changed_file_is_indexed_again(self):
+    GFF3Index(self.gff3_filename).load()
+    with open(self.gff3_filename, 'a') as gff3_file:
+      gff3_file.write("\n>contig4\nAAAA\n")
+    self.assertFalse(GFF3Index(self.gff3_filename).read())
+    self.assertEqual(GFF3Index(self.gff3_filename).load().seqids, ['contig1', 'contig2', 'contig3', 'contig4'])
+
+  def test_write_subset(self):
+    subset_filename = os.path.join(self.temporary_directory, 'subset.gff')
+    GFF3Index(self.gff3_filename).load().write_subset(['contig3', 'contig1'], subset_filename)
+    expected_subset = """\
+##gff-version 3
+##sequence-region contig1 1 8
+##sequence-region contig3 1 12
+contig1\tProkka\tCDS\t1\t6\t.\t+\t0\tID=gene1
+contig1\tProkka\tCDS\t2\t8\t.\t+\t0\tID=gene2
+contig1\tProkka\ttRNA\t3\t5\t.\t+\t0\tID=gene4
+contig3\tProkka\tCDS\t1\t9\t.\t-\t0\tID=gene3
+##FASTA
+>contig1
+ACGTACGT
+>contig3
+ACGTACGT
+ACGT
+"""
+    self.assertEqual(self.read_file(subset_filename), expected_subset)
+
+  def test_write_subset_of_unknown_seqid(self):
+    gff3_index = GFF3Index(self.gff3_filename).load()
+    self.assertRaises(ValueError, gff3_index.write_subset, ['contig1', 'contig9'], os.path.join(self.temporary_directory, 'subset.gff'))
+
+  def test_partition(self):
+    gff3_index = GFF3Index(os.path.join(data_dir, 'large_annotation.gff'), os.path.join(self.temporary_directory, 'large_annotation.seqidx')).load()
+    parts = gff3_index.partition(3)
+    self.assertEqual(len(parts), 3)
+    self.assertEqual(sorted(seqid for part in parts for seqid in part), sorted(gff3_index.seqids))
+    self.assertEqual(parts[0], ['ERS154949|SC|contig000003'])
+    self.assertEqual(len(GFF3Index(self.gff3_filename).load().partition(10)), 3)
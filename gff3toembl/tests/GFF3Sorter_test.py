@@ -0,0 +1,142 @@
+import unittest
+import os
+import shutil
+import tempfile
+from gff3toembl.GFF3Sorter import GFF3Sorter
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+
+class TestGFF3Sorter(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def write_gff(self, gff_string):
+    gff_filename = os.path.join(self.temporary_directory, 'input.gff')
+    with open(gff_filename, 'w') as gff_file:
+      gff_file.write(gff_string)
+    return gff_filename
+
+  def sort_gff(self, gff_string, memory_budget):
+    input_filename = self.write_gff(gff_string)
+    output_filename = os.path.join(self.temporary_directory, 'output.gff')
+    GFF3Sorter(memory_budget, self.temporary_directory).sort(input_filename, output_filename)
+    with open(output_filename, 'r') as output_file:
+      return output_file.read()
+
+  def test_sort(self):
+    unsorted_gff = """\
+##gff-version 3
+##sequence-region contig2 1 1000
+contig2\tsrc\tCDS\t500\t600\t.\t+\t0\tID=c
+# a comment
+contig1\tsrc\tCDS\t100\t900\t.\t+\t0\tID=b
+contig1\tsrc\tCDS\t100\t200\t.\t+\t0\tID=a
+##sequence-region contig1 1 1000
+contig2\tsrc\tCDS\t20\t60\t.\t+\t0\tID=d
+##FASTA
+>contig1
+ACGT
+>contig2
+TTTT
+"""
+    expected_gff = """\
+##gff-version 3
+##sequence-region contig2 1 1000
+##sequence-region contig1 1 1000
+contig1\tsrc\tCDS\t100\t200\t.\t+\t0\tID=a
+contig1\tsrc\tCDS\t100\t900\t.\t+\t0\tID=b
+###
+contig2\tsrc\tCDS\t20\t60\t.\t+\t0\tID=d
+contig2\tsrc\tCDS\t500\t600\t.\t+\t0\tID=c
+##FASTA
+>contig1
+ACGT
+>contig2
+TTTT
+"""
+    # a big budget sorts everything in one run, a tiny one spills every line to its own run
+    self.assertEqual(self.sort_gff(unsorted_gff, 1024*1024), expected_gff)
+    self.assertEqual(self.sort_gff(unsorted_gff, 1), expected_gff)
+
+  def test_sort_keeps_input_order_of_duplicate_coordinates(self):
+    unsorted_gff = """\
+contig1\tsrc\trRNA\t300\t400\t.\t+\t0\tID=c
+contig1\tsrc\trRNA\t100\t200\t.\t+\t0\tID=a
+contig1\tsrc\trRNA\t100\t200\t.\t+\t0\tID=b"""
+    expected_gff = """\
+contig1\tsrc\trRNA\t100\t200\t.\t+\t0\tID=a
+contig1\tsrc\trRNA\t100\t200\t.\t+\t0\tID=b
+contig1\tsrc\trRNA\t300\t400\t.\t+\t0\tID=c
+"""
+    self.assertEqual(self.sort_gff(unsorted_gff, 1024*1024), expected_gff)
+    self.assertEqual(self.sort_gff(unsorted_gff, 1), expected_gff)
+
+  def test_sort_large_annotation(self):
+    input_filename = os.path.join(data_dir, 'large_annotation.gff')
+    sorted_filename = os.path.join(self.temporary_directory, 'sorted.gff')
+    GFF3Sorter(10000, self.temporary_directory).sort(input_filename, sorted_filename)
+    with open(input_filename, 'r') as input_file:
+      input_lines = [line for line in input_file if line != "###\n"]
+    with open(sorted_filename, 'r') as sorted_file:
+      sorted_lines = [line for line in sorted_file if line != "###\n"]
+    self.assertEqual(sorted(sorted_lines), sorted(input_lines))
+    self.assertEqual(os.listdir(self.temporary_directory), ['sorted.gff'])
+
+  def test_sort_more_runs_than_can_be_open(self):
+    input_filename = os.path.join(data_dir, 'large_annotation.gff')
+    sorted_filename = os.path.join(self.temporary_directory, 'sorted.gff')
+    expected_filename = os.path.join(self.temporary_directory, 'expected.gff')
+    GFF3Sorter(1024*1024*1024, self.temporary_directory).sort(input_filename, expected_filename)
+    sorter = GFF3Sorter(1000, self.temporary_directory)
+    sorter.maximum_open_runs = 3
+    merged_groups = []
+    merge_lines = sorter.merge_lines
+    def count_merge_lines(run_filenames):
+      merged_groups.append(len(run_filenames))
+      return merge_lines(run_filenames)
+    sorter.merge_lines = count_merge_lines
+    sorter.sort(input_filename, sorted_filename)
+    # several passes, never merging more than 3 runs at once
+    self.assertTrue(len(merged_groups) > 3)
+    self.assertTrue(max(merged_groups) <= 3)
+    with open(expected_filename, 'r') as expected_file:
+      with open(sorted_filename, 'r') as sorted_file:
+        self.assertEqual(sorted_file.read(), expected_file.read())
+    self.assertEqual(sorted(os.listdir(self.temporary_directory)), ['expected.gff', 'sorted.gff'])
+
+  def test_sort_malformed_line(self):
+    self.assertRaises(ValueError, self.sort_gff, "contig1\tsrc\tCDS\tone\t200\n", 1024)
+    self.assertEqual(os.listdir(self.temporary_directory), ['input.gff'])
+
+  def test_is_sorted(self):
+    sorter = GFF3Sorter()
+    sorted_gff = """\
+##gff-version 3
+contig2\tsrc\tCDS\t20\t60\t.\t+\t0\tID=a
+contig2\tsrc\tCDS\t20\t80\t.\t+\t0\tID=b
+###
+contig1\tsrc\tCDS\t10\t50\t.\t+\t0\tID=c
+##FASTA
+>contig1
+ACGT
+"""
+    self.assertTrue(sorter.is_sorted(self.write_gff(sorted_gff)))
+    self.assertTrue(sorter.is_sorted(os.path.join(data_dir, 'large_annotation.gff')))
+
+    out_of_order_gff = """\
+contig1\tsrc\tCDS\t500\t600\t.\t+\t0\tID=a
+contig1\tsrc\tCDS\t100\t200\t.\t+\t0\tID=b
+"""
+    self.assertFalse(sorter.is_sorted(self.write_gff(out_of_order_gff)))
+
+    interleaved_gff = """\
+contig1\tsrc\tCDS\t100\t200\t.\t+\t0\tID=a
+contig2\tsrc\tCDS\t100\t200\t.\t+\t0\tID=b
+contig1\tsrc\tCDS\t500\t600\t.\t+\t0\tID=c
+"""
+    self.assertFalse(sorter.is_sorted(self.write_gff(interleaved_gff)))
@@ -0,0 +1,35 @@
+import unittest
+from gff3toembl.LineLengthValidator import LineLengthValidator, LineLengthError
+
+class TestLineLengthValidator(unittest.TestCase):
+
+  def test_check_short_text(self):
+    validator = LineLengthValidator()
+    validator.check('A' * 80)
+    validator.check(('A' * 80 + '\n') * 3)
+    self.assertEqual(validator.violations, [])
+
+  def test_check_fails_fast(self):
+    validator = LineLengthValidator()
+    validator.contig = 'contig1'
+    validator.feature = 'CDS 1..10'
+    with self.assertRaises(LineLengthError) as context:
+      validator.check('short\n' + 'B' * 81 + '\n' + 'C' * 90, 'product')
+    self.assertEqual(len(context.exception.violations), 1)
+    self.assertEqual(context.exception.violations[0].line, 'B' * 81)
+    self.assertTrue(isinstance(context.exception, ValueError))
+    self.assertEqual(str(context.exception), "Could not format contig, a line exceeded 80 characters in length: " +
+                     "contig contig1, feature CDS 1..10, qualifier /product, 81 characters: " + 'B' * 81)
+
+  def test_check_collects(self):
+    validator = LineLengthValidator(collect = True)
+    validator.contig = 'contig1'
+    validator.check('short\n' + 'B' * 81 + '\n' + 'C' * 90)
+    validator.contig = 'contig2'
+    validator.check('D' * 100 + '\n')
+    self.assertEqual([(violation.contig, violation.line) for violation in validator.violations],
+                     [('contig1', 'B' * 81), ('contig1', 'C' * 90), ('contig2', 'D' * 100)])
+    self.assertRaises(LineLengthError, validator.raise_violations)
+
+  def test_raise_without_violations(self):
+    LineLengthValidator(collect = True).raise_violations()
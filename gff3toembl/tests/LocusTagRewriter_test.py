@@ -0,0 +1,73 @@
+import unittest
+import os
+import shutil
+import tempfile
+from StringIO import StringIO
+from gff3toembl.LocusTagRewriter import LocusTagRewriter
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+
+class TestLocusTagRewriter(unittest.TestCase):
+
+  def test_rewrite_tag(self):
+    rewriter = LocusTagRewriter('NEW', {'8233_4#93': 'ERS123', 'ABC': 'DEF'}, {'ABC_00002': 'XYZ_00009'})
+    self.assertEqual(rewriter.rewrite_tag('8233_4#93_02128'), 'ERS123_02128')
+    self.assertEqual(rewriter.rewrite_tag('ABC_00001'), 'DEF_00001')
+    self.assertEqual(rewriter.rewrite_tag('ABC_00002'), 'XYZ_00009')
+    self.assertEqual(rewriter.rewrite_tag('GHI_00001'), 'NEW_00001')
+    self.assertEqual(rewriter.rewrite_tag('00001'), 'NEW_00001')
+
+  def test_rewrite_tag_without_default_prefix(self):
+    rewriter = LocusTagRewriter(prefixes = {'ABC': 'DEF'})
+    self.assertEqual(rewriter.rewrite_tag('ABC_00001'), 'DEF_00001')
+    self.assertEqual(rewriter.rewrite_tag('GHI_00001'), 'GHI_00001')
+
+  def test_rewrite_gff_line(self):
+    rewriter = LocusTagRewriter('NEW')
+    line = "contig1\tProdigal\tCDS\t1\t210\t.\t-\t0\tID=ABC_00001;locus_tag=ABC_00001;product=my product\n"
+    self.assertEqual(rewriter.rewrite_gff_line(line), "contig1\tProdigal\tCDS\t1\t210\t.\t-\t0\tID=ABC_00001;locus_tag=NEW_00001;product=my product\n")
+    line = "contig1\tProdigal\tCDS\t1\t210\t.\t-\t0\tlocus_tag=ABC_00001\n"
+    self.assertEqual(rewriter.rewrite_gff_line(line), "contig1\tProdigal\tCDS\t1\t210\t.\t-\t0\tlocus_tag=NEW_00001\n")
+    line = "contig1\tProdigal\tCDS\t1\t210\t.\t-\t0\told_locus_tag=ABC_00001\n"
+    self.assertEqual(rewriter.rewrite_gff_line(line), line)
+    self.assertEqual(rewriter.rewrite_gff_line("##sequence-region locus_tag=ABC_1\n"), "##sequence-region locus_tag=ABC_1\n")
+
+  def test_rewrite_embl_line(self):
+    rewriter = LocusTagRewriter('NEW')
+    self.assertEqual(rewriter.rewrite_embl_line('FT                   /locus_tag="ABC_00001"\n'), 'FT                   /locus_tag="NEW_00001"\n')
+    self.assertEqual(rewriter.rewrite_embl_line('FT                   /product="locus_tag=ABC_00001"\n'), 'FT                   /product="locus_tag=ABC_00001"\n')
+
+  def test_rewrite_gff_file(self):
+    output_file = StringIO()
+    with open(os.path.join(data_dir, 'single_feature.gff'), 'r') as input_file:
+      self.assertEqual(LocusTagRewriter('NEW').rewrite(input_file, output_file), 1)
+    with open(os.path.join(data_dir, 'single_feature.gff'), 'r') as input_file:
+      expected = input_file.read().replace('locus_tag=8233_4#93_02128', 'locus_tag=NEW_02128')
+    self.assertEqual(output_file.getvalue(), expected)
+
+  def test_rewrite_embl_file(self):
+    output_file = StringIO()
+    with open(os.path.join(data_dir, 'expected_single_feature.embl'), 'r') as input_file:
+      self.assertEqual(LocusTagRewriter('new_locus_tag').rewrite(input_file, output_file), 1)
+    with open(os.path.join(data_dir, 'expected_single_feature_new_locus_tag.embl'), 'r') as expected_file:
+      self.assertEqual(output_file.getvalue(), expected_file.read())
+
+  def test_rewrite_unknown_format(self):
+    self.assertRaises(ValueError, LocusTagRewriter('NEW').rewrite, StringIO("something else\n"), StringIO())
+
+  def test_read_table(self):
+    temporary_directory = tempfile.mkdtemp()
+    try:
+      table_filename = os.path.join(temporary_directory, 'table.tsv')
+      with open(table_filename, 'w') as table_file:
+        table_file.write("# old\tnew\nABC\tDEF\n\nGHI\tJKL\n")
+      self.assertEqual(LocusTagRewriter.read_table(table_filename), {'ABC': 'DEF', 'GHI': 'JKL'})
+      with open(table_filename, 'w') as table_file:
+        table_file.write("ABC\tDEF\nGHI\n")
+      self.assertRaises(ValueError, LocusTagRewriter.read_table, table_filename)
+      with open(table_filename, 'w') as table_file:
+        table_file.write("ABC\tDEF\nABC\tGHI\n")
+      self.assertRaises(ValueError, LocusTagRewriter.read_table, table_filename)
+    finally:
+      shutil.rmtree(temporary_directory)
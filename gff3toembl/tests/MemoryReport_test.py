@@ -0,0 +1,57 @@
+import unittest
+from StringIO import StringIO
+from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.MemoryReport import MemoryReport
+
+class TestMemoryReport(unittest.TestCase):
+
+  def create_contig(self, sequence_identifier, number_of_features, sequence_length):
+    contig = EMBLContig()
+    for feature_number in range(number_of_features):
+      contig.add_feature(sequence_id = sequence_identifier, feature_type = 'CDS' if feature_number % 2 else 'tRNA',
+                         start = feature_number * 100 + 1, end = feature_number * 100 + 90, strand = '+',
+                         feature_attributes = {'product': 'my product', 'locus_tag': 'ABC_{:05d}'.format(feature_number)})
+    if sequence_length > 0:
+      contig.add_sequence('A' * sequence_length)
+    return contig
+
+  def read_report(self, report):
+    output_file = StringIO()
+    report.write(output_file)
+    sections = []
+    for section in output_file.getvalue().split('\n\n'):
+      lines = section.strip().split('\n')
+      sections.append((lines[0], [line.split('\t') for line in lines[1:]]))
+    return sections
+
+  def test_add_contigs(self):
+    contigs = {'small': self.create_contig('small', 2, 100),
+               'large': self.create_contig('large', 4, 100000),
+               'no_sequence': self.create_contig('no_sequence', 1, 0)}
+    report = MemoryReport(number_of_contigs = 2)
+    report.add_contigs(contigs, spilled = set(['small']))
+
+    self.assertEqual(report.number_of_features, 7)
+    self.assertEqual(report.number_of_qualifiers, 7 * 2 + 3) # 3 CDS have a transl_table
+    self.assertTrue(report.sequence_bytes > 100100)
+    self.assertTrue(0 < report.qualifier_bytes < report.feature_bytes)
+    self.assertTrue(report.shared_qualifier_bytes() > 0)
+    self.assertEqual(report.total_bytes(), report.sequence_bytes + report.feature_bytes + report.contig_bytes + report.shared_qualifier_bytes())
+    self.assertEqual(report.spilled_contigs, 1)
+
+    totals, feature_types, largest_contigs = self.read_report(report)
+    totals = dict(totals[1])
+    self.assertEqual(totals['total'], str(report.total_bytes()))
+    self.assertEqual(totals['shared_qualifiers'], str(report.shared_qualifier_bytes()))
+    self.assertEqual(totals['number_of_contigs'], '3')
+    self.assertEqual(totals['number_of_spilled_contigs'], '1')
+    self.assertEqual([row[:2] for row in feature_types[1][1:]], [['tRNA', '4'], ['CDS', '3']])
+    self.assertEqual(largest_contigs[0], '# Largest 2 contigs')
+    self.assertEqual([row[0] for row in largest_contigs[1][1:]], ['large', 'small'])
+    self.assertEqual(largest_contigs[1][1][4], '4')
+
+  def test_feature_type_bytes_add_up(self):
+    report = MemoryReport()
+    report.add_contig('contig', self.create_contig('contig', 5, 10))
+    self.assertEqual(sum(size for features, size, qualifier_size in report.feature_types.values()), report.feature_bytes)
+    self.assertEqual(sum(qualifier_size for features, size, qualifier_size in report.feature_types.values()), report.qualifier_bytes)
@@ -0,0 +1,77 @@
+import unittest
+import gzip
+import hashlib
+import os
+import shutil
+import tempfile
+from gff3toembl.OutputFile import OutputFile, compressed_filename
+
+class TestOutputFile(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.output_filename = os.path.join(self.temporary_directory, 'output.embl')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def read_file(self, filename):
+    with open(filename, 'rb') as input_file:
+      return input_file.read()
+
+  def write_records(self, output_file):
+    for record_number in range(100):
+      output_file.write("ID   record{}\nSQ   Sequence\n{}\n//\n".format(record_number, 'acgt' * 15))
+    output_file.close()
+
+  def test_checksums(self):
+    output_file = OutputFile(self.output_filename, checksums = True)
+    self.write_records(output_file)
+    written = self.read_file(self.output_filename)
+    self.assertEqual(output_file.md5(), hashlib.md5(written).hexdigest())
+    self.assertEqual(output_file.sha256(), hashlib.sha256(written).hexdigest())
+    self.assertEqual(output_file.size(), len(written))
+    self.assertEqual(output_file.uncompressed_size, len(written))
+
+  def test_compressed_checksums(self):
+    output_file = OutputFile(self.output_filename, compress = True, checksums = True)
+    self.write_records(output_file)
+    written = self.read_file(self.output_filename)
+    self.assertEqual(output_file.md5(), hashlib.md5(written).hexdigest())
+    self.assertEqual(output_file.size(), len(written))
+    uncompressed_output = gzip.open(self.output_filename, 'rb').read()
+    self.assertEqual(output_file.uncompressed_size, len(uncompressed_output))
+    self.assertTrue(output_file.size() < output_file.uncompressed_size)
+    self.assertTrue(uncompressed_output.startswith("ID   record0\n"))
+
+  def test_compressed_output_is_reproducible(self):
+    first_output_file = OutputFile(self.output_filename, compress = True, checksums = True)
+    self.write_records(first_output_file)
+    second_output_file = OutputFile(self.output_filename + '.copy', compress = True, checksums = True)
+    self.write_records(second_output_file)
+    self.assertEqual(first_output_file.md5(), second_output_file.md5())
+
+  def test_write_checksums(self):
+    output_file = OutputFile(self.output_filename, checksums = True)
+    self.write_records(output_file)
+    output_file.write_checksums(self.output_filename)
+    self.assertEqual(self.read_file(self.output_filename + '.md5'), "{}  output.embl\n".format(output_file.md5()))
+    self.assertEqual(self.read_file(self.output_filename + '.sha256'), "{}  output.embl\n".format(output_file.sha256()))
+    written = self.read_file(self.output_filename)
+    self.assertEqual(self.read_file(self.output_filename + '.size'),
+                     "#file\tbytes\tuncompressed_bytes\noutput.embl\t{}\t{}\n".format(len(written), len(written)))
+
+  def test_write_compressed_sizes(self):
+    output_file = OutputFile(self.output_filename, compress = True, checksums = True)
+    self.write_records(output_file)
+    output_file.write_checksums(self.output_filename)
+    compressed_size = len(self.read_file(self.output_filename))
+    uncompressed_size = len(gzip.open(self.output_filename, 'rb').read())
+    self.assertEqual(self.read_file(self.output_filename + '.size'),
+                     "#file\tbytes\tuncompressed_bytes\noutput.embl\t{}\t{}\n".format(compressed_size, uncompressed_size))
+
+  def test_compressed_filename(self):
+    self.assertEqual(compressed_filename('output.embl'), 'output.embl.gz')
+    self.assertEqual(compressed_filename('output.embl.gz'), 'output.embl.gz')
+    self.assertEqual(compressed_filename('chromosome_list.txt'), 'chromosome_list.txt.gz')
+    self.assertEqual(compressed_filename(None), None)
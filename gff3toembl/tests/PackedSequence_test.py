@@ -0,0 +1,55 @@
+import unittest
+import hashlib
+import random
+import sys
+from gff3toembl.PackedSequence import PackedSequence
+
+class TestPackedSequence(unittest.TestCase):
+
+  def random_sequence(self, length, seed = 1):
+    generator = random.Random(seed)
+    return ''.join(generator.choice('ACGT') for position in range(length))
+
+  def test_unpack(self):
+    packed_sequence = PackedSequence('ACGTNNNNacgtRYa')
+    self.assertEqual(packed_sequence.unpack(), 'acgtnnnnacgtrya')
+    self.assertEqual(packed_sequence.unpack(2, 6), 'gtnn')
+    self.assertEqual(packed_sequence.unpack(5, 14), 'nnnacgtry')
+    self.assertEqual(packed_sequence.unpack(10, 100), 'gtrya')
+    self.assertEqual(packed_sequence.unpack(6, 6), '')
+    self.assertEqual(len(packed_sequence), 15)
+
+  def test_empty_sequence(self):
+    packed_sequence = PackedSequence('')
+    self.assertEqual(packed_sequence.unpack(), '')
+    self.assertEqual(packed_sequence.nucleotide_counts, {'a': 0, 'c': 0, 'g': 0, 't': 0, 'other': 0})
+
+  def test_exception_runs(self):
+    packed_sequence = PackedSequence('AANNNNNNCCRRYK')
+    self.assertEqual(list(packed_sequence.exception_starts), [2, 10, 12, 13])
+    self.assertEqual(list(packed_sequence.exception_ends), [8, 12, 13, 14])
+    self.assertEqual(packed_sequence.exception_bases, 'nryk')
+
+  def test_exception_run_across_chunks(self):
+    sequence = self.random_sequence(200000)
+    sequence = sequence[:65530] + 'N' * 100 + sequence[65630:100000] + 'RYKM' + sequence[100004:]
+    packed_sequence = PackedSequence(sequence)
+    self.assertEqual(list(packed_sequence.exception_starts), [65530, 100000, 100001, 100002, 100003])
+    self.assertEqual(packed_sequence.unpack(), sequence.lower())
+    generator = random.Random(2)
+    for test in range(500):
+      start = generator.randrange(len(sequence))
+      end = start + generator.randrange(300)
+      self.assertEqual(packed_sequence.unpack(start, end), sequence.lower()[start:end])
+
+  def test_precomputed_counts_and_digest(self):
+    sequence = 'AAAACCCGGTNNacgtryRY'
+    packed_sequence = PackedSequence(sequence)
+    self.assertEqual(packed_sequence.nucleotide_counts, {'a': 5, 'c': 4, 'g': 3, 't': 2, 'other': 6})
+    self.assertEqual(packed_sequence.digest, hashlib.sha1(sequence).hexdigest())
+
+  def test_a_quarter_of_the_size(self):
+    sequence = self.random_sequence(100000) + 'N' * 5000
+    packed_sequence = PackedSequence(sequence)
+    self.assertEqual(len(packed_sequence.packed), 26250)
+    self.assertTrue(packed_sequence.estimated_size() < sys.getsizeof(sequence) / 3.5)
@@ -0,0 +1,314 @@
+import unittest
+import json
+import mock
+import os
+import resource
+import subprocess
+import sys
+from timeit import default_timer
+from gff3toembl.EMBLContig import EMBLContig, EMBLFeature, EMBLSequence, _cformat
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+baselines_filename = os.path.join(data_dir, 'performance_baselines.json')
+
+# Throughput and peak memory of the formatting hot paths, compared against the
+# baselines in tests/data/performance_baselines.json.  A test fails when a
+# measurement is worse than its baseline by more than the tolerance in that
+# file, which allows for noise but not for a hot path becoming several times
+# slower.  So that the baselines hold on any machine, throughput is measured
+# relative to a reference loop of plain Python timed in the same run, and peak
+# memory as the memory used above that of a process which has only imported
+# gff3toembl.
+#
+#   GFF3TOEMBL_UPDATE_PERFORMANCE_BASELINES=1 store the measurements as the new baselines
+
+def read_gff3(filename):
+  # Just enough GFF3 parsing to build contigs without GT
+  features = {}
+  sequences = {}
+  sequence_identifier = None
+  with open(filename, 'r') as gff_file:
+    for line in gff_file:
+      if line.startswith('>'):
+        sequence_identifier = line[1:].strip()
+        sequences[sequence_identifier] = []
+      elif sequence_identifier != None:
+        sequences[sequence_identifier].append(line.strip())
+      elif not line.startswith('#') and line.strip() != '':
+        columns = line.rstrip('\n').split('\t')
+        attributes = dict(attribute.split('=', 1) for attribute in columns[8].split(';') if '=' in attribute)
+        features.setdefault(columns[0], []).append((columns[2], int(columns[3]), int(columns[4]), columns[6], attributes))
+  return features, dict((sequence_identifier, ''.join(lines)) for sequence_identifier, lines in sequences.items())
+
+def create_contigs(features, sequences):
+  contigs = {}
+  for sequence_identifier, sequence in sequences.items():
+    contig = EMBLContig()
+    for feature_type, start, end, strand, attributes in features.get(sequence_identifier, []):
+      contig.add_feature(sequence_id = sequence_identifier, feature_type = feature_type, start = start, end = end,
+                         strand = strand, feature_attributes = attributes, locus_tag = None, translation_table = 11)
+    contig.add_sequence(sequence)
+    contig.add_header(authors = 'John', classification = 'PROK', genome_type = 'circular', organism = 'Organism',
+                      project = 'My project', publication = 'Some journal', sequence_identifier = sequence_identifier,
+                      sequence_length = len(sequence), sequence_name = sequence_identifier, taxon_id = 1234, title = 'Some title')
+    contigs[sequence_identifier] = contig
+  return contigs
+
+def synthetic_features(number_of_features):
+  # Typical Prokka CDS attributes, with long products so some qualifiers wrap
+  features = []
+  for feature_number in range(number_of_features):
+    attributes = {
+      'ID': 'ABC_{:05d}'.format(feature_number),
+      'locus_tag': 'ABC_{:05d}'.format(feature_number),
+      'inference': 'ab initio prediction:Prodigal:2.60,similar to AA sequence:UniProtKB:Q2G282',
+      'product': 'Bifunctional 3%2C4-dihydroxy-2-butanone 4-phosphate synthase/GTP cyclohydrolase II number {}'.format(feature_number),
+      'eC_number': '1.2.3.4',
+      'gene': 'abcD',
+    }
+    strand = '+' if feature_number % 2 else '-'
+    features.append(('CDS', feature_number * 1000 + 1, feature_number * 1000 + 900, strand, attributes))
+  return features
+
+def scaled_features(features, copies):
+  # The annotation repeated until it is the size of a full genome, with the
+  # qualifiers which are different in a real genome made different in each copy
+  scaled_features = []
+  for copy in range(copies):
+    for sequence_identifier in sorted(features.keys()):
+      for feature_type, start, end, strand, attributes in features[sequence_identifier]:
+        attributes = dict(attributes)
+        for key in ['ID', 'locus_tag', 'gene', 'product']:
+          if key in attributes:
+            attributes[key] = '{}_{}'.format(attributes[key], copy)
+        scaled_features.append((feature_type, start, end, strand, attributes))
+  return scaled_features
+
+def peak_memory_megabytes():
+  maximum_resident_set_size = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+  # kilobytes on Linux but bytes on OS X
+  if sys.platform == 'darwin':
+    return maximum_resident_set_size / (1024.0 * 1024.0)
+  return maximum_resident_set_size / 1024.0
+
+def reference_loop(iterations = 20000):
+  # String work of the kind formatting does, but none of gff3toembl's code,
+  # so it runs faster or slower with the machine and not with gff3toembl
+  lines = []
+  for iteration in range(iterations):
+    value = 'reference value {}'.format(iteration)
+    lines.append('FT                   /note="{}"\n'.format(value.replace('"', "'"))[:80])
+  return len(''.join(lines))
+
+def format_large_annotation():
+  features, sequences = read_gff3(os.path.join(data_dir, 'large_annotation.gff'))
+  contigs = create_contigs(features, sequences)
+  for sequence_identifier in sorted(contigs.keys()):
+    contigs[sequence_identifier].format()
+  EMBLSequence('ACGTN' * 1000000).format()
+
+def qualifier_megabytes(embl_features):
+  # The memory held by the qualifiers of the features, counting each object
+  # once however many features share it, along with EMBLFeature's table of
+  # shared qualifiers
+  seen = set()
+  size = sys.getsizeof(EMBLFeature.shared_attributes)
+  for embl_feature in embl_features:
+    for value in [embl_feature.attributes] + embl_feature.attributes + [item for attribute in embl_feature.attributes for item in attribute]:
+      if id(value) not in seen:
+        seen.add(id(value))
+        size += sys.getsizeof(value)
+  return size / (1024.0 * 1024.0)
+
+class TestPerformance(unittest.TestCase):
+
+  @classmethod
+  def setUpClass(cls):
+    with open(baselines_filename, 'r') as baselines_file:
+      cls.baselines = json.load(baselines_file)
+    cls.features, cls.sequences = read_gff3(os.path.join(data_dir, 'large_annotation.gff'))
+    cls.reference_loops_per_second = 1 / min(cls.time_reference_loop() for repeat in range(5))
+
+  @classmethod
+  def time_reference_loop(cls):
+    start = default_timer()
+    reference_loop()
+    return default_timer() - start
+
+  def setUp(self):
+    self.feature_kernel = EMBLFeature.formatting_kernel
+    self.sequence_kernel = EMBLSequence.formatting_kernel
+
+  def tearDown(self):
+    EMBLFeature.formatting_kernel = self.feature_kernel
+    EMBLSequence.formatting_kernel = self.sequence_kernel
+
+  def backends(self):
+    backends = [('python', None)]
+    if _cformat != None:
+      backends.append(('compiled', _cformat))
+    return backends
+
+  def use_backend(self, kernel):
+    EMBLFeature.formatting_kernel = kernel
+    EMBLSequence.formatting_kernel = kernel
+
+  def best_time(self, function, repeats = 3):
+    times = []
+    for repeat in range(repeats):
+      start = default_timer()
+      function()
+      times.append(default_timer() - start)
+    return min(times)
+
+  def record_baseline(self, section, name, measured):
+    with open(baselines_filename, 'r') as baselines_file:
+      baselines = json.load(baselines_file)
+    if section == None:
+      baselines[name] = round(measured, 1)
+    else:
+      baselines.setdefault(section, {})[name] = round(measured, 1)
+    with open(baselines_filename, 'w') as baselines_file:
+      json.dump(baselines, baselines_file, indent=2, separators=(',', ': '), sort_keys=True)
+      baselines_file.write('\n')
+
+  def assertThroughput(self, backend_name, name, per_second):
+    # per reference loop, rather than per second, to be the same on any machine
+    measured = per_second / self.reference_loops_per_second
+    if os.environ.get('GFF3TOEMBL_UPDATE_PERFORMANCE_BASELINES'):
+      self.record_baseline(backend_name, name, measured)
+      return
+    if name not in self.baselines.get(backend_name, {}):
+      raise unittest.SkipTest("No {} baseline for {}, set GFF3TOEMBL_UPDATE_PERFORMANCE_BASELINES=1 to record one".format(backend_name, name))
+    baseline = self.baselines[backend_name][name]
+    tolerance = self.baselines['throughput_tolerance']
+    minimum = baseline / tolerance
+    self.assertTrue(measured >= minimum,
+      "{} with the {} backend regressed: measured {:.1f}, baseline {:.1f}, at least {:.1f} needed ({}x tolerance)".format(
+        name, backend_name, measured, baseline, minimum, tolerance))
+
+  def test_large_annotation_features_per_reference_loop(self):
+    number_of_features = sum(map(len, self.features.values()))
+    for backend_name, kernel in self.backends():
+      self.use_backend(kernel)
+      def format_features():
+        for sequence_identifier, features in self.features.items():
+          for feature_type, start, end, strand, attributes in features:
+            EMBLFeature(feature_type, start, end, strand, attributes).format()
+      elapsed = self.best_time(format_features)
+      self.assertThroughput(backend_name, 'large_annotation_features_per_reference_loop', number_of_features / elapsed)
+
+  def test_synthetic_features_per_reference_loop(self):
+    features = synthetic_features(2000)
+    for backend_name, kernel in self.backends():
+      self.use_backend(kernel)
+      def format_features():
+        for feature_type, start, end, strand, attributes in features:
+          EMBLFeature(feature_type, start, end, strand, attributes).format()
+      elapsed = self.best_time(format_features)
+      self.assertThroughput(backend_name, 'synthetic_features_per_reference_loop', len(features) / elapsed)
+
+  def test_sequence_bytes_per_reference_loop(self):
+    sequence = 'ACGTACGTNNacgt' * 150000
+    for backend_name, kernel in self.backends():
+      self.use_backend(kernel)
+      elapsed = self.best_time(lambda: EMBLSequence(sequence).format())
+      self.assertThroughput(backend_name, 'sequence_bytes_per_reference_loop', len(sequence) / elapsed)
+
+  def test_large_annotation_contigs_bytes_per_reference_loop(self):
+    for backend_name, kernel in self.backends():
+      self.use_backend(kernel)
+      def format_contigs():
+        contigs = create_contigs(self.features, self.sequences)
+        return sum(len(contigs[sequence_identifier].format()) for sequence_identifier in sorted(contigs.keys()))
+      formatted_bytes = format_contigs()
+      elapsed = self.best_time(format_contigs)
+      self.assertThroughput(backend_name, 'large_annotation_contigs_bytes_per_reference_loop', formatted_bytes / elapsed)
+
+  def test_visitor_stream_nodes_per_second(self):
+    # Nodes per second through VisitorStream, pulling each field of a feature
+    # node with its own call as before and with EMBLConverter.feature_record
+    try:
+      from gt import GFF3InStream
+      from gff3toembl.EMBLConverter import EMBLConverter
+      from gff3toembl.VisitorStream import VisitorStream
+    except ImportError:
+      raise unittest.SkipTest("GT is not installed")
+
+    class PerFieldEMBLConverter(EMBLConverter):
+      def feature_record(self, feature_node):
+        return (feature_node.get_seqid(), feature_node.get_type(), feature_node.get_start(), feature_node.get_end(),
+                feature_node.get_strand(), feature_node.attribs)
+
+    gff_filename = os.path.join(data_dir, 'large_annotation.gff')
+    def nodes_per_second(converter_class):
+      nodes = []
+      def parse():
+        del nodes[:]
+        visitor_stream = VisitorStream(GFF3InStream(gff_filename), converter_class())
+        while visitor_stream.next_tree():
+          nodes.append(None)
+      elapsed = self.best_time(parse)
+      return len(nodes) / elapsed
+
+    before = nodes_per_second(PerFieldEMBLConverter)
+    after = nodes_per_second(EMBLConverter)
+    # compared with each other rather than with a baseline, as how fast GT
+    # parses depends on the version of GT installed as much as on the machine
+    tolerance = self.baselines['throughput_tolerance']
+    self.assertTrue(after >= before / tolerance,
+      "feature_record regressed: {:.0f} VisitorStream nodes per second, against {:.0f} with a call per field, at least {:.0f} needed ({}x tolerance)".format(
+        after, before, before / tolerance, tolerance))
+
+  def test_scaled_annotation_qualifier_memory(self):
+    # The features of large_annotation.gff scaled to about 5000, the size of
+    # a full bacterial genome
+    features = [feature for feature in scaled_features(self.features, 10) if feature[0] not in EMBLFeature.ignored_feature_types]
+    EMBLFeature.shared_attributes.clear()
+    with mock.patch.object(EMBLFeature, 'share_attributes', lambda self, attributes: list(attributes)):
+      unshared = qualifier_megabytes([EMBLFeature(*feature) for feature in features])
+    shared = qualifier_megabytes([EMBLFeature(*feature) for feature in features])
+    EMBLFeature.shared_attributes.clear()
+    self.assertTrue(shared < unshared,
+      "scaled_annotation_qualifier_megabytes not reduced by sharing: {:.1f} shared, {:.1f} unshared".format(shared, unshared))
+    if os.environ.get('GFF3TOEMBL_UPDATE_PERFORMANCE_BASELINES'):
+      self.record_baseline(None, 'scaled_annotation_qualifier_megabytes', shared)
+      return
+    baseline = self.baselines['scaled_annotation_qualifier_megabytes']
+    maximum = baseline * self.baselines['memory_tolerance']
+    self.assertTrue(shared <= maximum,
+      "scaled_annotation_qualifier_megabytes regressed: measured {:.1f} ({:.1f} unshared), baseline {:.1f}, at most {:.1f} allowed".format(
+        shared, unshared, baseline, maximum))
+
+  def test_large_annotation_peak_memory(self):
+    # Measured in a new process so that the rest of the test run doesn't count
+    environment = dict(os.environ)
+    environment['PYTHONPATH'] = os.pathsep.join([os.path.dirname(os.path.dirname(test_modules_dir)), environment.get('PYTHONPATH', '')])
+    test_filename = os.path.splitext(os.path.realpath(__file__))[0] + '.py'
+    def peak_memory(*arguments):
+      return float(subprocess.check_output([sys.executable, test_filename, 'peak_memory'] + list(arguments), env=environment))
+    # the interpreter and imports take more memory on some machines than on others
+    idle = peak_memory()
+    for backend_name, kernel in self.backends():
+      measured = peak_memory(backend_name, 'format') - idle
+      if os.environ.get('GFF3TOEMBL_UPDATE_PERFORMANCE_BASELINES'):
+        self.record_baseline(backend_name, 'large_annotation_added_peak_memory_megabytes', measured)
+        continue
+      baseline = self.baselines[backend_name]['large_annotation_added_peak_memory_megabytes']
+      tolerance = self.baselines['memory_tolerance']
+      maximum = baseline * tolerance
+      self.assertTrue(measured <= maximum,
+        "large_annotation_added_peak_memory_megabytes with the {} backend regressed: measured {:.1f}, baseline {:.1f}, at most {:.1f} allowed ({}x tolerance)".format(
+          backend_name, measured, baseline, maximum, tolerance))
+
+if __name__ == '__main__':
+  if sys.argv[1:2] == ['peak_memory']:
+    if sys.argv[2:3] == ['python']:
+      EMBLFeature.formatting_kernel = None
+      EMBLSequence.formatting_kernel = None
+    if sys.argv[3:] == ['format']:
+      format_large_annotation()
+    print(peak_memory_megabytes())
+  else:
+    unittest.main()
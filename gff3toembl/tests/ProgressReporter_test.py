@@ -0,0 +1,110 @@
+import unittest
+import json
+import os
+import shutil
+import sys
+import tempfile
+from StringIO import StringIO
+from gff3toembl.ProgressReporter import ProgressReporter
+
+class FakeClock(object):
+  def __init__(self):
+    self.now = 1000.0
+
+  def __call__(self):
+    return self.now
+
+class TestProgressReporter(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.metrics_filename = os.path.join(self.temporary_directory, 'metrics.jsonl')
+    self.prometheus_filename = os.path.join(self.temporary_directory, 'gff3toembl.prom')
+    self.clock = FakeClock()
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def read_metrics(self):
+    with open(self.metrics_filename, 'r') as metrics_file:
+      return [json.loads(line) for line in metrics_file]
+
+  def test_reports_at_intervals(self):
+    progress = ProgressReporter(metrics_filename = self.metrics_filename, interval = 10, clock = self.clock)
+    progress.parsing(1, 0)
+    self.clock.now += 5
+    progress.parsing(500, 0)
+    self.clock.now += 5
+    progress.parsing(1000, 0)
+    events = self.read_metrics()
+    self.assertEqual([event['features_parsed'] for event in events], [1, 1000])
+    self.assertEqual(events[1]['stage'], 'parsing')
+    self.assertEqual(events[1]['rate'], 100.0)
+    self.assertEqual(events[1]['elapsed_seconds'], 10.0)
+
+  def test_writing_rate_and_eta(self):
+    progress = ProgressReporter(metrics_filename = self.metrics_filename, interval = 10, clock = self.clock)
+    progress.writing(0, 4, 0)
+    self.clock.now += 10
+    progress.writing(1, 4, 2000)
+    self.clock.now += 1
+    progress.finished()
+    events = self.read_metrics()
+    self.assertEqual([event['stage'] for event in events], ['writing', 'writing', 'finished'])
+    self.assertEqual(events[1]['rate'], 200.0)
+    self.assertEqual(events[1]['eta_seconds'], 30.0)
+    self.assertEqual(events[1]['contigs_total'], 4)
+
+  def test_pipelined_parsing_and_writing(self):
+    # parsing and writing take turns, which mustn't report on every call
+    progress = ProgressReporter(metrics_filename = self.metrics_filename, interval = 10, clock = self.clock)
+    progress.parsing(100, 0)
+    self.clock.now += 5
+    progress.writing(1, None, 1000)
+    for step in range(4):
+      self.clock.now += 1
+      progress.parsing(200 + step * 100, 1 + step)
+      progress.writing(2 + step, None, 2000 + step * 1000)
+    self.clock.now += 1
+    progress.parsing(1000, 5)
+    progress.finished()
+    events = self.read_metrics()
+    self.assertEqual([event['stage'] for event in events], ['parsing', 'parsing', 'finished'])
+    # each rate is from when that stage started
+    self.assertEqual(events[1]['rate'], 100.0)
+    self.clock.now += 5
+    progress.writing(10, None, 10000)
+    self.clock.now += 10
+    progress.writing(10, None, 10000)
+    self.assertEqual(self.read_metrics()[-1]['rate'], 500.0)
+
+  def test_prometheus_file(self):
+    progress = ProgressReporter(prometheus_filename = self.prometheus_filename, output_filename = 'out"put.embl', clock = self.clock)
+    progress.writing(2, 4, 2000)
+    progress.failed(ValueError("Could not format contig"))
+    with open(self.prometheus_filename, 'r') as prometheus_file:
+      metrics = prometheus_file.read()
+    self.assertTrue('# TYPE gff3toembl_contigs_written gauge\n' in metrics)
+    self.assertTrue('gff3toembl_contigs_written{output="out\\"put.embl"} 2\n' in metrics)
+    self.assertTrue('gff3toembl_failed{output="out\\"put.embl"} 1\n' in metrics)
+    self.assertFalse(os.path.exists(self.prometheus_filename + ".tmp"))
+
+  def test_stderr(self):
+    progress = ProgressReporter(stderr = True, clock = self.clock)
+    stderr = sys.stderr
+    sys.stderr = StringIO()
+    try:
+      progress.writing(0, None, 0)
+      self.clock.now += 20
+      progress.writing(3, None, 3 * 1024 * 1024)
+      output = sys.stderr.getvalue()
+    finally:
+      sys.stderr = stderr
+    self.assertEqual(output.split('\n')[1], "gff3_to_embl [20s] writing: 3 contigs written, 3145728 bytes, 0.1 MB/s")
+
+  def test_disabled(self):
+    progress = ProgressReporter(clock = self.clock)
+    self.assertFalse(progress.is_enabled())
+    progress.parsing(1, 1)
+    progress.finished()
+    self.assertEqual(os.listdir(self.temporary_directory), [])
@@ -0,0 +1,71 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from mock import patch
+from gff3toembl.SequenceCache import SequenceCache
+from gff3toembl.EMBLContig import EMBLSequence
+
+class TestSequenceCache(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.cache_directory = os.path.join(self.temporary_directory, 'cache')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def test_get_and_put(self):
+    cache = SequenceCache(self.cache_directory)
+    self.assertEqual(cache.get('abc'), None)
+    cache.put('abc', 'formatted sequence')
+    self.assertEqual(cache.get('abc'), 'formatted sequence')
+    self.assertEqual(SequenceCache(self.cache_directory).total_size, len('formatted sequence'))
+
+  def test_least_recently_used_are_evicted(self):
+    cache = SequenceCache(self.cache_directory, 25)
+    cache.put('first', '1234567890')
+    cache.put('second', '1234567890')
+    # make sure the entries have different last used times
+    os.utime(cache.entry_filename('first'), (time.time() - 20, time.time() - 20))
+    os.utime(cache.entry_filename('second'), (time.time() - 10, time.time() - 10))
+    cache.get('first')
+    cache.put('third', '1234567890')
+    self.assertEqual(cache.get('first'), '1234567890')
+    self.assertEqual(cache.get('second'), None)
+    self.assertEqual(cache.get('third'), '1234567890')
+    self.assertEqual(cache.total_size, 20)
+
+  def test_replaced_entry_is_counted_once(self):
+    cache = SequenceCache(self.cache_directory)
+    cache.put('abc', '1234567890')
+    cache.put('abc', '12345')
+    self.assertEqual(cache.total_size, 5)
+
+  def test_eviction_goes_below_the_maximum(self):
+    cache = SequenceCache(self.cache_directory, 100)
+    with patch.object(cache, 'scan', wraps=cache.scan) as scan_mock:
+      for entry_number in range(30):
+        cache.put('entry{}'.format(entry_number), '1234567890')
+        os.utime(cache.entry_filename('entry{}'.format(entry_number)), (time.time() - 100 + entry_number, time.time() - 100 + entry_number))
+      # each eviction frees 10% of the cache, which is another put, rather than rescanning on every put
+      self.assertTrue(scan_mock.call_count <= 11)
+    self.assertTrue(cache.total_size <= 100)
+    self.assertEqual(cache.total_size, sum(map(os.path.getsize, [os.path.join(self.cache_directory, filename) for filename in os.listdir(self.cache_directory)])))
+    self.assertEqual(cache.get('entry29'), '1234567890')
+    self.assertEqual(cache.get('entry0'), None)
+
+  def test_sequence_format_uses_cache(self):
+    cache = SequenceCache(self.cache_directory)
+    expected_string = """\
+XX
+SQ   Sequence 12 BP; 4 A; 3 C; 2 G; 1 T; 2 other;
+     aaaacccggt nn                                                            12
+"""
+    self.assertEqual(EMBLSequence('AAAACCCGGTNN', cache).format(), expected_string)
+    sequence = EMBLSequence('AAAACCCGGTNN', cache)
+    with patch.object(sequence, 'format_sequence_body') as format_mock:
+      self.assertEqual(sequence.format(), expected_string)
+      self.assertFalse(format_mock.called)
+    self.assertEqual(cache.get(sequence.calculate_digest()), expected_string)
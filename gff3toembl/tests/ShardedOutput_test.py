@@ -0,0 +1,85 @@
+import unittest
+import os
+import shutil
+import tempfile
+from mock import MagicMock
+from gff3toembl.ShardedOutput import ShardedOutput
+from gff3toembl.EMBLContig import EMBLContig
+from gff3toembl.EMBLIndex import EMBLIndex
+
+class TestShardedOutput(unittest.TestCase):
+
+  def setUp(self):
+    self.temporary_directory = tempfile.mkdtemp()
+    self.output_filename = os.path.join(self.temporary_directory, 'output.embl')
+
+  def tearDown(self):
+    shutil.rmtree(self.temporary_directory)
+
+  def create_contig(self, sequence_identifier, sequence_length):
+    contig = EMBLContig()
+    contig.add_sequence('A' * sequence_length)
+    contig.add_header(sequence_identifier = sequence_identifier, sequence_length = sequence_length, sequence_name = sequence_identifier)
+    return (sequence_identifier, contig)
+
+  def read_file(self, filename):
+    with open(filename, 'r') as input_file:
+      return input_file.read()
+
+  def test_split_contigs_into_shards(self):
+    sorted_contigs = [self.create_contig('contig1', 1000), self.create_contig('contig2', 100),
+                      self.create_contig('contig3', 100), self.create_contig('contig4', 800)]
+    shards = ShardedOutput(self.output_filename, 2).split_contigs(sorted_contigs)
+    self.assertEqual([(shard_filename, [sequence_identifier for sequence_identifier, contig in contigs]) for shard_filename, contigs in shards], [
+      (os.path.join(self.temporary_directory, 'output.1.embl'), ['contig1']),
+      (os.path.join(self.temporary_directory, 'output.2.embl'), ['contig2', 'contig3', 'contig4'])
+    ])
+    shards = ShardedOutput(self.output_filename, 10).split_contigs(sorted_contigs)
+    self.assertEqual(len(shards), 4)
+
+  def test_split_contigs_by_replicon(self):
+    sorted_contigs = [self.create_contig('contig|1', 1000), self.create_contig('contig|2', 100)]
+    shards = ShardedOutput(self.output_filename).split_contigs(sorted_contigs)
+    self.assertEqual([shard_filename for shard_filename, contigs in shards], [
+      os.path.join(self.temporary_directory, 'output.contig1.embl'),
+      os.path.join(self.temporary_directory, 'output.contig2.embl')
+    ])
+
+  def test_split_contigs_by_replicon_with_colliding_names(self):
+    sorted_contigs = [self.create_contig('contig.1', 100), self.create_contig('contig1', 100),
+                      self.create_contig('contig|1', 100), self.create_contig('||', 100)]
+    shard_filenames = ShardedOutput(self.output_filename).write(sorted_contigs)
+    self.assertEqual([os.path.basename(shard_filename) for shard_filename in shard_filenames],
+                     ['output.contig1.embl', 'output.contig1_2.embl', 'output.contig1_3.embl', 'output.contig.embl'])
+    for shard_filename, (sequence_identifier, contig) in zip(shard_filenames, sorted_contigs):
+      self.assertEqual(self.read_file(shard_filename), contig.format() + "//\n")
+    self.assertEqual(len(self.read_file(self.output_filename + '.manifest').splitlines()), 4)
+
+  def test_write(self):
+    sorted_contigs = [self.create_contig('contig1', 1000), self.create_contig('contig2', 100),
+                      self.create_contig('contig3', 100), self.create_contig('contig4', 800)]
+    single_output = "".join(contig.format() + "//\n" for sequence_identifier, contig in sorted_contigs)
+    for workers in [1, 2]:
+      shard_filenames = ShardedOutput(self.output_filename, 2, workers).write(sorted_contigs)
+      self.assertEqual("".join(map(self.read_file, shard_filenames)), single_output)
+      expected_manifest = "output.1.embl\t1\t{}\noutput.2.embl\t3\t{}\n".format(*map(os.path.getsize, shard_filenames))
+      self.assertEqual(self.read_file(self.output_filename + '.manifest'), expected_manifest)
+      # no temporary files are left behind
+      self.assertEqual(sorted(os.listdir(self.temporary_directory)), ['output.1.embl', 'output.2.embl', 'output.embl.manifest'])
+
+  def test_write_reports_progress(self):
+    sorted_contigs = [self.create_contig('contig1', 1000), self.create_contig('contig2', 100),
+                      self.create_contig('contig3', 100), self.create_contig('contig4', 800)]
+    progress = MagicMock()
+    shard_filenames = ShardedOutput(self.output_filename, 2, 1, progress).write(sorted_contigs)
+    first_shard_size = os.path.getsize(shard_filenames[0])
+    total_size = sum(map(os.path.getsize, shard_filenames))
+    self.assertEqual([call[0] for call in progress.writing.call_args_list], [(1, 4, first_shard_size), (4, 4, total_size)])
+
+  def test_write_index(self):
+    sorted_contigs = [self.create_contig('contig1', 1000), self.create_contig('contig2', 100),
+                      self.create_contig('contig3', 100), self.create_contig('contig4', 800)]
+    shard_filenames = ShardedOutput(self.output_filename, 2, 1, None, True).write(sorted_contigs)
+    second_shard_index = EMBLIndex(shard_filenames[1]).read()
+    self.assertEqual(second_shard_index.sequence_identifiers(), ['contig2', 'contig3', 'contig4'])
+    self.assertEqual(second_shard_index.fetch('contig3'), sorted_contigs[2][1].format() + "//\n")
@@ -0,0 +1,117 @@
+import unittest
+import glob
+import os
+from gff3toembl.EMBLContig import EMBLFeature, EMBLSequence, _cformat
+
+test_modules_dir = os.path.dirname(os.path.realpath(__file__))
+data_dir = os.path.join(test_modules_dir, 'data')
+
+class TestCFormat(unittest.TestCase):
+  # The compiled and pure Python formatting have to give identical output,
+  # these compare both of them against everything in tests/data
+
+  def backends(self):
+    backends = [None]
+    if _cformat != None:
+      backends.append(_cformat)
+    return backends
+
+  def read_embl_sequences(self, filename):
+    # (sequence, formatted body) for each SQ section in an EMBL file
+    sequences = []
+    body_lines = None
+    with open(filename, 'r') as embl_file:
+      for line in embl_file:
+        if line.startswith('SQ   '):
+          body_lines = []
+        elif line.startswith('//') and body_lines != None:
+          sequence = ''.join(''.join(body_line.split()[:-1]) for body_line in body_lines)
+          sequences.append((sequence, ''.join(body_lines)))
+          body_lines = None
+        elif body_lines != None:
+          body_lines.append(line)
+    return sequences
+
+  def read_gff_features(self, filename):
+    features = []
+    sequences = []
+    with open(filename, 'r') as gff_file:
+      for line in gff_file:
+        if line.startswith('>'):
+          sequences.append('')
+        elif sequences:
+          sequences[-1] += line.strip()
+        elif not line.startswith('#') and line.strip() != '':
+          columns = line.rstrip('\n').split('\t')
+          attributes = dict(attribute.split('=', 1) for attribute in columns[8].split(';') if '=' in attribute)
+          features.append((columns[2], int(columns[3]), int(columns[4]), columns[6], attributes))
+    return features, sequences
+
+  def test_sequence_bodies_in_test_data(self):
+    embl_filenames = glob.glob(os.path.join(data_dir, '*.embl'))
+    self.assertTrue(len(embl_filenames) > 0)
+    for embl_filename in embl_filenames:
+      for sequence, expected_body in self.read_embl_sequences(embl_filename):
+        for backend in self.backends():
+          embl_sequence = EMBLSequence(sequence.upper())
+          embl_sequence.formatting_kernel = backend
+          self.assertEqual(embl_sequence.body, expected_body)
+
+  def test_sequence_bodies_of_every_length(self):
+    sequence = 'ACGTNacgtn' * 13
+    for length in range(len(sequence) + 1):
+      formatted_bodies = []
+      for backend in self.backends():
+        embl_sequence = EMBLSequence(sequence[:length])
+        embl_sequence.formatting_kernel = backend
+        formatted_bodies.append(embl_sequence.body)
+      self.assertEqual(len(set(formatted_bodies)), 1)
+
+  def test_sequence_bodies_from_an_offset(self):
+    sequence = 'ACGTNacgtn' * 13
+    for offset in [0, 60, 123456]:
+      formatted_bodies = []
+      for backend in self.backends():
+        embl_sequence = EMBLSequence(sequence)
+        embl_sequence.formatting_kernel = backend
+        formatted_bodies.append(embl_sequence.format_sequence_body(sequence, offset))
+      self.assertEqual(len(set(formatted_bodies)), 1)
+
+  def test_features_in_test_data(self):
+    gff_filenames = glob.glob(os.path.join(data_dir, '*.gff'))
+    self.assertTrue(len(gff_filenames) > 0)
+    for gff_filename in gff_filenames:
+      features, sequences = self.read_gff_features(gff_filename)
+      for feature_type, start, end, strand, attributes in features:
+        formatted_features = []
+        for backend in self.backends():
+          feature = EMBLFeature(feature_type, start, end, strand, attributes)
+          feature.formatting_kernel = backend
+          formatted_features.append(feature.format())
+        self.assertEqual(len(set(formatted_features)), 1)
+      for sequence in sequences:
+        formatted_bodies = []
+        for backend in self.backends():
+          embl_sequence = EMBLSequence(sequence)
+          embl_sequence.formatting_kernel = backend
+          formatted_bodies.append(embl_sequence.body)
+        self.assertEqual(len(set(formatted_bodies)), 1)
+
+  def test_attributes_around_the_line_width(self):
+    values = ['a' * length for length in range(30, 70)]
+    values += ['ends with a space ', 'has\ta tab', 'new\nline', 'a ' * 40, 'hyphen-ated-' * 6, 'caf\xc3\xa9 ' * 15, '']
+    for value in values:
+      for formatter_name in ['number_attribute_formatter', 'product_attribute_formatter', 'default_attribute_formatter']:
+        formatted_attributes = []
+        for backend in self.backends():
+          feature = EMBLFeature('CDS', 1, 10, '+', {})
+          feature.formatting_kernel = backend
+          formatted_attributes.append(getattr(feature, formatter_name)('note', value))
+        self.assertEqual(len(set(formatted_attributes)), 1)
+
+  @unittest.skipIf(_cformat == None, "the compiled formatting module has not been built")
+  def test_wrap_attribute_only_handles_one_line(self):
+    self.assertEqual(_cformat.wrap_attribute('/note="short"'), 'FT                   /note="short"')
+    self.assertEqual(_cformat.wrap_attribute('/note="' + 'a' * 60 + '"'), None)
+    self.assertEqual(_cformat.wrap_attribute('/note="a "'), 'FT                   /note="a "')
+    self.assertEqual(_cformat.wrap_attribute('/note="a" '), None)
@@ -1,7 +1,7 @@
 import os
 import glob
 import multiprocessing
-from setuptools import setup, find_packages
+from setuptools import setup, find_packages, Extension
 
 def read(fname):
     return open(os.path.join(os.path.dirname(__file__), fname)).read()
@@ -12,6 +12,8 @@ setup(
     description='Convert a GFF3 file to EMBL format for submission',
     long_description=read('README.md'),
     packages = find_packages(),
+    # optional compiled formatting, the pure Python code is used if it doesn't build
+    ext_modules=[Extension('gff3toembl._cformat', ['gff3toembl/_cformat.c'], optional=True)],
     author='Andrew J. Page',
     author_email='ap13@sanger.ac.uk',
     url='https://github.com/sanger-pathogens/gff3toembl',